@@ -0,0 +1,328 @@
+from quart import Quart, Response, request, jsonify, render_template
+import asyncio
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+INFERENCE_EXECUTOR = os.environ.get('CLASSIFIER_INFERENCE_EXECUTOR', 'process')  # 'process' ou 'thread'
+
+# Os workers do pool de processos contam documentos e etapas nas próprias métricas;
+# o diretório multiprocesso (definido antes de importar o prometheus_client) as soma no /metrics
+_metrics_dir = None
+if INFERENCE_EXECUTOR == 'process' and 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    _metrics_dir = tempfile.mkdtemp(prefix='classifier-metrics-')
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _metrics_dir
+
+import web_classifier
+from classifier_metrics import mark_worker_dead, render_metrics
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+app = Quart(__name__)
+app.config['JSON_AS_ASCII'] = False  # Para suporte a caracteres especiais
+
+# Pool de inferência: tamanho fixo e fila limitada na frente dele
+INFERENCE_WORKERS = int(os.environ.get('CLASSIFIER_INFERENCE_WORKERS', multiprocessing.cpu_count()))
+INFERENCE_QUEUE_SIZE = int(os.environ.get('CLASSIFIER_INFERENCE_QUEUE_SIZE', 64))
+RETRY_AFTER_SECONDS = int(os.environ.get('CLASSIFIER_RETRY_AFTER_SECONDS', 1))
+
+def _init_inference_worker():
+    """Carrega no worker os mesmos modelos do processo principal (CLASSIFIER_MODELS ou os caminhos padrão)."""
+    if web_classifier.nlp_model is None:
+        web_classifier.initialize_model()
+
+def _classify_in_worker(text, model_name, aggregation, early_stop_threshold):
+    """
+    Classifica no pool de inferência com o modelo escolhido pelo processo principal.
+
+    O cache de resultados fica no processo principal, por isso não é consultado aqui.
+
+    Returns:
+        tuple: (resultado ou None, mensagem de erro ou None, status HTTP).
+    """
+    web_classifier.model_registry.sync_state()
+    entry, error, _ = web_classifier.select_model(model_name)
+    if error:
+        # O worker ainda não aplicou uma troca de modelo do estado compartilhado
+        return None, f'Modelo "{model_name}" ainda não carregado no pool de inferência', 503
+
+    result = web_classifier.classify_document(text, entry.nlp, aggregation=aggregation,
+                                              early_stop_threshold=early_stop_threshold, use_cache=False)
+    result['model'] = entry.name
+    return result, None, 200
+
+class InferencePool:
+    """
+    Executor de tamanho fixo para a inferência, com fila limitada na frente.
+
+    O contador de pendências só é alterado pela thread do event loop, então não
+    precisa de lock. Quando `workers + queue_size` chamadas já estão pendentes,
+    novas chamadas são recusadas imediatamente em vez de esperar. Uma vaga só é
+    devolvida quando a tarefa termina no pool, mesmo que o cliente tenha
+    desistido antes. Se um worker morre, o executor quebrado é substituído.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, queue_size=INFERENCE_QUEUE_SIZE, kind=INFERENCE_EXECUTOR):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.kind = kind
+        self.capacity = workers + queue_size
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.executor = self._create_executor()
+
+    def _create_executor(self):
+        if self.kind == 'process':
+            # spawn: o pool é criado com o event loop e as threads do servidor já
+            # rodando, o que um fork não copiaria de forma segura
+            context = multiprocessing.get_context('spawn')
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context, initializer=_init_inference_worker)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+
+    def try_acquire(self):
+        """Reserva uma vaga no pool; devolve False se a fila estiver cheia."""
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            return False
+        self.pending += 1
+        return True
+
+    def _release(self, future=None):
+        self.pending -= 1
+        self.completed += 1
+
+    async def run(self, func, *args):
+        """
+        Executa `func` no pool. Exige uma vaga reservada com try_acquire().
+
+        Raises:
+            BrokenProcessPool: Um worker morreu; o executor já foi recriado.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._replace_broken(executor)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        # Um cliente que desconecta cancela só a espera; a vaga segue ocupada até a tarefa acabar
+        def release(done):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release, done)
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            raise
+
+    def _replace_broken(self, executor):
+        """Troca um executor quebrado (worker morto) por um novo, uma vez só."""
+        if self.executor is not executor:
+            return
+        logging.error("Worker do pool de inferência morreu; recriando o executor")
+        pids = list(getattr(executor, '_processes', None) or {})
+        executor.shutdown(wait=False, cancel_futures=True)
+        for pid in pids:
+            mark_worker_dead(pid)
+        self.executor = self._create_executor()
+        self.restarts += 1
+
+    def stats(self):
+        """Estatísticas do pool de inferência."""
+        return {
+            'executor': self.kind,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': min(self.pending, self.workers),
+            'queued': max(self.pending - self.workers, 0),
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'restarts': self.restarts
+        }
+
+    def shutdown(self):
+        """Aguarda as inferências em andamento e encerra os workers (bloqueante)."""
+        pids = list(getattr(self.executor, '_processes', None) or {})
+        self.executor.shutdown(wait=True)
+        for pid in pids:
+            mark_worker_dead(pid)
+
+inference_pool = None
+
+@app.before_serving
+async def startup():
+    """Carrega o modelo e cria o pool de inferência antes de aceitar conexões."""
+    global inference_pool
+
+    if web_classifier.nlp_model is None:
+        web_classifier.initialize_model()
+
+    inference_pool = InferencePool()
+    logging.info(f"Pool de inferência pronto: {inference_pool.workers} workers ({inference_pool.kind}), "
+                 f"fila de {inference_pool.queue_size}")
+
+@app.after_serving
+async def shutdown():
+    """Aguarda as inferências em andamento e encerra o pool, sem bloquear o event loop."""
+    if inference_pool is not None:
+        await asyncio.get_running_loop().run_in_executor(None, inference_pool.shutdown)
+    if _metrics_dir is not None:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
+
+@app.before_request
+async def sync_model_registry():
+    # Aplica trocas de modelo feitas por chamadas administrativas em outros processos
+    web_classifier.model_registry.sync_state()
+
+@app.route('/')
+async def index():
+    """Página principal da aplicação."""
+    return await render_template('index.html')
+
+@app.route('/classify', methods=['POST'])
+async def classify_endpoint():
+    """
+    Endpoint assíncrono para classificar texto.
+
+    Espera JSON com campo 'text'. Se o pool de inferência estiver saturado,
+    responde 503 imediatamente com o cabeçalho Retry-After.
+    """
+    try:
+        if web_classifier.nlp_model is None:
+            return jsonify({
+                'success': False,
+                'error': 'Modelo não carregado. Verifique se o caminho do modelo está correto.'
+            }), 500
+
+        data = await request.get_json()
+
+        if not data or 'text' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Campo "text" é obrigatório'
+            }), 400
+
+        # Escolher o modelo (campo 'model' ou divisão de tráfego do registro)
+        entry, error, status = web_classifier.select_model(data.get('model'))
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), status
+
+        error = web_classifier.validate_text(data['text'])
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        aggregation, early_stop_threshold, error = web_classifier.validate_long_document_options(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        text = data['text'].strip()
+
+        # Resultados em cache não ocupam vaga no pool
+        result, cache_key = web_classifier.cached_document(text, entry.nlp, aggregation, early_stop_threshold)
+        if result is not None:
+            result['model'] = entry.name
+            return jsonify(result)
+
+        if not inference_pool.try_acquire():
+            return jsonify({
+                'success': False,
+                'error': 'Servidor sobrecarregado, tente novamente em instantes'
+            }), 503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+
+        try:
+            result, error, status = await inference_pool.run(_classify_in_worker, text, entry.name,
+                                                             aggregation, early_stop_threshold)
+        except BrokenProcessPool:
+            return jsonify({
+                'success': False,
+                'error': 'Worker de inferência reiniciado, tente novamente em instantes'
+            }), 503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), status, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+
+        web_classifier.store_document(cache_key, result)
+
+        if result['success']:
+            logging.info(f"Texto classificado como: {result['predicted_category']} "
+                        f"(confiança: {result['confidence']:.3f})")
+
+        return jsonify(result)
+
+    except Exception as e:
+        logging.error(f"Erro no endpoint de classificação: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Métricas no formato de texto do Prometheus (somadas entre os workers do pool)."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/health')
+async def health_check():
+    """Endpoint para verificar saúde da aplicação (não passa pelo pool de inferência)."""
+    model_status = "carregado" if web_classifier.nlp_model is not None else "não carregado"
+
+    return jsonify({
+        'status': 'ok',
+        'model_status': model_status,
+        'categories': web_classifier.CATEGORIES,
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/model-info')
+async def model_info():
+    """Endpoint com informações do modelo."""
+    nlp_model = web_classifier.nlp_model
+    if nlp_model is None:
+        return jsonify({
+            'model_loaded': False,
+            'error': 'Modelo não carregado'
+        })
+
+    pipe_names = nlp_model.pipe_names
+
+    return jsonify({
+        'model_loaded': True,
+        'pipe_names': pipe_names,
+        'categories': web_classifier.CATEGORIES,
+        'has_textcat': 'textcat' in pipe_names or 'textcat_multilabel' in pipe_names,
+        'model_lang': nlp_model.lang
+    })
+
+if __name__ == '__main__':
+    logging.info("Iniciando aplicação web assíncrona...")
+    logging.info("Acesse: http://localhost:5003")
+
+    # Para produção: hypercorn async_classifier:app --bind 0.0.0.0:5003
+    app.run(host='0.0.0.0', port=5003)
@@ -0,0 +1,205 @@
+"""
+Inferência em cascata: o modelo barato decide quando está confiante.
+
+Todo documento passa primeiro pelo primeiro estágio (por exemplo, o BOW).
+Só os documentos cuja maior probabilidade em `doc.cats` fica abaixo do limite
+seguem para o próximo estágio (CNN ou ensemble); o último estágio sempre decide.
+"""
+
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+class CascadeClassifier:
+    """
+    Cascata de modelos com limite de confiança.
+
+    Os modelos são resolvidos pelo nome a cada chamada, então trocas a quente
+    no registro valem imediatamente para a cascata.
+    """
+
+    def __init__(self, stage_names, threshold, get_model):
+        """
+        Args:
+            stage_names (list): Nomes dos modelos, do mais barato ao mais caro.
+            threshold (float): Confiança mínima para um estágio decidir.
+            get_model (callable): Devolve o pipeline SpaCy de um nome.
+        """
+        if len(stage_names) < 2:
+            raise ValueError("A cascata precisa de pelo menos dois estágios")
+
+        self.stage_names = list(stage_names)
+        self.threshold = threshold
+        self.get_model = get_model
+        self.decided = OrderedDict((name, 0) for name in self.stage_names)
+        self.processed = OrderedDict((name, 0) for name in self.stage_names)
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return '>'.join(self.stage_names)
+
+    @property
+    def pipe_names(self):
+        return [f'cascade:{name}' for name in self.stage_names]
+
+    @property
+    def tokenizer(self):
+        """Tokenizador do primeiro estágio (usado para normalizar documentos longos)."""
+        return self.get_model(self.stage_names[0]).tokenizer
+
+    def cache_identity(self, model_identity):
+        """Identidade para o cache: os modelos de todos os estágios e o limite."""
+        stages = '|'.join(model_identity(self.get_model(name)) for name in self.stage_names)
+        return f'cascade|{self.threshold}|{stages}'
+
+    def run(self, texts, run_pipeline, batch_size):
+        """
+        Classifica os textos estágio por estágio.
+
+        Args:
+            texts (list): Textos para classificar.
+            run_pipeline (callable): Executa um pipeline: (textos, modelo, batch_size) -> docs.
+            batch_size (int): Tamanho do batch interno.
+
+        Returns:
+            tuple: (docs do estágio que decidiu cada texto, nomes desses estágios).
+        """
+        docs = [None] * len(texts)
+        decided_by = [None] * len(texts)
+        pending = list(range(len(texts)))
+        last_stage = len(self.stage_names) - 1
+
+        for stage, name in enumerate(self.stage_names):
+            stage_docs = run_pipeline([texts[i] for i in pending], self.get_model(name), batch_size)
+            with self._lock:
+                self.processed[name] += len(pending)
+
+            escalated = []
+            for i, doc in zip(pending, stage_docs):
+                if stage == last_stage or (doc.cats and max(doc.cats.values()) >= self.threshold):
+                    docs[i] = doc
+                    decided_by[i] = name
+                else:
+                    escalated.append(i)
+
+            with self._lock:
+                self.decided[name] += len(pending) - len(escalated)
+
+            pending = escalated
+            if not pending:
+                break
+
+        return docs, decided_by
+
+    def pipe(self, texts, batch_size=64, stages=None):
+        """
+        Interface compatível com nlp.pipe (usada na classificação por janelas).
+
+        Preguiçosa como o nlp.pipe: os textos são lidos e classificados em blocos
+        de `batch_size`, então interromper a iteração evita os blocos restantes.
+
+        Args:
+            texts (iterable): Textos para classificar.
+            batch_size (int): Tamanho de cada bloco.
+            stages (list): Se informada, recebe o estágio que decidiu cada doc devolvido.
+        """
+        texts = iter(texts)
+        while True:
+            batch = list(islice(texts, batch_size))
+            if not batch:
+                return
+            docs, decided_by = self.run(batch, _plain_pipeline, batch_size)
+            for doc, name in zip(docs, decided_by):
+                if stages is not None:
+                    stages.append(name)
+                yield doc
+
+    def stats(self):
+        """Parcela do tráfego decidida e processada por cada estágio."""
+        with self._lock:
+            total = sum(self.decided.values())
+            return {
+                'stages': self.stage_names,
+                'threshold': self.threshold,
+                'documents': total,
+                'decided': dict(self.decided),
+                'decided_share': {name: count / total if total else 0.0 for name, count in self.decided.items()},
+                'processed': dict(self.processed)
+            }
+
+def _plain_pipeline(texts, model, batch_size):
+    return list(model.pipe(texts, batch_size=batch_size))
+
+def evaluate_cascade(stage_models, test_path, thresholds, batch_size=64):
+    """
+    Mede a acurácia ponta a ponta e a parcela de cada estágio para vários limites.
+
+    Cada estágio classifica o conjunto de teste uma única vez; a cascata é então
+    simulada para cada limite a partir desses scores, então testar muitos limites
+    custa o mesmo que testar um.
+
+    Args:
+        stage_models (list): Pares (nome, pipeline SpaCy), do mais barato ao mais caro.
+        test_path (str): Arquivo .spacy com os documentos de teste anotados.
+        thresholds (list): Limites de confiança a avaliar.
+        batch_size (int): Tamanho do batch do nlp.pipe.
+
+    Returns:
+        list: Um dicionário por limite com acurácia, parcela e processados por estágio.
+    """
+    from spacy.tokens import DocBin
+
+    first_model = stage_models[0][1]
+    references = list(DocBin().from_disk(test_path).get_docs(first_model.vocab))
+    references = [doc for doc in references if doc.cats]
+    texts = [doc.text for doc in references]
+    gold = [max(doc.cats, key=doc.cats.get) for doc in references]
+
+    stage_cats = [[doc.cats for doc in model.pipe(texts, batch_size=batch_size)] for _, model in stage_models]
+
+    reports = []
+    last_stage = len(stage_models) - 1
+    for threshold in thresholds:
+        decided = OrderedDict((name, 0) for name, _ in stage_models)
+        processed = OrderedDict((name, 0) for name, _ in stage_models)
+        correct = 0
+
+        for i, label in enumerate(gold):
+            for stage, (name, _) in enumerate(stage_models):
+                cats = stage_cats[stage][i]
+                processed[name] += 1
+                if stage == last_stage or (cats and max(cats.values()) >= threshold):
+                    decided[name] += 1
+                    correct += int(bool(cats) and max(cats, key=cats.get) == label)
+                    break
+
+        total = len(gold)
+        reports.append({
+            'threshold': threshold,
+            'documents': total,
+            'accuracy': correct / total if total else 0.0,
+            'decided_share': {name: count / total if total else 0.0 for name, count in decided.items()},
+            'processed': dict(processed)
+        })
+
+    return reports
+
+if __name__ == '__main__':
+    import argparse
+    import spacy
+
+    parser = argparse.ArgumentParser(description='Avalia a cascata no conjunto de teste para escolher o limite')
+    parser.add_argument('--stages', default='bow,cnn',
+                        help='Modelos da cascata, do mais barato ao mais caro (nomes em cat-model/models)')
+    parser.add_argument('--thresholds', default='0.5,0.7,0.8,0.9,0.95,0.99')
+    parser.add_argument('--test', default='cat-model/prepared-data/test.spacy')
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    stage_models = [(name, spacy.load(f'cat-model/models/{name}/model-best')) for name in args.stages.split(',')]
+    thresholds = [float(value) for value in args.thresholds.split(',')]
+
+    for report in evaluate_cascade(stage_models, args.test, thresholds, args.batch_size):
+        shares = ', '.join(f"{name}={share:.1%}" for name, share in report['decided_share'].items())
+        print(f"limite={report['threshold']:.2f} acurácia={report['accuracy']:.4f} decididos: {shares}")
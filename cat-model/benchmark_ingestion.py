@@ -0,0 +1,159 @@
+"""
+Benchmarks for the ingestion stages of import_data_cat.py.
+
+    python cat-model/benchmark_ingestion.py prefilter --data cat-model/data --limit 20000
+    python cat-model/benchmark_ingestion.py prefilter --synthetic 5000 --target-share 0.2
+    python cat-model/benchmark_ingestion.py clean-text --data cat-model/data --limit 5000
+
+Each benchmark reports files/sec (or articles/sec) for the previous
+implementation ("before") and the current one ("after") on the same files. The page cache is warmed up
+first so both sides read from memory.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import tempfile
+import time
+from xml.etree import ElementTree as ET
+
+import import_data_cat
+
+OTHER_ART_TYPES = ["Despacho", "Resolução", "Decreto", "Ato", "Aviso", "Retificação", "Instrução Normativa"]
+
+def write_synthetic_corpus(directory, files, target_share, seed=0):
+    """Writes DOU-like XML files mixing target and non-target artTypes."""
+    rng = random.Random(seed)
+    targets = sorted(import_data_cat.TARGET_ART_TYPES)
+    paragraph = "&lt;p class=&quot;dou-paragraph&quot;&gt;Processo nº 23000.000000/2024-00. Objeto: " \
+                "aquisição de material de consumo para a Universidade Federal.&lt;/p&gt;"
+    for i in range(files):
+        art_type = rng.choice(targets) if rng.random() < target_share else rng.choice(OTHER_ART_TYPES)
+        body = paragraph * rng.randint(5, 60)
+        with open(os.path.join(directory, f"{i:07d}.xml"), 'w', encoding='utf-8') as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<xml><article id="{i}" name="{i}" idOficio="{i}" '
+                    f'pubName="DO3" artType="{art_type}" pubDate="02/02/2024" artClass="00001" '
+                    f'artCategory="Ministério" artSize="12" artNotes="" numberPage="1" pdfPage="" '
+                    f'editionNumber="1" highlightType="" highlightPriority="" highlight="" highlightimage="" '
+                    f'highlightimagename="" idMateria="{i}"><body><Identifica>{art_type}</Identifica>'
+                    f'<Ementa /><Titulo /><SubTitulo /><Texto>{body}</Texto></body><Midias /></article></xml>')
+
+def _full_parse_art_type(xml_path):
+    # Previous behaviour: parse the whole file before looking at the artType
+    root = ET.parse(xml_path).getroot()
+    article = root.find('.//article')
+    return article.get('artType') if article is not None else None
+
+def _files_per_second(function, paths):
+    start = time.perf_counter()
+    for path in paths:
+        function(path)
+    return len(paths) / (time.perf_counter() - start)
+
+def benchmark_prefilter(paths):
+    """
+    Compares deciding relevance (and fully parsing only relevant files) with and
+    without the byte-scan pre-filter.
+
+    Returns:
+        dict: files/sec before and after, and the share of target files.
+    """
+    for path in paths:
+        with open(path, 'rb') as f:
+            f.read()
+
+    relevant = [path for path in paths if _full_parse_art_type(path) in import_data_cat.TARGET_ART_TYPES]
+
+    def before(path):
+        root = ET.parse(path).getroot()
+        article = root.find('.//article')
+        if article is not None and article.get('artType') in import_data_cat.TARGET_ART_TYPES:
+            root.find('.//Texto')
+
+    def after(path):
+        if import_data_cat.read_art_type(path) in import_data_cat.TARGET_ART_TYPES:
+            ET.parse(path).getroot().find('.//Texto')
+
+    mismatches = sum(import_data_cat.read_art_type(path) != _full_parse_art_type(path) for path in paths)
+    return {
+        'files': len(paths),
+        'target_share': len(relevant) / len(paths) if paths else 0.0,
+        'artType_mismatches': mismatches,
+        'before_files_per_sec': _files_per_second(before, paths),
+        'after_files_per_sec': _files_per_second(after, paths)
+    }
+
+def clean_text_reference(text):
+    """Previous clean_text implementation (BeautifulSoup), used as the golden output."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(text, "html.parser")
+    return re.sub(r'\s+', ' ', soup.get_text(" ")).strip()
+
+def load_texto_payloads(paths):
+    """Raw (still HTML) Texto payloads of the given XML files."""
+    payloads = []
+    for path in paths:
+        text_element = ET.parse(path).getroot().find('.//Texto')
+        if text_element is not None and text_element.text:
+            payloads.append(text_element.text)
+    return payloads
+
+def benchmark_clean_text(payloads):
+    """
+    Compares the speed of clean_text and BeautifulSoup. Their outputs are
+    compared in tests/test_import_data_cat.py.
+
+    Returns:
+        dict: articles/sec before and after.
+    """
+    return {
+        'articles': len(payloads),
+        'before_articles_per_sec': _files_per_second(clean_text_reference, payloads),
+        'after_articles_per_sec': _files_per_second(import_data_cat.clean_text, payloads)
+    }
+
+def _print_report(report):
+    for key, value in report.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    before = report.get('before_files_per_sec') or report.get('before_articles_per_sec')
+    after = report.get('after_files_per_sec') or report.get('after_articles_per_sec')
+    if before:
+        print(f"speedup: {after / before:.2f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingestion benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    prefilter_parser = subparsers.add_parser('prefilter', help='artType pre-filter vs. full XML parse')
+    prefilter_parser.add_argument('--data', default='data', help='Directory with DOU XML files')
+    prefilter_parser.add_argument('--limit', type=int, default=20000)
+    prefilter_parser.add_argument('--synthetic', type=int, default=0,
+                                  help='Generate a mixed corpus with this many files instead of using --data')
+    prefilter_parser.add_argument('--target-share', type=float, default=0.2,
+                                  help='Share of target artTypes in the synthetic corpus')
+
+    clean_text_parser = subparsers.add_parser('clean-text',
+                                              help='clean_text vs. BeautifulSoup speed')
+    clean_text_parser.add_argument('--data', default='data', help='Directory with DOU XML files')
+    clean_text_parser.add_argument('--limit', type=int, default=5000)
+    clean_text_parser.add_argument('--synthetic', type=int, default=0,
+                                   help='Generate a corpus with this many files instead of using --data')
+    args = parser.parse_args()
+
+    target_share = getattr(args, 'target_share', 1.0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.synthetic:
+            write_synthetic_corpus(directory, args.synthetic, target_share)
+            paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        else:
+            paths = list(itertools.islice(import_data_cat.iter_xml_paths(args.data), args.limit))
+
+        if args.command == 'prefilter':
+            report = benchmark_prefilter(paths)
+        else:
+            report = benchmark_clean_text(load_texto_payloads(paths))
+    _print_report(report)
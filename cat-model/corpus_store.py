@@ -0,0 +1,315 @@
+"""
+Compressed, label-partitioned columnar store for the extracted corpus.
+
+The JSONL written by import_data_cat.py is converted into a directory with one
+partition per label and a small index:
+
+    extracted_articles.corpus/
+        index.json                  labels, row counts, codec and file names
+        00-portaria.text.zstd       text column, compressed in frames of FRAME_ROWS rows
+        00-portaria.offsets.npy     int64 start of each text in the uncompressed column (rows + 1)
+        00-portaria.frames.npy      int64 start of each frame in the compressed file (frames + 1)
+
+The offsets and frames columns are plain .npy files and are memory-mapped, so
+reading one label or a row range only decompresses the frames that cover it.
+Frames use zstd when the `zstandard` package is installed and zlib otherwise;
+the codec is recorded in the index.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import unicodedata
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_FILENAME = 'index.json'
+FORMAT_VERSION = 1
+CORPUS_SUFFIX = '.corpus'
+
+# Rows compressed together; smaller frames make row-range reads cheaper, larger ones compress better
+FRAME_ROWS = 512
+COMPRESSION_LEVEL = 6
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'zlib'
+
+def _compressor(codec):
+    if codec == 'zlib':
+        return lambda data: zlib.compress(data, COMPRESSION_LEVEL)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError("The zstd codec needs the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress
+    raise ValueError(f"Unknown codec: {codec}")
+
+def _decompressor(codec):
+    if codec == 'zlib':
+        return zlib.decompress
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError("This corpus was written with zstd; install the 'zstandard' package to read it")
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown codec: {codec}")
+
+def _partition_name(position, label):
+    ascii_label = unicodedata.normalize('NFKD', label).encode('ascii', 'ignore').decode('ascii')
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_label.lower()).strip('-') or 'label'
+    return f"{position:02d}-{slug}"
+
+def corpus_path_for(jsonl_path):
+    """Default store location for a JSONL corpus (extracted_articles.jsonl -> extracted_articles.corpus)."""
+    return os.path.splitext(jsonl_path)[0] + CORPUS_SUFFIX
+
+def is_corpus(path):
+    return os.path.isfile(os.path.join(path, INDEX_FILENAME))
+
+class _PartitionWriter:
+    def __init__(self, directory, name, codec, frame_rows):
+        self.name = name
+        self.compress = _compressor(codec)
+        self.frame_rows = frame_rows
+        self.file = open(os.path.join(directory, f"{name}.text.{codec}"), 'wb')
+        self.offsets = [0]
+        self.frames = [0]
+        self.buffer = []
+        self.raw_bytes = 0
+
+    def add(self, text):
+        data = text.encode('utf-8')
+        self.buffer.append(data)
+        self.raw_bytes += len(data)
+        self.offsets.append(self.raw_bytes)
+        if len(self.buffer) == self.frame_rows:
+            self._flush_frame()
+
+    def _flush_frame(self):
+        if self.buffer:
+            self.file.write(self.compress(b''.join(self.buffer)))
+            self.frames.append(self.file.tell())
+            self.buffer = []
+
+    def close(self, directory):
+        self._flush_frame()
+        text_file = os.path.basename(self.file.name)
+        self.file.close()
+        np.save(os.path.join(directory, self.name + '.offsets.npy'), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(directory, self.name + '.frames.npy'), np.asarray(self.frames, dtype=np.int64))
+        return {
+            'name': self.name,
+            'text_file': text_file,
+            'rows': len(self.offsets) - 1,
+            'frames': len(self.frames) - 1,
+            'raw_bytes': self.raw_bytes,
+            'compressed_bytes': self.frames[-1]
+        }
+
+def write_corpus(articles, corpus_path, codec=None, frame_rows=FRAME_ROWS):
+    """
+    Writes articles to a label-partitioned store, replacing any previous one.
+
+    Args:
+        articles (iterable): {'label', 'text'} dicts, streamed; only one frame per label is kept in memory.
+        corpus_path (str): Store directory.
+        codec (str): 'zstd' or 'zlib' (default: zstd when available).
+        frame_rows (int): Rows per compressed frame.
+
+    Returns:
+        dict: The store index.
+    """
+    codec = codec or default_codec()
+    _compressor(codec)  # fail before creating anything if the codec is unavailable
+    tmp_path = corpus_path.rstrip(os.sep) + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    writers = {}
+    for article in articles:
+        label = article['label']
+        writer = writers.get(label)
+        if writer is None:
+            writer = writers[label] = _PartitionWriter(tmp_path, _partition_name(len(writers), label),
+                                                       codec, frame_rows)
+        writer.add(article['text'])
+
+    index = {
+        'version': FORMAT_VERSION,
+        'codec': codec,
+        'frame_rows': frame_rows,
+        'labels': {label: writer.close(tmp_path) for label, writer in writers.items()}
+    }
+    with open(os.path.join(tmp_path, INDEX_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+    # Swap the directories so readers never see a half-written store
+    old_path = corpus_path.rstrip(os.sep) + '.old'
+    if os.path.exists(corpus_path):
+        os.replace(corpus_path, old_path)
+    os.replace(tmp_path, corpus_path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+    raw = sum(partition['raw_bytes'] for partition in index['labels'].values())
+    compressed = sum(partition['compressed_bytes'] for partition in index['labels'].values())
+    logging.info("Wrote %d articles in %d label partitions to %s (%s, %.1f MB -> %.1f MB)",
+                 sum(partition['rows'] for partition in index['labels'].values()), len(writers), corpus_path,
+                 codec, raw / 1e6, compressed / 1e6)
+    return index
+
+def iter_jsonl(path):
+    """Streams {'label', 'text'} dicts from a JSONL corpus."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def convert_jsonl(jsonl_path, corpus_path=None, codec=None, frame_rows=FRAME_ROWS):
+    """Builds the store next to a JSONL corpus (see write_corpus)."""
+    return write_corpus(iter_jsonl(jsonl_path), corpus_path or corpus_path_for(jsonl_path), codec, frame_rows)
+
+class CorpusReader:
+    """
+    Reads a store written by write_corpus.
+
+    Only the index is loaded up front; the offsets and frames columns of a label
+    are memory-mapped the first time that label is read.
+    """
+
+    def __init__(self, corpus_path):
+        self.path = corpus_path
+        with open(os.path.join(corpus_path, INDEX_FILENAME), encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus version {self.index.get('version')} in {corpus_path}")
+        self.frame_rows = self.index['frame_rows']
+        self._decompress = _decompressor(self.index['codec'])
+        self._columns = {}
+
+    @property
+    def labels(self):
+        return list(self.index['labels'])
+
+    def count(self, label=None):
+        """Rows of one label, or of the whole store."""
+        if label is not None:
+            return self.index['labels'][label]['rows']
+        return sum(partition['rows'] for partition in self.index['labels'].values())
+
+    def __len__(self):
+        return self.count()
+
+    def offsets(self, label):
+        """Memory-mapped int64 start of each text in the uncompressed column of a label (rows + 1)."""
+        return self._load_columns(label)[0]
+
+    def _load_columns(self, label):
+        if label not in self._columns:
+            name = self.index['labels'][label]['name']
+            self._columns[label] = (np.load(os.path.join(self.path, name + '.offsets.npy'), mmap_mode='r'),
+                                    np.load(os.path.join(self.path, name + '.frames.npy'), mmap_mode='r'))
+        return self._columns[label]
+
+    def texts(self, label, start=0, stop=None):
+        """
+        Texts of rows [start, stop) of a label, decompressing only the frames that cover them.
+
+        Returns:
+            list: The texts, in the order they were written.
+        """
+        rows = self.count(label)
+        stop = rows if stop is None else min(stop, rows)
+        if start >= stop:
+            return []
+
+        offsets, frames = self._load_columns(label)
+        first_frame = start // self.frame_rows
+        last_frame = (stop - 1) // self.frame_rows
+        text_path = os.path.join(self.path, self.index['labels'][label]['text_file'])
+        with open(text_path, 'rb') as f:
+            f.seek(int(frames[first_frame]))
+            compressed = f.read(int(frames[last_frame + 1] - frames[first_frame]))
+
+        base = int(frames[first_frame])
+        data = b''.join(self._decompress(compressed[int(frames[frame]) - base:int(frames[frame + 1]) - base])
+                        for frame in range(first_frame, last_frame + 1))
+        data_start = int(offsets[first_frame * self.frame_rows])
+        bounds = np.asarray(offsets[start:stop + 1]) - data_start
+        return [data[bounds[row]:bounds[row + 1]].decode('utf-8') for row in range(stop - start)]
+
+    def iter_texts(self, label, start=0, stop=None):
+        """Streams the texts of a label one frame at a time."""
+        stop = self.count(label) if stop is None else min(stop, self.count(label))
+        position = start
+        while position < stop:
+            frame_stop = min(stop, (position // self.frame_rows + 1) * self.frame_rows)
+            yield from self.texts(label, position, frame_stop)
+            position = frame_stop
+
+    def iter_frames(self, label, frames):
+        """Streams the texts of a label frame by frame, in the given frame order."""
+        for frame in frames:
+            yield from self.texts(label, frame * self.frame_rows, (frame + 1) * self.frame_rows)
+
+    def frame_count(self, label):
+        return self.index['labels'][label]['frames']
+
+    def iter_articles(self, labels=None, limit=None):
+        """
+        Streams {'label', 'text'} dicts, label by label.
+
+        Args:
+            labels (list): Labels to read (default: all, in index order).
+            limit (int): Maximum number of articles.
+        """
+        remaining = limit
+        for label in labels or self.labels:
+            if label not in self.index['labels']:
+                continue
+            stop = None if remaining is None else remaining
+            for text in self.iter_texts(label, 0, stop):
+                yield {'label': label, 'text': text}
+            if remaining is not None:
+                remaining -= min(remaining, self.count(label))
+                if remaining == 0:
+                    return
+
+def iter_articles(path, labels=None, limit=None):
+    """
+    Streams {'label', 'text'} dicts from either a JSONL corpus or a store directory.
+
+    With a store only the requested labels are decompressed; with a JSONL file
+    the whole file is scanned.
+    """
+    if is_corpus(path):
+        yield from CorpusReader(path).iter_articles(labels, limit)
+        return
+
+    count = 0
+    for article in iter_jsonl(path):
+        if limit is not None and count >= limit:
+            return
+        if labels is None or article['label'] in labels:
+            count += 1
+            yield article
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Converts an extracted JSONL corpus into the label-partitioned store')
+    parser.add_argument('jsonl', help='JSONL corpus ({"label", "text"} rows)')
+    parser.add_argument('--output', help='Store directory (default: next to the JSONL, with a .corpus suffix)')
+    parser.add_argument('--codec', choices=['zstd', 'zlib'], default=None)
+    parser.add_argument('--frame-rows', type=int, default=FRAME_ROWS)
+    args = parser.parse_args()
+
+    convert_jsonl(args.jsonl, args.output, args.codec, args.frame_rows)
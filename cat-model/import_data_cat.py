@@ -1,11 +1,24 @@
+import argparse
 import os
 import logging
 from xml.etree import ElementTree as ET
 from collections import defaultdict
 import json
-from bs4 import BeautifulSoup
 import re
+import html
+import html.entities
 import multiprocessing
+import threading
+import hashlib
+import heapq
+import io
+import random
+import tarfile
+import time
+import zipfile
+
+import corpus_store
+import near_duplicates
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,35 +34,235 @@ TARGET_ART_TYPES = {
     "Extrato de Convênio"
 }
 
+# Maximum number of articles kept per artType
+MAX_ARTICLES_PER_LABEL = 1000
+
+# Paths handed to a worker at a time by imap_unordered (amortizes IPC on small files)
+IMAP_CHUNKSIZE = 64
+
+# Paths allowed in flight per worker before the directory walk pauses (bounds memory)
+PENDING_CHUNKS_PER_WORKER = 4
+
+# Width of the first sampling priority band; each following band doubles it. A label is
+# closed at the end of a band, when every file of lower priority has been examined
+SAMPLING_FIRST_BAND = 1 / 64
+
+# Seed for the directory walk order and the sampling priorities
+SAMPLING_SEED = 42
+
+# Bytes read from the start of a file when looking for the artType attribute
+PREFILTER_BYTES = 4096
+ART_TYPE_PATTERN = re.compile(rb'<article\b[^>]*?\sartType\s*=\s*(["\'])(.*?)\1', re.DOTALL)
+
+# Archives read directly, without extracting them to disk
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+# Separates the archive path from the member name in a source ("dump.zip::a/b.xml")
+ARCHIVE_SEPARATOR = '::'
+
+# Archives opened by this process, reused by every member it reads
+_open_archives = {}
+
+# Manifest records written between two fsyncs
+MANIFEST_FLUSH_EVERY = 1000
+
+# Fixed order of the labels in the shared quota array
+LABEL_INDEX = {label: i for i, label in enumerate(sorted(TARGET_ART_TYPES))}
+
+# Per-label priority threshold shared with the workers (set by _init_worker)
+_label_thresholds = None
+
+# HTML markup replaced by a space: script/style/template blocks, comments, CDATA
+# sections (their content is kept as is), declarations and tags (attributes may
+# contain '>'); then character references, decoded as html.parser does: only when
+# followed by another character, with an optional ';', and named ones only when
+# the whole name is an HTML entity
+MARKUP_PATTERN = re.compile(r'<(?:(script|style|template)\b[^>]*>.*?</\1\s*>|!--.*?(?:-->|$)'
+                            r'|!\[CDATA\[(.*?)\]\]>|[a-zA-Z/!?](?:[^>"\']|"[^"]*"|\'[^\']*\')*>)'
+                            r'|&(?:#([0-9]+|[xX][0-9a-fA-F]+)(?=[^0-9a-fA-F]);?'
+                            # html.parser gives up on any other '&#' with no ';' after it: the rest is kept as is
+                            r'|(#[^;]*\Z)'
+                            r'|([a-zA-Z][-.a-zA-Z0-9]*)(?=[^a-zA-Z0-9]);?'
+                            # html.parser drops the '&' of a two-character reference ending the input ("P&D")
+                            r'|(?=[a-zA-Z]\Z))',
+                            re.IGNORECASE | re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def _numeric_reference(number):
+    # Same resolution as BeautifulSoup: invalid code points become U+FFFD, C1 controls
+    # are read as windows-1252 and other controls are kept
+    code = int(number[1:], 16) if number[0] in 'xX' else int(number)
+    if code == 0 or code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+        return '\ufffd'
+    if 0x80 <= code <= 0x9F:
+        return html.unescape(f'&#{code};')
+    return chr(code)
+
+def _replace_markup(match):
+    cdata, number, rest, name = match.group(2, 3, 4, 5)
+    if cdata is not None:
+        return f' {cdata} '
+    if rest is not None:
+        return '&' + rest
+    if number is not None:
+        return _numeric_reference(number)
+    if name is not None:
+        return html.entities.html5.get(name + ';', '&' + name)
+    if match.group() == '&':
+        return ''
+    return ' '
+
 def clean_text(text):
-    """Removes HTML tags and normalizes whitespace."""
-    soup = BeautifulSoup(text, "html.parser")
-    cleaned_text = soup.get_text(" ")
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
-    return cleaned_text
-
-def extract_article_details(xml_path):
-    """Extracts the article details from an XML file."""
-    if not os.path.exists(xml_path):
+    """
+    Removes HTML tags and normalizes whitespace.
+
+    Equivalent to BeautifulSoup(text, "html.parser").get_text(" ") followed by
+    whitespace collapsing, in a single regex pass without building a parse tree:
+    markup becomes a space and character references are decoded with the same
+    rules as html.parser. The exception is input html.parser stops parsing
+    partway through (for instance a second '&#' that starts no reference), where
+    it keeps the rest as literal text. tests/test_import_data_cat.py compares
+    both.
+    """
+    text = MARKUP_PATTERN.sub(_replace_markup, text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def sampling_priority(xml_path, seed=SAMPLING_SEED):
+    """Deterministic pseudo-random priority in [0, 1) used by the reservoir sampling."""
+    digest = hashlib.blake2b(f"{seed}:{xml_path}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+def sampling_bands(first=SAMPLING_FIRST_BAND):
+    """Consecutive [low, high) sampling priority ranges, doubling in width up to 1."""
+    low, high = 0.0, first
+    while low < 1.0:
+        yield low, high
+        low, high = high, min(1.0, high * 2)
+
+def _init_worker(label_thresholds):
+    global _label_thresholds
+    _label_thresholds = label_thresholds
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def _archive(archive_path):
+    """Opens an archive once per process and indexes its members by name."""
+    if archive_path not in _open_archives:
+        if zipfile.is_zipfile(archive_path):
+            archive = zipfile.ZipFile(archive_path)
+            members = {info.filename: info for info in archive.infolist()}
+        else:
+            archive = tarfile.open(archive_path)
+            members = {member.name: member for member in archive.getmembers()}
+        _open_archives[archive_path] = (archive, members)
+    return _open_archives[archive_path]
+
+def _member_mtime(info):
+    if isinstance(info, zipfile.ZipInfo):
+        return int(time.mktime(info.date_time + (0, 0, -1))) * 10 ** 9
+    return int(info.mtime) * 10 ** 9
+
+def open_source(source):
+    """
+    Opens a source as a seekable binary stream.
+
+    A source is either an XML file path or an archive member written as
+    "<archive>::<member>". Zip members are decompressed lazily; tar members are
+    read whole, since seeking back in a compressed tar means decompressing it again.
+    """
+    if ARCHIVE_SEPARATOR not in source:
+        return open(source, 'rb')
+    archive_path, member_name = source.split(ARCHIVE_SEPARATOR, 1)
+    archive, members = _archive(archive_path)
+    if isinstance(archive, zipfile.ZipFile):
+        return archive.open(members[member_name])
+    return io.BytesIO(archive.extractfile(members[member_name]).read())
+
+def _art_type_in_head(head):
+    match = ART_TYPE_PATTERN.search(head)
+    if match:
+        try:
+            return html.unescape(match.group(2).decode('utf-8'))
+        except UnicodeDecodeError:
+            pass
+    return None
+
+def _art_type_by_iterparse(stream):
+    stream.seek(0)
+    for _, element in ET.iterparse(stream, events=('start',)):
+        if element.tag == 'article':
+            return element.get('artType')
+    return None
+
+def read_art_type(source, max_bytes=PREFILTER_BYTES):
+    """
+    Reads the artType of the <article> element without parsing the whole file.
+
+    Scans only the first `max_bytes` bytes; if the attribute is not there (or the
+    bytes cannot be decoded), falls back to an incremental iterparse that stops
+    at the <article> start tag. Accepts a source or an open binary stream.
+    """
+    if isinstance(source, str):
+        with open_source(source) as stream:
+            return read_art_type(stream, max_bytes)
+
+    art_type = _art_type_in_head(source.read(max_bytes))
+    if art_type is not None:
+        return art_type
+    return _art_type_by_iterparse(source)
+
+def extract_article_details(xml_path, fingerprint=None):
+    """
+    Extracts the article details from an XML file (or archive member).
+
+    The artType is read from the opening bytes first; only files of a target
+    type are read in full, parsed and cleaned. With a `fingerprint` dict
+    (incremental runs), the content hash of those files is stored in it,
+    computed from the same bytes that are parsed; other files are never hashed.
+
+    Inside the pool, articles whose sampling priority does not beat the current
+    threshold of their label (or whose label is already full) are returned
+    without text, so clean_text only runs for articles that may be kept.
+    """
+    if ARCHIVE_SEPARATOR not in xml_path and not os.path.exists(xml_path):
         logging.error("File does not exist: %s", xml_path)
         return None
 
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        article = root.find('.//article')
-        artType = article.get('artType') if article else None
-        if artType in TARGET_ART_TYPES:
-            text_element = root.find('.//Texto')
-            text_content = text_element.text if text_element is not None else ""
-            article_details = {
-                'label': artType,
-                'text': clean_text(text_content)
-            }
-            logging.debug("Extracted artType: %s from file: %s", artType, xml_path)
-            return article_details
-        else:
-            return None
+        with open_source(xml_path) as stream:
+            head = stream.read(PREFILTER_BYTES)
+            artType = _art_type_in_head(head)
+            if artType is None:
+                artType = _art_type_by_iterparse(stream)
+                head = None
+            if artType not in TARGET_ART_TYPES:
+                return None
+
+            data = None
+            if fingerprint is not None:
+                data = _read_all(stream, head)
+                fingerprint['sha256'] = hashlib.sha256(data).hexdigest()
+
+            priority = None
+            if _label_thresholds is not None:
+                priority = sampling_priority(xml_path)
+                if priority >= _label_thresholds[LABEL_INDEX[artType]]:
+                    return {'label': artType, 'text': None, 'priority': priority}
+
+            if data is None:
+                data = _read_all(stream, head)
+        root = ET.fromstring(data)
+        text_element = root.find('.//Texto')
+        text_content = text_element.text if text_element is not None else ""
+        article_details = {
+            'label': artType,
+            'text': clean_text(text_content)
+        }
+        if priority is not None:
+            article_details['priority'] = priority
+        logging.debug("Extracted artType: %s from file: %s", artType, xml_path)
+        return article_details
     except ET.ParseError as e:
         logging.error("XML parsing error at %s: %s", xml_path, e)
         return None
@@ -57,59 +270,411 @@ def extract_article_details(xml_path):
         logging.error("Error processing %s: %s", xml_path, e)
         return None
 
-def process_directory_parallel(root_directory):
-    """Processes XML files from a directory using multiprocessing."""
-    logging.info("Process started for directory: %s", root_directory)
-    if not os.path.exists(root_directory):
-        logging.error("Root directory not found: %s", root_directory)
-        return
+def _read_all(stream, head):
+    """The whole content, reusing the opening bytes when the stream is still right after them."""
+    if head is None:
+        stream.seek(0)
+        return stream.read()
+    return head + stream.read()
+
+def iter_archive_members(archive_path, rng=None):
+    """
+    Yields (source, size, mtime) for the XML members of an archive.
 
-    xml_paths = []
-    for dirpath, _, filenames in os.walk(root_directory):
+    Zip members are shuffled like files when `rng` is given; tar members keep
+    the archive order so a compressed tar is only decompressed forward.
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [info for info in archive.infolist() if info.filename.endswith('.xml')]
+        if rng is not None:
+            rng.shuffle(members)
+        for info in members:
+            yield archive_path + ARCHIVE_SEPARATOR + info.filename, info.file_size, _member_mtime(info)
+    else:
+        with tarfile.open(archive_path) as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith('.xml'):
+                    yield archive_path + ARCHIVE_SEPARATOR + member.name, member.size, _member_mtime(member)
+
+def iter_sources(root_directory, seed=SAMPLING_SEED, archive_listings=None):
+    """
+    Yields (source, size, mtime) for every XML file and archive member under the
+    given directories or archive paths; size and mtime are None for plain files.
+
+    With an `archive_listings` dict, the member list of each archive is kept in it
+    and reused by later walks, so a compressed tar is only scanned once.
+    """
+    rng = random.Random(seed) if seed is not None else None
+
+    def members(archive_path):
+        if archive_listings is None:
+            return iter_archive_members(archive_path, rng)
+        if archive_path not in archive_listings:
+            archive_listings[archive_path] = list(iter_archive_members(archive_path, rng))
+        return archive_listings[archive_path]
+
+    roots = [root_directory] if isinstance(root_directory, str) else root_directory
+    for root in roots:
+        if is_archive(root):
+            yield from members(root)
+            continue
+        for path in iter_xml_paths(root, seed, include_archives=True):
+            if is_archive(path):
+                yield from members(path)
+            else:
+                yield path, None, None
+
+def iter_xml_paths(root_directory, seed=SAMPLING_SEED, include_archives=False):
+    """
+    Yields XML file paths lazily while walking the directory tree.
+
+    With a seed, directories and files are visited in a shuffled (but
+    reproducible) order, so stopping early does not favour the first dumps.
+    """
+    rng = random.Random(seed) if seed is not None else None
+    for dirpath, dirnames, filenames in os.walk(root_directory):
+        if rng is not None:
+            dirnames.sort()
+            rng.shuffle(dirnames)
+            filenames = sorted(filenames)
+            rng.shuffle(filenames)
         for filename in filenames:
-            if filename.endswith('.xml'):
-                xml_paths.append(os.path.join(dirpath, filename))
+            if filename.endswith('.xml') or (include_archives and is_archive(filename)):
+                yield os.path.join(dirpath, filename)
+
+def _bounded(iterable, semaphore):
+    """Pauses the iteration while too many items are waiting in the pool."""
+    for item in iterable:
+        semaphore.acquire()
+        yield item
+
+def source_stat(xml_path):
+    """Size and mtime (ns) of a file, or of an archive member as recorded in the archive index."""
+    if ARCHIVE_SEPARATOR in xml_path:
+        archive_path, member_name = xml_path.split(ARCHIVE_SEPARATOR, 1)
+        info = _archive(archive_path)[1][member_name]
+        size = info.file_size if isinstance(info, zipfile.ZipInfo) else info.size
+        return size, _member_mtime(info)
+    stat = os.stat(xml_path)
+    return stat.st_size, stat.st_mtime_ns
+
+def extract_with_fingerprint(xml_path):
+    """
+    Pool task of incremental runs: the file fingerprint and its article details.
+
+    Size and mtime come from stat (or the archive index); the content hash is
+    only filled in for files that pass the artType prefilter.
+    """
+    try:
+        size, mtime = source_stat(xml_path)
+    except (OSError, KeyError) as e:
+        logging.error("Error reading %s: %s", xml_path, e)
+        return None, None
+    fingerprint = {'path': xml_path, 'size': size, 'mtime': mtime, 'sha256': None}
+    return fingerprint, extract_article_details(xml_path, fingerprint)
+
+class Manifest:
+    """
+    Append-only JSONL record of the files already ingested, keyed by path.
+
+    A file is skipped on later runs while its size and mtime match; when they
+    change, the content hash (kept only for files of a target artType) decides
+    whether it really has to be re-ingested.
+    Unflushed records are simply lost on a crash, which only means those files
+    are processed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # last line of an interrupted run
+                    self.entries[entry['path']] = entry
+        self._file = open(path, 'a', encoding='utf-8')
+        self._unflushed = 0
+
+    def is_unchanged(self, xml_path, size=None, mtime=None):
+        """
+        True when the file was already ingested and its size and mtime did not
+        change (archive members pass the values read from the archive index).
+        """
+        entry = self.entries.get(xml_path)
+        if entry is None:
+            return False
+        if size is None:
+            try:
+                stat = os.stat(xml_path)
+            except OSError:
+                return False
+            size, mtime = stat.st_size, stat.st_mtime_ns
+        return entry['size'] == size and entry['mtime'] == mtime
 
-    logging.info("Total XML files found: %d", len(xml_paths))
-    xml_paths = xml_paths[:5000]  # Processa apenas 5000 arquivos para teste
-    logging.info("Limited to %d files for testing", len(xml_paths))
+    def same_content(self, fingerprint):
+        entry = self.entries.get(fingerprint['path'])
+        return (entry is not None and fingerprint['sha256'] is not None and
+                entry.get('sha256') == fingerprint['sha256'])
 
-    with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-        articles = pool.map(extract_article_details, xml_paths)
+    def record(self, fingerprint, label=None, kept=False):
+        entry = dict(fingerprint, label=label, kept=kept)
+        self.entries[entry['path']] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._unflushed += 1
+        if self._unflushed >= MANIFEST_FLUSH_EVERY:
+            self.flush()
 
-    articles = [article for article in articles if article is not None]
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
 
-    artType_collections = defaultdict(list)
-    for article in articles:
-        if len(artType_collections[article['label']]) < 1000:
-            artType_collections[article['label']].append(article)
+    def close(self):
+        self.flush()
+        self._file.close()
 
-    for artType, collected_articles in artType_collections.items():
-        logging.info("Collected %d articles for artType: %s", len(collected_articles), artType)
+def _load_sampling_state(state_path):
+    if state_path and os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
 
-    return artType_collections
+def _save_sampling_state(state_path, sampling):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sampling, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
 
-def save_collections_to_jsonl(artType_collections, output_file_path):
-    """Saves the collected articles to a single JSONL file."""
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        for articles in artType_collections.values():
-            for article in articles:
-                json_line = json.dumps(article, ensure_ascii=False)
-                f.write(json_line + '\n')
+def _write_reservoir(f, reservoir, manifest=None):
+    """Writes the sampled articles and only then records their files in the manifest."""
+    for _, _, article, _ in reservoir:
+        f.write(json.dumps(article, ensure_ascii=False) + '\n')
+    f.flush()
+    if manifest is not None:
+        os.fsync(f.fileno())
+        for _, _, article, fingerprint in reservoir:
+            manifest.record(fingerprint, article['label'], kept=True)
+        manifest.flush()
+
+def process_directory_parallel(root_directory, output_file_path, processes=None, chunksize=IMAP_CHUNKSIZE,
+                               quota=MAX_ARTICLES_PER_LABEL, first_band=SAMPLING_FIRST_BAND, manifest_path=None):
+    """
+    Processes XML files from a directory using multiprocessing, streaming the
+    results to a JSONL file.
+
+    `root_directory` may also be a zip/tar archive or a list of directories and
+    archives; archives (including those found in the directories) are read in
+    place, member by member, without being extracted.
+
+    The directory walk feeds imap_unordered lazily, so memory stays constant
+    regardless of the corpus size. Each label keeps the `quota` articles of
+    lowest sampling priority (a hash of the path): a bottom-k sample of all the
+    files, whatever the walk order. The listing is walked once per priority band
+    (see sampling_bands), feeding the pool only the files in that band. At the
+    end of a band every file of lower priority has been examined, so a label
+    whose reservoir is full holds its final sample and is written out and
+    closed. The workers share the priority needed to enter each reservoir and
+    skip clean_text for articles that would not, and no band is started once
+    every label in TARGET_ART_TYPES is closed.
+
+    A closed label keeps its threshold, the highest priority it kept; a label
+    that ran out of files before filling its quota gets the threshold 1.0 and
+    takes new files until it does. With a manifest the run is incremental: the
+    thresholds are saved next to it (<manifest>.sampling.json), and once every
+    label has one, later runs walk the listing once and only examine files
+    below the highest threshold. New or changed files below their label's
+    threshold are appended to the output, the articles the sample would have
+    held had they been there from the start, so the output grows with the new
+    files and not with the files left unexamined by the early stop. Every
+    closed label is a checkpoint: an interrupted run resumes from it on the
+    next call.
+    Returns the number of articles written per artType.
+    """
+    logging.info("Process started for directory: %s", root_directory)
+    roots = [root_directory] if isinstance(root_directory, str) else root_directory
+    missing = [root for root in roots if not os.path.exists(root)]
+    if missing:
+        logging.error("Root directory not found: %s", ', '.join(missing))
+        return {}
+
+    manifest = Manifest(manifest_path) if manifest_path else None
+    state_path = manifest_path + '.sampling.json' if manifest_path else None
+    # label -> {'kept', 'max_priority', 'threshold'}; the labels missing are still sampled by bands
+    sampling = _load_sampling_state(state_path)
+    open_labels = TARGET_ART_TYPES - set(sampling)
+    if sampling and open_labels:
+        logging.info("Resuming interrupted run; closed artTypes: %s", ', '.join(sorted(sampling)))
+
+    def admission_bound():
+        if open_labels:
+            return 1.0
+        return max((state['threshold'] for state in sampling.values()), default=0.0)
+
+    processes = processes or multiprocessing.cpu_count()
+    # Released as each result arrives; the pool's task feeder blocks once the limit is reached
+    pending = threading.Semaphore(processes * chunksize * PENDING_CHUNKS_PER_WORKER)
+    archive_listings = {}
+
+    def band_paths(low, high):
+        high = min(high, admission_bound())
+        for source, size, mtime in iter_sources(root_directory, archive_listings=archive_listings):
+            if not low <= sampling_priority(source) < high:
+                continue
+            if manifest is not None and manifest.is_unchanged(source, size, mtime):
+                continue
+            yield source
+
+    task = extract_with_fingerprint if manifest is not None else extract_article_details
+
+    label_thresholds = multiprocessing.Array('d', [sampling[label]['threshold'] if label in sampling else 1.0
+                                                   for label in LABEL_INDEX])
+    reservoirs = defaultdict(list)  # max-heaps of (-priority, sequence, article, fingerprint)
+    admitted = []  # articles of closed labels below their threshold, written in batches
+    candidates = defaultdict(int)
+    artType_counts = defaultdict(int)
+    files_processed = 0
+
+    def write_admitted():
+        _write_reservoir(f, admitted, manifest)
+        admitted.clear()
+        if state_path:
+            _save_sampling_state(state_path, sampling)
+
+    # Once every label has a threshold there is nothing to rank: one walk is enough
+    bands = sampling_bands(first_band) if open_labels else [(0.0, 1.0)]
+
+    with open(output_file_path, 'a' if manifest is not None else 'w', encoding='utf-8') as f, \
+            multiprocessing.Pool(processes=processes, initializer=_init_worker,
+                                 initargs=(label_thresholds,)) as pool:
+        for low, high in bands:
+            if low >= admission_bound():
+                logging.info("All artTypes reached their quota; stopping early at priority %.4f", low)
+                break
+            # Archive members are split across the pool in chunks; each worker opens an archive once
+            xml_paths = _bounded(band_paths(low, high), pending)
+            for result in pool.imap_unordered(task, xml_paths, chunksize=chunksize):
+                pending.release()
+                files_processed += 1
+                if files_processed % 10000 == 0:
+                    logging.info("Processed %d XML files", files_processed)
+
+                fingerprint, article = result if manifest is not None else (None, result)
+                if fingerprint is not None and manifest.same_content(fingerprint):
+                    # Only touched (mtime changed): its article, if any, is already in the output
+                    previous = manifest.entries[fingerprint['path']]
+                    manifest.record(fingerprint, previous['label'], previous['kept'])
+                    continue
+                if article is None:
+                    if fingerprint is not None:
+                        manifest.record(fingerprint)
+                    continue
+                label = article['label']
+                priority = article.pop('priority')
+
+                state = sampling.get(label)
+                if state is not None:
+                    if (article['text'] is not None and priority < state['threshold'] and
+                            (state['threshold'] < 1.0 or state['kept'] < quota)):
+                        admitted.append((-priority, files_processed, article, fingerprint))
+                        artType_counts[label] += 1
+                        state['kept'] += 1
+                        state['max_priority'] = max(state['max_priority'], priority)
+                        if state['threshold'] == 1.0 and state['kept'] >= quota:
+                            state['threshold'] = label_thresholds[LABEL_INDEX[label]] = state['max_priority']
+                        if len(admitted) >= MANIFEST_FLUSH_EVERY:
+                            write_admitted()
+                    elif fingerprint is not None:
+                        manifest.record(fingerprint, label)
+                    continue
+
+                candidates[label] += 1
+                reservoir = reservoirs[label]
+                evicted = fingerprint
+                if article['text'] is not None:
+                    entry = (-priority, files_processed, article, fingerprint)
+                    if len(reservoir) < quota:
+                        heapq.heappush(reservoir, entry)
+                        evicted = None
+                    elif priority < -reservoir[0][0]:
+                        evicted = heapq.heapreplace(reservoir, entry)[3]
+                    if len(reservoir) == quota:
+                        label_thresholds[LABEL_INDEX[label]] = -reservoir[0][0]
+                if evicted is not None:
+                    manifest.record(evicted, label)
+
+            # Files of a later band all have a higher priority than anything in a full reservoir
+            for label in [label for label, reservoir in reservoirs.items() if len(reservoir) == quota]:
+                reservoir = reservoirs.pop(label)
+                threshold = -reservoir[0][0]
+                label_thresholds[LABEL_INDEX[label]] = threshold
+                _write_reservoir(f, reservoir, manifest)
+                artType_counts[label] = len(reservoir)
+                sampling[label] = {'kept': len(reservoir), 'max_priority': threshold, 'threshold': threshold}
+                open_labels.discard(label)
+                write_admitted()
+                logging.info("Quota reached for artType %s after %d candidates (priority below %.4f)",
+                             label, candidates[label], high)
+
+        # Every band was walked: the open labels ran out of files
+        for label in sorted(open_labels):
+            reservoir = reservoirs.pop(label, [])
+            _write_reservoir(f, reservoir, manifest)
+            artType_counts[label] = len(reservoir)
+            sampling[label] = {'kept': len(reservoir), 'max_priority': max((-entry[0] for entry in reservoir),
+                                                                           default=0.0), 'threshold': 1.0}
+        write_admitted()
+
+    if manifest is not None:
+        manifest.close()
+
+    logging.info("Total XML files processed: %d", files_processed)
+    for artType, count in artType_counts.items():
+        logging.info("Collected %d articles for artType: %s", count, artType)
     logging.info("Saved collected articles to %s", output_file_path)
 
+    return dict(artType_counts)
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extracts the target articles from DOU XML dumps')
+    parser.add_argument('inputs', nargs='*', default=['data'],
+                        help='Directories and zip/tar archives with DOU XML files (default: data)')
+    parser.add_argument('--full', action='store_true',
+                        help='Discard the manifest and rebuild the output from scratch')
+    parser.add_argument('--dedup-threshold', type=float, default=near_duplicates.DEFAULT_THRESHOLD,
+                        help='Similarity above which same-label articles are near-duplicates (0 disables)')
+    parser.add_argument('--dedup-num-perm', type=int, default=near_duplicates.DEFAULT_NUM_PERM)
+    parser.add_argument('--shingle-size', type=int, default=near_duplicates.DEFAULT_SHINGLE_SIZE)
+    parser.add_argument('--columnar', action='store_true',
+                        help='Also write a compressed, label-partitioned store (extracted_articles.corpus)')
+    args = parser.parse_args()
+
     try:
-        root_directory = os.path.abspath('data')
+        root_directory = [os.path.abspath(path) for path in args.inputs]
         output_directory = os.path.abspath('Categoria/output-data')
         output_file_path = os.path.join(output_directory, "extracted_articles.jsonl")
+        manifest_path = os.path.join(output_directory, "extracted_articles.manifest.jsonl")
 
         if not os.path.exists(output_directory):
             os.makedirs(output_directory)
             logging.info("Output directory created: %s", output_directory)
 
-        artType_collections = process_directory_parallel(root_directory)
-        save_collections_to_jsonl(artType_collections, output_file_path)
+        if args.full:
+            for path in (output_file_path, manifest_path, manifest_path + '.sampling.json'):
+                if os.path.exists(path):
+                    os.remove(path)
+            near_duplicates.remove_state(output_file_path)
+            logging.info("Full rebuild: manifest and output discarded")
+
+        process_directory_parallel(root_directory, output_file_path, manifest_path=manifest_path)
+        if args.dedup_threshold > 0:
+            near_duplicates.deduplicate_jsonl(output_file_path, args.dedup_threshold, args.dedup_num_perm,
+                                              args.shingle_size)
+        if args.columnar:
+            corpus_store.convert_jsonl(output_file_path)
     except Exception as e:
         logging.error("An error occurred: %s", e)
         raise
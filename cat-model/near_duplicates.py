@@ -0,0 +1,469 @@
+"""
+Near-duplicate removal for the extracted corpus (MinHash + LSH).
+
+Templated articles (extratos that differ only in numbers and dates) are found
+by comparing MinHash signatures of word shingles, with numbers normalized to 0.
+Only articles with the same label are compared. Each article is checked
+against the earliest kept article of every LSH bucket it falls in, so the first
+occurrence is kept and nothing is removed through an article that was itself
+removed.
+
+The corpus only grows by appending, so the state of the previous runs is kept
+next to it, in `<corpus>.minhash/`:
+
+    state.json                  parameters, labels, kept rows, JSONL bytes already deduplicated
+    signatures.u32              MinHash signatures of the kept rows (rows x num_perm)
+    labels.u32                  label id of each kept row
+    segment-00000.keys.npy      LSH band keys of a range of kept rows, sorted per band
+    segment-00000.rows.npy      kept row of each key
+
+A run only reads and signs the rows appended since the last one, queries them
+against the stored buckets with a binary search per band, and rewrites only
+the tail of the JSONL. Segments are merged geometrically (a segment is merged
+into the previous one once it reaches half its size), so there are O(log n) of
+them. New rows are processed in blocks of DEDUP_BLOCK_ROWS, which also bounds
+the memory of a first run over millions of articles. state.json is the commit
+point; anything written after it by an interrupted run is discarded on the
+next one.
+"""
+
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import zlib
+from collections import Counter
+
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Estimated Jaccard similarity above which two articles are duplicates
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+
+# Shingles hashed at once when computing signatures (bounds the temporary matrix)
+SIGNATURE_CHUNK_SHINGLES = 100000
+
+# The LSH curve is placed this much below the threshold: candidates are verified
+# on the full signature anyway, so recall matters more than extra candidates
+LSH_RECALL_MARGIN = 0.1
+
+# New rows signed and deduplicated together (bounds the memory of a first run)
+DEDUP_BLOCK_ROWS = 100000
+
+STATE_VERSION = 1
+KEY_MULTIPLIER = np.uint64(0x100000001B3)
+
+WORD_PATTERN = re.compile(r'\w+')
+DIGIT_PATTERN = re.compile(r'\d+')
+
+def shingle_hashes(text, shingle_size=DEFAULT_SHINGLE_SIZE):
+    """32-bit hashes of the distinct word shingles of a text (every number counts as 0)."""
+    words = WORD_PATTERN.findall(DIGIT_PATTERN.sub('0', text.lower()))
+    if not words:
+        return np.zeros(1, dtype=np.uint64)
+    tokens = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+    size = min(shingle_size, len(tokens))
+    count = len(tokens) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * np.uint64(1000003) + tokens[offset:offset + count]  # wraps modulo 2**64
+    return np.unique(hashes & MAX_HASH)
+
+def _permutations(num_perm, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(MAX_HASH), size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, int(MAX_HASH), size=num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signatures(shingle_sets, a, b):
+    """
+    MinHash signatures of several shingle sets in one vectorized pass.
+
+    Args:
+        shingle_sets (list): Non-empty arrays of 32-bit shingle hashes.
+        a, b (numpy.ndarray): Coefficients of the (a * x + b) mod p permutations.
+
+    Returns:
+        numpy.ndarray: One uint32 signature row per set.
+    """
+    values = np.concatenate(shingle_sets)
+    starts = np.cumsum([0] + [len(shingles) for shingles in shingle_sets[:-1]])
+    # a, b and x are below 2**32, so a * x + b fits in 64 bits
+    permuted = (values[:, None] * a[None, :] + b[None, :]) % MERSENNE_PRIME
+    return (np.minimum.reduceat(permuted, starts, axis=0) & MAX_HASH).astype(np.uint32)
+
+def lsh_parameters(threshold, num_perm, margin=LSH_RECALL_MARGIN):
+    """Bands and rows whose LSH threshold (1/b)^(1/r) is the closest one not above `threshold - margin`."""
+    threshold -= margin
+    best = (num_perm, 1)
+    best_threshold = 0.0
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        lsh_threshold = (1.0 / bands) ** (1.0 / rows)
+        if best_threshold < lsh_threshold <= threshold:
+            best, best_threshold = (bands, rows), lsh_threshold
+    return best
+
+def band_keys(signatures, labels, bands, rows):
+    """64-bit key of every (band, row): the label and the band's signature values, hashed together."""
+    keys = np.empty((bands, len(labels)), dtype=np.uint64)
+    for band in range(bands):
+        columns = np.asarray(signatures[:, band * rows:(band + 1) * rows], dtype=np.uint64)
+        band_key = labels.astype(np.uint64)
+        for column in range(rows):
+            band_key = band_key * KEY_MULTIPLIER + columns[:, column]  # wraps modulo 2**64
+        keys[band] = band_key
+    return keys
+
+def resolve_block(signatures, labels, keys, old_rows, old_signatures, old_labels, threshold):
+    """
+    Marks the duplicates of a block of new rows, in row order.
+
+    A row is compared with the representative of each bucket it falls in: the
+    earliest kept row of the index (`old_rows`) or, failing that, the first row
+    of the block kept in that bucket. Removed rows never become representatives.
+
+    Args:
+        signatures (numpy.ndarray): Signatures of the block.
+        labels (numpy.ndarray): Label ids of the block.
+        keys (numpy.ndarray): band_keys() of the block (bands x rows).
+        old_rows (numpy.ndarray): Kept row of the index in the same bucket, per (band, row), or -1.
+        old_signatures, old_labels: Signatures and label ids of the index rows.
+        threshold (float): Share of equal signature values that makes a duplicate.
+
+    Returns:
+        numpy.ndarray: Boolean duplicate flag per row of the block.
+    """
+    bands, count = keys.shape
+    repeated = np.zeros((bands, count), dtype=bool)
+    for band in range(bands):
+        _, inverse, counts = np.unique(keys[band], return_inverse=True, return_counts=True)
+        repeated[band] = counts[inverse] > 1
+    colliding = repeated | (old_rows >= 0)
+
+    duplicates = np.zeros(count, dtype=bool)
+    representatives = {}  # (band, key) -> first kept row of the block in that bucket
+    for row in np.flatnonzero(colliding.any(axis=0)):
+        row_bands = np.flatnonzero(colliding[:, row])
+        checked = set()
+        for band in row_bands:
+            old_row = int(old_rows[band, row])
+            if old_row >= 0:
+                candidate = ('index', old_row)
+                other, other_label = old_signatures[old_row], old_labels[old_row]
+            else:
+                new_row = representatives.get((band, int(keys[band, row])))
+                if new_row is None:
+                    continue
+                candidate = ('block', new_row)
+                other, other_label = signatures[new_row], labels[new_row]
+            if candidate in checked:
+                continue
+            checked.add(candidate)
+            if other_label == labels[row] and (np.asarray(other) == signatures[row]).mean() >= threshold:
+                duplicates[row] = True
+                break
+        if not duplicates[row]:
+            for band in row_bands:
+                if repeated[band, row]:
+                    representatives.setdefault((band, int(keys[band, row])), row)
+    return duplicates
+
+class DedupIndex:
+    """Persistent signatures and LSH buckets of the rows kept so far (see the module docstring)."""
+
+    def __init__(self, directory, num_perm, shingle_size, threshold):
+        self.directory = directory
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.bands, self.rows_per_band = lsh_parameters(threshold, num_perm)
+        parameters = {'num_perm': num_perm, 'shingle_size': shingle_size, 'threshold': threshold,
+                      'bands': self.bands, 'rows_per_band': self.rows_per_band}
+
+        self.state = self._load_state()
+        if self.state is None or self.state.get('parameters') != parameters:
+            if self.state is not None:
+                logging.info("Deduplication parameters changed; rebuilding %s", directory)
+            shutil.rmtree(directory, ignore_errors=True)
+            self.state = {'version': STATE_VERSION, 'parameters': parameters, 'labels': [], 'rows': 0,
+                          'bytes': 0, 'segments': [], 'next_segment': 0, 'pending_tail': None}
+        os.makedirs(directory, exist_ok=True)
+        self._discard_uncommitted()
+
+        self.rows = self.state['rows']
+        self.segments = list(self.state['segments'])
+        self.label_index = {label: i for i, label in enumerate(self.state['labels'])}
+        self._obsolete = []
+        self._open_signatures()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_state(self):
+        try:
+            with open(self._path('state.json'), encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return state if state.get('version') == STATE_VERSION else None
+
+    def _discard_uncommitted(self):
+        # Rows appended and segments written after the last commit belong to an interrupted run
+        rows = self.state['rows']
+        for name, width in (('signatures.u32', self.num_perm), ('labels.u32', 1)):
+            with open(self._path(name), 'ab') as f:
+                f.truncate(rows * width * 4)
+        committed = {segment['name'] for segment in self.state['segments']}
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.split('.')[0] not in committed:
+                os.remove(self._path(name))
+
+    def _open_signatures(self):
+        if self.rows:
+            self.signatures = np.memmap(self._path('signatures.u32'), dtype=np.uint32, mode='r',
+                                        shape=(self.rows, self.num_perm))
+            self.labels = np.memmap(self._path('labels.u32'), dtype=np.uint32, mode='r', shape=(self.rows,))
+        else:
+            self.signatures = np.zeros((0, self.num_perm), dtype=np.uint32)
+            self.labels = np.zeros(0, dtype=np.uint32)
+
+    def label_id(self, label):
+        return self.label_index.setdefault(label, len(self.label_index))
+
+    def _load_segment(self, segment):
+        name = segment['name']
+        return (np.load(self._path(name + '.keys.npy'), mmap_mode='r'),
+                np.load(self._path(name + '.rows.npy'), mmap_mode='r'))
+
+    def query(self, keys):
+        """Earliest kept row in the bucket of every (band, new row), or -1."""
+        found = np.full(keys.shape, -1, dtype=np.int64)
+        for segment in self.segments:  # oldest first, so the earliest row wins
+            segment_keys, segment_rows = self._load_segment(segment)
+            for band in range(self.bands):
+                missing = np.flatnonzero(found[band] < 0)
+                if not len(missing):
+                    continue
+                positions = np.searchsorted(segment_keys[band], keys[band, missing])
+                inside = positions < segment_keys.shape[1]
+                hit = np.zeros(len(missing), dtype=bool)
+                hit[inside] = segment_keys[band][positions[inside]] == keys[band, missing[inside]]
+                found[band, missing[hit]] = segment_rows[band][positions[hit]]
+        return found
+
+    def _write_segment(self, count, band_data):
+        """
+        Writes a segment one band at a time.
+
+        Args:
+            count (int): Rows in the segment.
+            band_data (callable): band -> (keys, rows) of that band, rows in increasing order.
+        """
+        name = f"segment-{self.state['next_segment']:05d}"
+        self.state['next_segment'] += 1
+        sorted_keys = np.lib.format.open_memmap(self._path(name + '.keys.npy'), mode='w+', dtype=np.uint64,
+                                                shape=(self.bands, count))
+        sorted_rows = np.lib.format.open_memmap(self._path(name + '.rows.npy'), mode='w+', dtype=np.int64,
+                                                shape=(self.bands, count))
+        for band in range(self.bands):
+            keys, rows = band_data(band)
+            # Stable, so the earliest row of a bucket comes first
+            order = np.argsort(keys, kind='stable')
+            sorted_keys[band] = keys[order]
+            sorted_rows[band] = rows[order]
+        sorted_keys.flush()
+        sorted_rows.flush()
+        del sorted_keys, sorted_rows
+        return {'name': name, 'rows': count}
+
+    def _merge_last_segments(self):
+        while len(self.segments) >= 2 and self.segments[-1]['rows'] * 2 >= self.segments[-2]['rows']:
+            older, newer = self.segments[-2], self.segments[-1]
+            (older_keys, older_rows), (newer_keys, newer_rows) = self._load_segment(older), self._load_segment(newer)
+            # The newer segment only holds later rows, so concatenating keeps the rows increasing
+            merged = self._write_segment(older['rows'] + newer['rows'], lambda band: (
+                np.concatenate([older_keys[band], newer_keys[band]]),
+                np.concatenate([older_rows[band], newer_rows[band]])))
+            del older_keys, older_rows, newer_keys, newer_rows
+            self.segments[-2:] = [merged]
+            self._obsolete += [older['name'], newer['name']]
+
+    def add_block(self, signatures, labels):
+        """
+        Deduplicates a block of new rows against the index and among themselves,
+        and adds the kept ones to the index (uncommitted until commit()).
+
+        Returns:
+            numpy.ndarray: Boolean duplicate flag per row of the block.
+        """
+        keys = band_keys(signatures, labels, self.bands, self.rows_per_band)
+        duplicates = resolve_block(signatures, labels, keys, self.query(keys), self.signatures, self.labels,
+                                   self.threshold)
+        kept = ~duplicates
+        kept_count = int(kept.sum())
+        if kept_count:
+            with open(self._path('signatures.u32'), 'ab') as f:
+                f.write(np.ascontiguousarray(signatures[kept], dtype=np.uint32).tobytes())
+            with open(self._path('labels.u32'), 'ab') as f:
+                f.write(np.ascontiguousarray(labels[kept], dtype=np.uint32).tobytes())
+            kept_keys = keys[:, kept]
+            new_rows = np.arange(self.rows, self.rows + kept_count, dtype=np.int64)
+            self.segments.append(self._write_segment(kept_count, lambda band: (kept_keys[band], new_rows)))
+            self.rows += kept_count
+            self._merge_last_segments()
+            self._open_signatures()
+        return duplicates
+
+    def commit(self, corpus_bytes, pending_tail=None):
+        """Makes the rows added so far durable; state.json is replaced atomically."""
+        for name in ('signatures.u32', 'labels.u32'):
+            with open(self._path(name), 'ab') as f:
+                os.fsync(f.fileno())
+        self.state.update(rows=self.rows, bytes=corpus_bytes, segments=list(self.segments),
+                          labels=sorted(self.label_index, key=self.label_index.get), pending_tail=pending_tail)
+        tmp_path = self._path('state.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path('state.json'))
+
+        for name in self._obsolete:
+            for suffix in ('.keys.npy', '.rows.npy'):
+                if os.path.exists(self._path(name + suffix)):
+                    os.remove(self._path(name + suffix))
+        self._obsolete = []
+
+def state_path_for(path):
+    return path + '.minhash'
+
+def remove_state(path):
+    """Drops the deduplication state of a corpus (and the signature cache of older versions)."""
+    shutil.rmtree(state_path_for(path), ignore_errors=True)
+    if os.path.exists(path + '.minhash.npy'):
+        os.remove(path + '.minhash.npy')
+
+def _replace_tail(path, offset, tail_path):
+    """Truncates the corpus at `offset` and appends the deduplicated tail (idempotent)."""
+    with open(path, 'r+b') as f, open(tail_path, 'rb') as tail:
+        f.truncate(offset)
+        f.seek(offset)
+        shutil.copyfileobj(tail, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _iter_new_rows(path, offset):
+    """Yields (line bytes, article or None for a blank line, offset after the line) from `offset` on."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            article = json.loads(line) if line.strip() else None
+            yield line, article, offset
+
+def _signatures(articles, a, b, shingle_size):
+    signatures = np.empty((len(articles), len(a)), dtype=np.uint32)
+    batch, start, batch_shingles = [], 0, 0
+    for i, article in enumerate(articles):
+        shingles = shingle_hashes(article['text'], shingle_size)
+        batch.append(shingles)
+        batch_shingles += len(shingles)
+        if batch_shingles >= SIGNATURE_CHUNK_SHINGLES:
+            signatures[start:i + 1] = minhash_signatures(batch, a, b)
+            batch, start, batch_shingles = [], i + 1, 0
+    if batch:
+        signatures[start:] = minhash_signatures(batch, a, b)
+    return signatures
+
+def deduplicate_jsonl(path, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                      shingle_size=DEFAULT_SHINGLE_SIZE, state_path=None):
+    """
+    Removes near-duplicate articles of the same label from a JSONL corpus in place.
+
+    Only the rows appended since the previous run are read: they are checked
+    against the stored LSH buckets of the rows already kept and among
+    themselves, and the duplicates are cut from the tail of the file.
+
+    Args:
+        path (str): JSONL file with {'label', 'text'} rows.
+        threshold (float): Estimated Jaccard similarity that makes two articles duplicates.
+        num_perm (int): MinHash permutations per signature.
+        shingle_size (int): Words per shingle.
+        state_path (str): State directory (default: `<path>.minhash`).
+
+    Returns:
+        dict: Duplicates removed per label in this run.
+    """
+    state_path = state_path or state_path_for(path)
+    if os.path.exists(path + '.minhash.npy'):
+        os.remove(path + '.minhash.npy')  # signature cache of the previous format
+    tail_path = path + '.dedup-tail'
+
+    index = DedupIndex(state_path, num_perm, shingle_size, threshold)
+    pending = index.state['pending_tail']
+    if pending is not None and os.path.exists(tail_path):
+        logging.info("Finishing the interrupted rewrite of %s", path)
+        _replace_tail(path, pending, tail_path)
+        index.commit(index.state['bytes'])
+    if os.path.exists(tail_path):
+        os.remove(tail_path)
+
+    start = index.state['bytes']
+    if os.path.getsize(path) < start:
+        logging.info("%s is shorter than at the last deduplication; rebuilding %s", path, state_path)
+        remove_state(path)
+        index = DedupIndex(state_path, num_perm, shingle_size, threshold)
+        start = 0
+
+    a, b = _permutations(num_perm)
+    removed = Counter()
+    new_rows = 0
+    end = start
+    tail_bytes = 0
+    with open(tail_path, 'wb') as tail:
+        rows = _iter_new_rows(path, start)
+        while True:
+            block = list(itertools.islice(rows, DEDUP_BLOCK_ROWS))
+            if not block:
+                break
+            end = block[-1][2]
+            lines = [line for line, article, _ in block if article is not None]
+            articles = [article for _, article, _ in block if article is not None]
+            if not articles:
+                continue
+            labels = np.fromiter((index.label_id(article['label']) for article in articles), dtype=np.uint32,
+                                 count=len(articles))
+            duplicates = index.add_block(_signatures(articles, a, b, shingle_size), labels)
+            new_rows += len(articles)
+            for line, article, duplicate in zip(lines, articles, duplicates):
+                if duplicate:
+                    removed[article['label']] += 1
+                else:
+                    tail.write(line)
+                    tail_bytes += len(line)
+        tail.flush()
+        os.fsync(tail.fileno())
+
+    if removed:
+        # Journaled: an interrupted rewrite is finished by the next run
+        index.commit(start + tail_bytes, pending_tail=start)
+        _replace_tail(path, start, tail_path)
+        index.commit(start + tail_bytes)
+    else:
+        index.commit(end)
+    os.remove(tail_path)
+
+    logging.info("Near-duplicate removal (threshold %.2f, %d bands x %d rows): %d of %d new articles removed, "
+                 "%d kept in total", threshold, index.bands, index.rows_per_band, sum(removed.values()), new_rows,
+                 index.rows)
+    for label, count in sorted(removed.items()):
+        logging.info("Removed %d near-duplicates for artType: %s", count, label)
+    return dict(removed)
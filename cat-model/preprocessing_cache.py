@@ -0,0 +1,132 @@
+"""
+On-disk cache of preprocessed texts, shared by preparation runs.
+
+Entries are keyed by the SHA-256 of the raw text plus a fingerprint of the
+preprocessing settings (patterns, stop words, tokenizer), so a rerun with a new
+seed or split ratio, or on a corpus with appended articles, only preprocesses
+texts it has not seen. Changing the rules changes the fingerprint; entries of
+other fingerprints are never read and can be dropped with `invalidate()`.
+
+The cache is a sqlite file in WAL mode, so the preparation workers can read and
+write it concurrently, each through its own connection.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+# sqlite limits the number of host parameters per statement
+BULK_CHUNK = 500
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def settings_fingerprint(*parts):
+    """Hash of everything that changes the preprocessing output (JSON-serializable parts)."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+class PreprocessingCache:
+    """Maps (settings fingerprint, raw text hash) to the list of preprocessed tokens."""
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS preprocessed (
+                fingerprint TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                tokens TEXT NOT NULL,
+                PRIMARY KEY (fingerprint, text_hash)
+            )
+        """)
+
+    def _connection(self):
+        # Connections cannot cross a fork: reopen if the PID changed
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, hashes):
+        """
+        Looks up several texts at once.
+
+        Args:
+            hashes (list): text_hash() of the raw texts.
+
+        Returns:
+            dict: text hash -> token list, for the texts found.
+        """
+        found = {}
+        conn = self._connection()
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), BULK_CHUNK):
+            chunk = unique[start:start + BULK_CHUNK]
+            rows = conn.execute(
+                f"SELECT text_hash, tokens FROM preprocessed WHERE fingerprint = ? "
+                f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                [self.fingerprint] + chunk
+            ).fetchall()
+            found.update((row[0], json.loads(row[1])) for row in rows)
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def set_many(self, entries):
+        """Stores (text hash, token list) pairs in a single transaction."""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO preprocessed (fingerprint, text_hash, tokens) VALUES (?, ?, ?)",
+                [(self.fingerprint, key, json.dumps(tokens, ensure_ascii=False)) for key, tokens in entries]
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def invalidate(self, everything=False):
+        """
+        Drops the entries written with other preprocessing settings (or all of them).
+
+        Returns:
+            int: Entries removed.
+        """
+        conn = self._connection()
+        if everything:
+            removed = conn.execute("DELETE FROM preprocessed").rowcount
+        else:
+            removed = conn.execute("DELETE FROM preprocessed WHERE fingerprint != ?", (self.fingerprint,)).rowcount
+        conn.execute("VACUUM")
+        logging.info("Removed %d entries from the preprocessing cache %s", removed, self.path)
+        return removed
+
+    def stats(self):
+        row = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(fingerprint = ?), 0) FROM preprocessed", (self.fingerprint,)
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': row[0],
+            'current_entries': row[1],
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
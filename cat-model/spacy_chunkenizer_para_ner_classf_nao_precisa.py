@@ -7,6 +7,7 @@ import os
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from bs4 import BeautifulSoup
 from collections import defaultdict
+import corpus_store
 
 # Configure logging com mais detalhes
 logging.basicConfig(
@@ -48,7 +49,7 @@ def chunkenizer(mp_data):
     
     for index, line in enumerate(mp_data):
         try:
-            data = json.loads(line)
+            data = json.loads(line) if isinstance(line, str) else line
             text = data["text"]
             labels = data["label"]
             
@@ -122,8 +123,12 @@ def process_jsonl_with_multiprocessing(input_file, output_file, num_processes=4)
     
     # Verificar se arquivo de entrada existe
     try:
-        with open(input_file, 'r', encoding='utf-8') as infile:
-            lines = infile.readlines()
+        if corpus_store.is_corpus(input_file):
+            # Store particionado por categoria: as linhas já chegam como dicts
+            lines = list(corpus_store.iter_articles(input_file))
+        else:
+            with open(input_file, 'r', encoding='utf-8') as infile:
+                lines = infile.readlines()
     except FileNotFoundError:
         logging.error(f"Arquivo não encontrado: {input_file}")
         return
@@ -142,7 +147,7 @@ def process_jsonl_with_multiprocessing(input_file, output_file, num_processes=4)
     category_count = defaultdict(int)
     for line in lines[:min(1000, total_lines)]:  # Amostra para estatísticas
         try:
-            data = json.loads(line)
+            data = json.loads(line) if isinstance(line, str) else line
             category_count[data["label"]] += 1
         except:
             continue
@@ -231,6 +236,9 @@ def find_data_files():
     ]
     
     for input_path, output_path in possible_paths:
+        # Prefere o store particionado (extracted_articles.corpus) quando existir
+        if corpus_store.is_corpus(corpus_store.corpus_path_for(input_path)):
+            input_path = corpus_store.corpus_path_for(input_path)
         if os.path.exists(input_path):
             logging.info(f"Arquivos encontrados: {input_path}")
             return input_path, output_path
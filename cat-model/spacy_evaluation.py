@@ -5,6 +5,11 @@ from spacy.scorer import Scorer
 import logging
 import datetime
 import os
+import sys
+
+# text_normalization.py fica na raiz do repositório, junto com o servidor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_normalization import make_doc
 
 # Setup logging
 # Setup logging
@@ -24,6 +29,19 @@ def load_data_from_spacy_file(file_path, nlp):
     logging.info(f'Data loaded successfully with {len(docs)} documents')
     return docs
 
+def predict_normalized(nlp, reference_docs):
+    """
+    Passes the test documents through the model the way the server does.
+
+    The documents in test.spacy already hold normalized text, so their tokens are
+    turned into Docs with text_normalization.make_doc, the same Doc construction
+    web_classifier uses, and then go through each pipeline component.
+    """
+    docs = [make_doc(nlp.vocab, [token.text for token in doc]) for doc in reference_docs]
+    for _, component in nlp.pipeline:
+        docs = list(component.pipe(docs))
+    return docs
+
 def evaluate_ner(model_path, test_file_path):
     logging.info(f'Loading model from {model_path}')
     nlp = spacy.load(model_path)
@@ -32,7 +50,8 @@ def evaluate_ner(model_path, test_file_path):
     logging.info(f'Loading test data from {test_file_path}')
     examples = load_data_from_spacy_file(test_file_path, nlp)
     
-    formatted_examples = [Example(predicted=nlp(doc.text), reference=doc) for doc in examples]
+    formatted_examples = [Example(predicted=doc, reference=reference)
+                          for doc, reference in zip(predict_normalized(nlp, examples), examples)]
     logging.info('Test data formatted into Example objects successfully')
 
     scorer = Scorer()
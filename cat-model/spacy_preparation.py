@@ -1,11 +1,23 @@
 import spacy
-from spacy.tokens import DocBin
+from spacy.tokens import Doc, DocBin
+import argparse
 import json
 import random
 import logging
-import string
-import re
-from spacy.lang.pt.stop_words import STOP_WORDS
+import os
+import sys
+import shutil
+import time
+import hashlib
+import threading
+import multiprocessing
+from collections import Counter
+import corpus_store
+import preprocessing_cache
+
+# text_normalization.py lives at the repository root, next to the server that shares it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_normalization import TextNormalizer
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s', filename='categorization_preparation.log', filemode='w')
@@ -15,42 +27,115 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 console.setFormatter(formatter)
 logging.getLogger('').addHandler(console)
 
-nlp = spacy.load("pt_core_news_lg", disable=["ner", "parser", "tagger"])
-train_db = DocBin()  # DocBin for training data
-dev_db = DocBin()    # DocBin for development data
+MODEL_NAME = "pt_core_news_lg"
+PIPE_BATCH_SIZE = 256
+
+# Documents per DocBin shard; each worker holds at most one shard in memory
+SHARD_SIZE = 2000
+# Shards queued per worker when building in parallel
+PENDING_SHARDS_PER_WORKER = 2
+
+SPLITS = ("train", "dev", "test")
+
+# Token attributes the text classifier reads; the single pass does not set POS, LEMMA or MORPH
+TEXTCAT_ATTRS = ["ORTH", "NORM"]
+
+# Loaded by load_pipeline(); the tokenizer-only mode never loads the large vectors package
+nlp = None
+
+# Bump when preprocessing changes in a way the settings fingerprint cannot see
+PREPROCESSING_VERSION = 1
+DEFAULT_CACHE_PATH = "cat-model/prepared-data/preprocessing_cache.sqlite"
+
+# Opened by open_cache(); None disables caching
+text_cache = None
+
+CATEGORIES = [
+    "Portaria",
+    "Extrato de Contrato",
+    "Extrato de Convênio",
+    "Edital",
+    "Aviso de Licitação",
+    "Resultado de Julgamento",
+    "Extrato de Termo Aditivo"
+]
+
+# Same rules the server applies before classifying (see text_normalization.py)
+normalizer = TextNormalizer()
 
-# Define static patterns
-static_patterns = {
-    'EMAIL': re.compile(r'\b[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}\b', re.IGNORECASE),
-    'URL': re.compile(r'\b(?:https?://|www\.)\S+?\.br(?=\b|/|\s|[?.])', re.IGNORECASE),
-    'DATE': re.compile(r'\b(\d{1,2} de [a-zA-ZçÇ]+ de \d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4})\b', re.IGNORECASE),
-    'UASG': re.compile(r'\bUASG(?:\s+[Nnº°.:]*)?[\s:]*?(\d+(?:[/-]\d+)*)', re.IGNORECASE)
-}
+def load_pipeline(tokenizer_only=False):
+    """
+    Loads the pipeline used by preprocessing and process_data.
+
+    The tokenizer-only pipeline (spacy.blank("pt")) uses the same Portuguese
+    tokenizer rules as pt_core_news_lg, without its vectors and components.
+    """
+    global nlp
+    if tokenizer_only:
+        nlp = spacy.blank("pt")
+    else:
+        nlp = spacy.load(MODEL_NAME, disable=["ner", "parser", "tagger"])
+    return nlp
 
 def preprocessing(text):
     """Preprocesses the text by applying various transformations."""
-    text = text.lower()
-    
-    # Replace static patterns with a space
-    for pattern_name, pattern in static_patterns.items():
-        text = pattern.sub(' ', text)
-    
-    # Tokenize text
-    tokens = [token.text for token in nlp(text)]
-    
-    # Filter tokens
-    tokens = [t for t in tokens if 
-              t not in STOP_WORDS and 
-              t not in string.punctuation and 
-              len(t) > 3]
-    
-    # Remove digits
-    tokens = [t for t in tokens if not t.isdigit()]
-    
-    return " ".join(tokens)
-
-def load_data(file_path, limit=None):
-    """Loads data from a JSONL file and optionally limits the number of lines."""
+    return normalizer.normalize(text, nlp.tokenizer)
+
+def preprocessing_fingerprint():
+    """Fingerprint of the preprocessing rules and of the tokenizer of the loaded pipeline."""
+    return preprocessing_cache.settings_fingerprint(
+        PREPROCESSING_VERSION,
+        normalizer.fingerprint_parts(),
+        spacy.__version__,
+        nlp.lang,
+        nlp.meta.get("name"),
+        nlp.meta.get("version")
+    )
+
+def open_cache(path):
+    """Opens the preprocessing cache for the loaded pipeline (call load_pipeline first)."""
+    global text_cache
+    text_cache = preprocessing_cache.PreprocessingCache(path, preprocessing_fingerprint())
+    return text_cache
+
+def preprocess_batch(texts, batch_size=PIPE_BATCH_SIZE):
+    """
+    Filtered tokens of several raw texts, as preprocessing() would produce them.
+
+    Texts found in the cache are not tokenized again; the others are tokenized
+    in batches and written back to the cache in one transaction.
+    """
+    results = [None] * len(texts)
+    missing = list(range(len(texts)))
+    if text_cache is not None:
+        keys = [preprocessing_cache.text_hash(text) for text in texts]
+        cached = text_cache.get_many(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in cached:
+                results[i] = cached[key]
+            else:
+                missing.append(i)
+
+    token_lists = normalizer.tokens_batch((texts[i] for i in missing), nlp.tokenizer, batch_size)
+    for i, tokens in zip(missing, token_lists):
+        results[i] = tokens
+
+    if text_cache is not None and missing:
+        text_cache.set_many((keys[i], results[i]) for i in missing)
+    return results
+
+def load_data(file_path, limit=None, labels=None):
+    """
+    Loads data from a JSONL file and optionally limits the number of lines.
+
+    `file_path` may also be a label-partitioned store (see corpus_store.py); then
+    only the requested labels are decompressed and the rows come back as dicts.
+    """
+    if corpus_store.is_corpus(file_path):
+        data_lines = list(corpus_store.iter_articles(file_path, labels, limit))
+        logging.info("Loaded %d articles from corpus store %s.", len(data_lines), file_path)
+        return data_lines
     try:
         with open(file_path, "r", encoding="utf-8") as file:
             data_lines = file.readlines()
@@ -62,78 +147,369 @@ def load_data(file_path, limit=None):
         logging.error("File not found. Please check the file path and try again.")
         exit()
 
-def split_data(data_lines, train_ratio=0.8, test_ratio=0.1):
+def split_data(data_lines, train_ratio=0.8, test_ratio=0.1, seed=None):
     """Splits data into training, development, and test sets based on specified ratios."""
     if train_ratio + test_ratio > 1:
         raise ValueError("Sum of train_ratio and test_ratio must not exceed 1.")
-    
-    random.shuffle(data_lines)
-    
+
+    if seed is None:
+        random.shuffle(data_lines)
+    else:
+        random.Random(seed).shuffle(data_lines)
+
     train_index = int(len(data_lines) * train_ratio)
     test_index = int(len(data_lines) * (1 - test_ratio))
-    
+
     training_data = data_lines[:train_index]
     test_data = data_lines[test_index:]
     development_data = data_lines[train_index:test_index]
-    
+
     logging.info(f"Training Data: {len(training_data)} entries")
     logging.info(f"Development Data: {len(development_data)} entries")
     logging.info(f"Test Data: {len(test_data)} entries")
-    
+
     return training_data, development_data, test_data
 
+def set_categories(doc, label):
+    """Sets every category to 0 and the document label to 1."""
+    doc.cats = {category: 0 for category in CATEGORIES}
+    if label in doc.cats:
+        doc.cats[label] = 1
+    return doc
+
 def process_text(text, label):
     """Processes text, applies preprocessing, and applies the label to the document."""
     preprocessed_text = preprocessing(text)
     doc = nlp(preprocessed_text)
+    return set_categories(doc, label)
 
-    categories = [
-        "Portaria",
-        "Extrato de Contrato",
-        "Extrato de Convênio",
-        "Edital",
-        "Aviso de Licitação",
-        "Resultado de Julgamento",
-        "Extrato de Termo Aditivo"
-    ]
+def _parse(line):
+    data = json.loads(line) if isinstance(line, str) else line
+    return data["text"], data["label"]
 
-    # Initialize all categories to 0
-    doc.cats = {category: 0 for category in categories}
+def doc_from_tokens(words):
+    """
+    Builds the final Doc straight from the filtered tokens, joined by single
+    spaces as the preprocessed string would be. The preprocessed string is only
+    tokenized again when one of the tokens would be split by that second pass
+    (the server builds its Docs the same way).
+    """
+    return normalizer.doc_from_tokens(words, nlp)
 
-    # Set the relevant category to 1
-    if label in doc.cats:
-        doc.cats[label] = 1
+def process_data(data_lines, single_pass=False, batch_size=PIPE_BATCH_SIZE):
+    """
+    Processes data lines for text classification.
 
-    return doc
+    With `single_pass` (tokenizer-only pipeline) each Doc is built from the
+    filtered tokens; otherwise the preprocessed string goes through nlp again.
+    Single-pass Docs have the same tokens, spaces and categories as the double
+    pass with pt_core_news_lg, but no POS, LEMMA or MORPH: the morphologizer,
+    lemmatizer and attribute ruler of that model are not run. The text
+    classifier does not read those attributes.
+    """
+    records = [_parse(line) for line in data_lines]
+    token_lists = preprocess_batch([text for text, _ in records], batch_size)
 
-def process_data(data_lines):
-    """Processes data lines for text classification."""
     complete_doc_bin = DocBin()
-    for line in data_lines:
-        data = json.loads(line)
-        text = data["text"]
-        label = data["label"]
-        doc = process_text(text, label)
-        complete_doc_bin.add(doc)
+    for (_, label), words in zip(records, token_lists):
+        doc = doc_from_tokens(words) if single_pass else nlp(" ".join(words))
+        complete_doc_bin.add(set_categories(doc, label))
     return complete_doc_bin
 
+def _init_shard_worker(tokenizer_only, cache_path):
+    # With fork the pipeline and cache of the parent are inherited; otherwise open them here
+    if nlp is None:
+        load_pipeline(tokenizer_only)
+    if cache_path and text_cache is None:
+        open_cache(cache_path)
+
+def _build_shard(task):
+    shard_lines, shard_path, single_pass, batch_size = task
+    hits, misses = (text_cache.hits, text_cache.misses) if text_cache else (0, 0)
+    doc_bin = process_data(shard_lines, single_pass, batch_size)
+    doc_bin.to_disk(shard_path)
+    if text_cache is not None:
+        hits, misses = text_cache.hits - hits, text_cache.misses - misses
+    return shard_path, len(doc_bin), hits, misses
+
+def _run_shard_tasks(tasks, processes, tokenizer_only):
+    """
+    Builds shards in a worker pool, yielding (shard path, documents) in task order.
+
+    Tasks are pulled lazily, at most PENDING_SHARDS_PER_WORKER per worker ahead of
+    the results, so a streamed input never piles up in the pool's queue.
+    """
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        for shard_path, docs, _, _ in map(_build_shard, tasks):
+            yield shard_path, docs
+        return
+
+    pending = threading.Semaphore(processes * PENDING_SHARDS_PER_WORKER)
+
+    def bounded():
+        for task in tasks:
+            pending.acquire()
+            yield task
+
+    with multiprocessing.Pool(processes=processes, initializer=_init_shard_worker,
+                              initargs=(tokenizer_only, text_cache.path if text_cache else None)) as pool:
+        for shard_path, docs, hits, misses in pool.imap(_build_shard, bounded()):
+            pending.release()
+            if text_cache is not None:
+                text_cache.hits += hits
+                text_cache.misses += misses
+            yield shard_path, docs
+
+def merge_shards(shard_paths, output_path):
+    """Merges DocBin shards, in order, into a single .spacy file."""
+    merged = DocBin()
+    for shard_path in shard_paths:
+        merged.merge(DocBin().from_disk(shard_path))
+    merged.to_disk(output_path)
+    return merged
+
+def process_data_parallel(data_lines, output_path, processes=None, shard_size=SHARD_SIZE, single_pass=False,
+                          batch_size=PIPE_BATCH_SIZE, tokenizer_only=False, keep_shards=False):
+    """
+    Builds the DocBin of a split in parallel, one shard file per SHARD_SIZE documents.
+
+    Shards are written to `<output_path without .spacy>/shard-00000.spacy`, ...
+    Unless `keep_shards` is set they are merged, in order, into `output_path`
+    (the same bytes the serial process_data would produce, since DocBin sorts its
+    strings when serializing; see tests/test_spacy_preparation.py) and then removed; with
+    `keep_shards` the shard directory can be used directly as the training or dev
+    path, since spaCy's corpus reader loads every .spacy file in a directory.
+
+    Returns:
+        str: The merged file, or the shard directory when `keep_shards` is set.
+    """
+    shard_directory = os.path.splitext(output_path)[0]
+    if os.path.exists(shard_directory):
+        shutil.rmtree(shard_directory)
+    os.makedirs(shard_directory)
+
+    tasks = ((data_lines[start:start + shard_size],
+              os.path.join(shard_directory, f"shard-{start // shard_size:05d}.spacy"), single_pass, batch_size)
+             for start in range(0, len(data_lines), shard_size))
+
+    shard_paths = []
+    for shard_path, docs in _run_shard_tasks(tasks, processes, tokenizer_only):
+        shard_paths.append(shard_path)
+        logging.debug(f"Wrote {docs} documents to {shard_path}")
+
+    if keep_shards:
+        # A merged file left by an earlier run would no longer match the shards
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        logging.info(f"Wrote {len(shard_paths)} shards to {shard_directory}")
+        return shard_directory
+
+    merge_shards(shard_paths, output_path)
+    shutil.rmtree(shard_directory)
+    return output_path
+
+def assign_split(article, train_ratio=0.8, test_ratio=0.1, seed=0):
+    """
+    Stable split of a record, from a hash of the seed, its label and its id (or text).
+
+    The same record always lands in the same split, whatever the order or size of
+    the corpus, and each label is split in the given ratios independently.
+    """
+    key = f"{seed}\0{article['label']}\0{article.get('id') or article['text']}"
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    position = int.from_bytes(digest, 'big') / 2 ** 64
+    if position < train_ratio:
+        return "train"
+    if position >= 1 - test_ratio:
+        return "test"
+    return "dev"
+
+def stream_split(file_path, output_directory, limit=None, train_ratio=0.8, test_ratio=0.1, seed=0,
+                 processes=1, shard_size=SHARD_SIZE, single_pass=False, batch_size=PIPE_BATCH_SIZE,
+                 tokenizer_only=False, keep_shards=False):
+    """
+    Splits and prepares a corpus in one streaming pass.
+
+    Records are read one at a time (JSONL or corpus store), assigned to a split
+    with assign_split and buffered per split; every `shard_size` records of a
+    split become one DocBin shard in `<output_directory>/<split>/`. Memory holds
+    at most one buffer per split plus the shards being built, whatever the corpus
+    size. Unless `keep_shards` is set, each split is then merged into
+    `<output_directory>/<split>.spacy`.
+
+    Returns:
+        dict: Documents per label for each split.
+    """
+    if train_ratio + test_ratio > 1:
+        raise ValueError("Sum of train_ratio and test_ratio must not exceed 1.")
+
+    counts = {name: Counter() for name in SPLITS}
+    shard_paths = {name: [] for name in SPLITS}
+    for name in SPLITS:
+        shard_directory = os.path.join(output_directory, name)
+        if os.path.exists(shard_directory):
+            shutil.rmtree(shard_directory)
+        os.makedirs(shard_directory)
+
+    def shard_task(name, buffer):
+        shard_path = os.path.join(output_directory, name, f"shard-{len(shard_paths[name]):05d}.spacy")
+        shard_paths[name].append(shard_path)
+        return buffer, shard_path, single_pass, batch_size
+
+    def tasks():
+        buffers = {name: [] for name in SPLITS}
+        for article in corpus_store.iter_articles(file_path, limit=limit):
+            name = assign_split(article, train_ratio, test_ratio, seed)
+            buffers[name].append(article)
+            counts[name][article["label"]] += 1
+            if len(buffers[name]) == shard_size:
+                yield shard_task(name, buffers[name])
+                buffers[name] = []
+        for name, buffer in buffers.items():
+            if buffer:
+                yield shard_task(name, buffer)
+
+    for shard_path, docs in _run_shard_tasks(tasks(), processes, tokenizer_only):
+        logging.debug(f"Wrote {docs} documents to {shard_path}")
+
+    for name in SPLITS:
+        logging.info(f"{name}: {sum(counts[name].values())} documents in {len(shard_paths[name])} shards")
+        for label, count in sorted(counts[name].items()):
+            logging.info(f"  - {label}: {count}")
+        merged_path = os.path.join(output_directory, f"{name}.spacy")
+        if keep_shards:
+            if os.path.exists(merged_path):
+                os.remove(merged_path)
+        else:
+            merge_shards(shard_paths[name], merged_path)
+            shutil.rmtree(os.path.join(output_directory, name))
+    return counts
+
+def textcat_bytes(doc_bin, vocab):
+    """
+    Serializes only what the text classifier trains on: tokens, spaces, norms
+    and categories. Used to compare the single pass with the double pass, whose
+    Docs also carry POS, LEMMA and MORPH.
+    """
+    restricted = DocBin(attrs=TEXTCAT_ATTRS)
+    for doc in doc_bin.get_docs(vocab):
+        # DocBin.add also stores the lemma and morph strings, so copy just the compared attributes
+        copy = Doc(vocab, words=[token.text for token in doc], spaces=[bool(token.whitespace_) for token in doc])
+        copy.from_array(["NORM"], doc.to_array(["NORM"]))
+        copy.cats = doc.cats
+        restricted.add(copy)
+    return restricted.to_bytes()
+
+def verify_single_pass(data_lines, batch_size=PIPE_BATCH_SIZE):
+    """
+    Builds the same documents with the original double pass (pt_core_news_lg)
+    and with the tokenizer-only single pass, logs docs/sec for both and checks
+    that the DocBins are byte-identical on TEXTCAT_ATTRS and categories.
+
+    Returns:
+        bool: True when both DocBins serialize to the same bytes on those attributes.
+    """
+    load_pipeline(tokenizer_only=False)
+    start = time.perf_counter()
+    double_pass = process_data(data_lines)
+    double_elapsed = time.perf_counter() - start
+    vocab = nlp.vocab
+    double_bytes = textcat_bytes(double_pass, vocab)
+
+    load_pipeline(tokenizer_only=True)
+    start = time.perf_counter()
+    single_pass = process_data(data_lines, single_pass=True, batch_size=batch_size)
+    single_elapsed = time.perf_counter() - start
+
+    identical = double_bytes == textcat_bytes(single_pass, vocab)
+    logging.info(f"Double pass: {len(data_lines) / double_elapsed:.1f} docs/sec")
+    logging.info(f"Single pass: {len(data_lines) / single_elapsed:.1f} docs/sec "
+                 f"(speedup {double_elapsed / single_elapsed:.2f}x)")
+    logging.info(f"DocBin bytes identical on {', '.join(TEXTCAT_ATTRS)} and categories: {identical} "
+                 f"(POS, LEMMA and MORPH of the double pass are dropped)")
+    return identical
+
+def log_cache_stats():
+    if text_cache is not None:
+        stats = text_cache.stats()
+        logging.info(f"Preprocessing cache: {stats['hits']} hits, {stats['misses']} misses "
+                     f"({stats['current_entries']} entries for the current rules)")
+
 def main():
+    parser = argparse.ArgumentParser(description='Prepares train/dev/test DocBins for the text classifier')
+    parser.add_argument('--tokenizer-only', action='store_true',
+                        help=f'Tokenize once with spacy.blank("pt") instead of running {MODEL_NAME} twice')
+    parser.add_argument('--batch-size', type=int, default=PIPE_BATCH_SIZE, help='Texts per nlp.pipe batch')
+    parser.add_argument('--limit', type=int, default=40000, help='Documents to prepare (0: the whole corpus)')
+    parser.add_argument('--seed', type=int, default=None, help='Shuffle seed (default: unseeded)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Worker processes building DocBin shards (0: one per core)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Documents per DocBin shard')
+    parser.add_argument('--keep-shards', action='store_true',
+                        help='Leave train/dev/test as directories of shards instead of merging them')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Split by a stable hash of each record in one streaming pass (constant memory)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Preprocessing cache (sqlite)')
+    parser.add_argument('--no-cache', action='store_true', help='Preprocess every text again')
+    parser.add_argument('--invalidate-cache', action='store_true',
+                        help='Drop cache entries written with other preprocessing rules and exit')
+    parser.add_argument('--clear-cache', action='store_true', help='Drop every cache entry and exit')
+    parser.add_argument('--verify', type=int, default=0, metavar='N',
+                        help=f'Compare the single pass with the {MODEL_NAME} double pass on N documents and exit')
+    args = parser.parse_args()
+
     file_path = "output-data/extracted_articles.jsonl"
-    data_lines = load_data(file_path, limit=40000)
+    if os.path.isdir(corpus_store.corpus_path_for(file_path)):
+        file_path = corpus_store.corpus_path_for(file_path)
+
+    if args.verify:
+        identical = verify_single_pass(load_data(file_path, limit=args.verify), args.batch_size)
+        raise SystemExit(0 if identical else 1)
+
+    load_pipeline(args.tokenizer_only)
+    if args.invalidate_cache or args.clear_cache:
+        open_cache(args.cache).invalidate(everything=args.clear_cache)
+        return
+    if not args.no_cache:
+        open_cache(args.cache)
+
+    if args.streaming:
+        stream_split(file_path, "cat-model/prepared-data", args.limit or None, seed=args.seed or 0,
+                     processes=args.processes, shard_size=args.shard_size, single_pass=args.tokenizer_only,
+                     batch_size=args.batch_size, tokenizer_only=args.tokenizer_only, keep_shards=args.keep_shards)
+        logging.info("Processed data saved to disk.")
+        log_cache_stats()
+        return
+
+    data_lines = load_data(file_path, limit=args.limit)
+
+    training_data, development_data, test_data = split_data(data_lines, seed=args.seed)
 
-    training_data, development_data, test_data = split_data(data_lines)
+    if args.processes != 1:
+        splits = [("train", training_data), ("dev", development_data), ("test", test_data)]
+        for name, split in splits:
+            start = time.perf_counter()
+            path = process_data_parallel(split, f"cat-model/prepared-data/{name}.spacy", args.processes or None,
+                                         args.shard_size, args.tokenizer_only, args.batch_size,
+                                         args.tokenizer_only, args.keep_shards)
+            logging.info(f"{name}: {len(split)} documents in {time.perf_counter() - start:.1f}s -> {path}")
+        logging.info("Processed data saved to disk.")
+        log_cache_stats()
+        return
 
-    train_doc_bin = process_data(training_data)
+    train_doc_bin = process_data(training_data, args.tokenizer_only, args.batch_size)
     logging.info("Training data processed and added to DocBin.")
-    dev_doc_bin = process_data(development_data)
+    dev_doc_bin = process_data(development_data, args.tokenizer_only, args.batch_size)
     logging.info("Development data processed and added to DocBin.")
-    test_doc_bin = process_data(test_data)
+    test_doc_bin = process_data(test_data, args.tokenizer_only, args.batch_size)
     logging.info("Test data processed and added to DocBin.")
 
     train_doc_bin.to_disk("cat-model/prepared-data/train.spacy")
     dev_doc_bin.to_disk("cat-model/prepared-data/dev.spacy")
     test_doc_bin.to_disk("cat-model/prepared-data/test.spacy")
     logging.info("Processed data saved to disk.")
+    log_cache_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
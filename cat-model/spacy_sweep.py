@@ -0,0 +1,513 @@
+"""
+Architecture and hyperparameter sweep for the text classifier, on CPU.
+
+Each variant is the config from generate_config.py with the textcat model
+swapped (BOW, CNN or ensemble) and the embedding rows and width, BOW
+ngram_size, batcher sizes and learn rate overridden. Variants are trained
+concurrently in a process pool: every worker is pinned to its own set of CPUs
+and limited to that many BLAS/OpenMP threads, so parallel jobs do not fight
+over cores. Once the pool is done, the trained models are timed one at a time
+in a worker pinned the same way, with no training running next to it, so
+their speed measurements stay comparable.
+
+For each trained model the sweep records the dev cats_score, the size of
+model-best on disk and the measured inference speed on the dev documents, and
+builds a Pareto table (no other variant is both more accurate and faster):
+
+    python cat-model/spacy_sweep.py --architectures bow cnn ensemble --width 64 128 --max-steps 4000
+    python cat-model/spacy_sweep.py --report --min-score 0.95
+
+Results are appended to <output>/results.jsonl as jobs finish; rerunning skips
+the variants already trained.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# generate_config.py and text_normalization.py live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# spaCy, thinc and numpy are only imported inside the jobs, after the thread
+# limits below are in the environment
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                    "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+DEFAULT_OUTPUT = "cat-model/models/sweep"
+RESULTS_FILENAME = "results.jsonl"
+
+# Values of the config written by generate_config.py
+BASELINE = {
+    'architecture': 'ensemble',
+    'width': 64,
+    'rows': 5000,
+    'ngram_size': 1,
+    'batch_size': '100:1000',
+    'learn_rate': 0.001
+}
+
+# Parameters each architecture actually uses; the others are dropped from the variant
+ARCHITECTURE_PARAMS = {
+    'bow': ('ngram_size', 'batch_size', 'learn_rate'),
+    'cnn': ('width', 'rows', 'batch_size', 'learn_rate'),
+    'ensemble': ('width', 'rows', 'ngram_size', 'batch_size', 'learn_rate')
+}
+
+# Dev documents timed for the inference speed
+SPEED_DOCS = 2000
+SPEED_BATCH_SIZE = 256
+
+def _bow_model(params):
+    return {
+        '@architectures': 'spacy.TextCatBOW.v2',
+        'exclusive_classes': True,
+        'ngram_size': params['ngram_size'],
+        'no_output_layer': False,
+        'nO': None
+    }
+
+def _tok2vec(params):
+    rows = params['rows']
+    return {
+        '@architectures': 'spacy.Tok2Vec.v2',
+        'embed': {
+            '@architectures': 'spacy.MultiHashEmbed.v2',
+            'width': params['width'],
+            'attrs': ["NORM", "PREFIX", "SUFFIX", "SHAPE"],
+            # Same proportions between the attributes as the base config
+            'rows': [rows, max(rows // 5, 1), max(rows // 2, 1), max(rows // 2, 1)],
+            'include_static_vectors': False
+        },
+        'encode': {
+            '@architectures': 'spacy.MaxoutWindowEncoder.v2',
+            'width': params['width'],
+            'depth': 2,
+            'window_size': 1,
+            'maxout_pieces': 3
+        }
+    }
+
+def textcat_model(params):
+    """The [components.textcat.model] section of a variant."""
+    architecture = params['architecture']
+    if architecture == 'bow':
+        return _bow_model(params)
+    if architecture == 'cnn':
+        return {
+            '@architectures': 'spacy.TextCatCNN.v2',
+            'exclusive_classes': True,
+            'tok2vec': _tok2vec(params),
+            'nO': None
+        }
+    if architecture == 'ensemble':
+        linear_model = _bow_model(params)
+        del linear_model['nO']
+        return {
+            '@architectures': 'spacy.TextCatEnsemble.v2',
+            'linear_model': linear_model,
+            'tok2vec': _tok2vec(params),
+            'nO': None
+        }
+    raise ValueError(f"Unknown architecture: {architecture}")
+
+def variant_id(params):
+    """Readable, stable directory name of a variant."""
+    short = {'width': 'w', 'rows': 'r', 'ngram_size': 'n', 'batch_size': 'b', 'learn_rate': 'lr'}
+    parts = [params['architecture']]
+    parts += [f"{short[name]}{str(params[name]).replace(':', '-')}" for name in ARCHITECTURE_PARAMS[params['architecture']]]
+    return '_'.join(parts)
+
+def build_variants(space, max_variants=0, seed=0):
+    """
+    Expands the search space into variants, without duplicates.
+
+    Args:
+        space (dict): Parameter -> list of values (missing parameters use BASELINE).
+        max_variants (int): Random sample of at most this many variants (0: all).
+        seed (int): Seed of the sample.
+
+    Returns:
+        list: Variant parameter dicts, in grid order.
+    """
+    names = list(BASELINE)
+    grids = [space.get(name) or [BASELINE[name]] for name in names]
+    variants = {}
+    for values in itertools.product(*grids):
+        params = dict(zip(names, values))
+        used = ('architecture',) + ARCHITECTURE_PARAMS[params['architecture']]
+        params = {name: value for name, value in params.items() if name in used}
+        variants.setdefault(variant_id(params), params)
+
+    variants = list(variants.values())
+    if max_variants and len(variants) > max_variants:
+        keep = sorted(random.Random(seed).sample(range(len(variants)), max_variants))
+        variants = [variants[index] for index in keep]
+    return variants
+
+def build_config(params, streaming=False, max_steps=None, patience=None):
+    """The generate_config.py config with a variant's model and training settings."""
+    from spacy.util import Config
+    from generate_config import build_config_content
+
+    config = Config().from_str(build_config_content(streaming), interpolate=False)
+    config['components']['textcat']['model'] = textcat_model(params)
+
+    batch_start, batch_stop = (int(size) for size in params['batch_size'].split(':'))
+    config['training']['batcher']['size']['start'] = batch_start
+    config['training']['batcher']['size']['stop'] = batch_stop
+    config['training']['optimizer']['learn_rate'] = params['learn_rate']
+    if max_steps is not None:
+        config['training']['max_steps'] = max_steps
+    if patience is not None:
+        config['training']['patience'] = patience
+    return config
+
+def cpu_slots(jobs, threads):
+    """
+    Splits the CPUs this process may use into `jobs` disjoint sets of `threads` CPUs.
+
+    Returns:
+        list: One CPU list per job slot (empty lists when pinning is not supported).
+    """
+    if not hasattr(os, 'sched_getaffinity'):
+        return [[] for _ in range(jobs)]
+    cpus = sorted(os.sched_getaffinity(0))
+    if jobs * threads > len(cpus):
+        raise ValueError(f"{jobs} jobs x {threads} threads need {jobs * threads} CPUs, only {len(cpus)} available")
+    return [cpus[slot * threads:(slot + 1) * threads] for slot in range(jobs)]
+
+def _claim_slot(owners):
+    """
+    Index of a free CPU slot, now owned by this process.
+
+    A slot is free when no process has it or its owner has exited: the pool
+    joins a dead worker before starting its replacement, which takes the slot.
+    """
+    with owners.get_lock():
+        for slot, pid in enumerate(owners):
+            if pid:
+                try:
+                    os.kill(pid, 0)
+                    continue
+                except ProcessLookupError:
+                    pass
+            owners[slot] = os.getpid()
+            return slot
+    raise RuntimeError("No free CPU slot for the sweep worker")
+
+def _init_sweep_worker(slots, owners, threads):
+    # Each worker takes one CPU set for its whole life
+    cpus = slots[_claim_slot(owners)]
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - %(levelname)s - [cpus {cpus}] %(message)s')
+
+    try:
+        import torch  # loaded by spacy-transformers, with its own thread pool
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def _load_dev_docs(path, vocab, limit):
+    from spacy.tokens import DocBin
+
+    paths = [path] if os.path.isfile(path) else sorted(
+        os.path.join(root, name) for root, _, files in os.walk(path) for name in files if name.endswith('.spacy'))
+    docs = []
+    for shard in paths:
+        docs.extend(DocBin().from_disk(shard).get_docs(vocab))
+        if len(docs) >= limit:
+            break
+    return docs[:limit]
+
+def pinned_pool(context, slots, threads):
+    """
+    Process pool with one worker per CPU slot, each pinned to its slot.
+
+    Args:
+        context: multiprocessing context (spawn, so spaCy is imported after the thread limits).
+        slots (list): CPU lists from cpu_slots().
+        threads (int): BLAS/OpenMP threads per worker.
+    """
+    owners = context.Array('i', len(slots))
+    return context.Pool(processes=len(slots), initializer=_init_sweep_worker, initargs=(slots, owners, threads))
+
+def measure_speed(model_path, dev_path, limit=SPEED_DOCS, batch_size=SPEED_BATCH_SIZE):
+    """
+    Inference speed of a trained model on the dev documents, as the server runs it.
+
+    The dev documents hold normalized text, so their tokens are turned into Docs
+    with make_doc (as in spacy_evaluation.py) and only the pipeline components
+    are timed.
+
+    Returns:
+        dict: Documents and words per second over `limit` dev documents.
+    """
+    import spacy
+    from text_normalization import make_doc
+
+    nlp = spacy.load(model_path)
+    docs = [make_doc(nlp.vocab, [token.text for token in doc]) for doc in _load_dev_docs(dev_path, nlp.vocab, limit)]
+    if not docs:
+        raise ValueError(f"No dev documents found in {dev_path}")
+
+    list(nlp.pipe(docs[:batch_size], batch_size=batch_size))  # warm-up
+    start = time.perf_counter()
+    list(nlp.pipe(docs, batch_size=batch_size))
+    elapsed = time.perf_counter() - start
+    return {
+        'docs_per_sec': len(docs) / elapsed,
+        'words_per_sec': sum(len(doc) for doc in docs) / elapsed
+    }
+
+def train_variant(job):
+    """
+    Trains one variant on CPU; runs inside a pinned worker.
+
+    Returns:
+        dict: The result row (status 'trained' or 'failed'), without the speed.
+    """
+    params, output_dir, train_path, dev_path, options = job
+    result = {'id': variant_id(params), 'params': params, 'cpus': sorted(os.sched_getaffinity(0))
+              if hasattr(os, 'sched_getaffinity') else None}
+    try:
+        from spacy.cli.train import train
+        import streaming_corpus  # registers dou.StreamingCorpus.v1 for the streaming configs
+
+        os.makedirs(output_dir, exist_ok=True)
+        config_path = os.path.join(output_dir, 'config.cfg')
+        build_config(params, options['streaming'], options['max_steps'], options['patience']).to_disk(
+            config_path, interpolate=False)
+
+        start = time.perf_counter()
+        train(config_path, output_path=output_dir, use_gpu=-1,
+              overrides={'paths.train': train_path, 'paths.dev': dev_path})
+        result['train_seconds'] = time.perf_counter() - start
+
+        model_path = os.path.join(output_dir, 'model-best')
+        with open(os.path.join(model_path, 'meta.json'), encoding='utf-8') as f:
+            result['cats_score'] = json.load(f)['performance']['cats_score']
+        result['model_bytes'] = _directory_size(model_path)
+        result['status'] = 'trained'
+    except Exception as e:
+        logging.exception(f"Variant {result['id']} failed")
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def measure_variant(job):
+    """
+    Adds the inference speed to a trained variant's row; runs inside a pinned worker.
+
+    Returns:
+        dict: The result row (status 'ok' or 'failed').
+    """
+    result, model_path, dev_path, speed_docs = job
+    result = dict(result, speed_cpus=sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else None)
+    try:
+        result.update(measure_speed(model_path, dev_path, speed_docs))
+        result['status'] = 'ok'
+    except Exception as e:
+        logging.exception(f"Speed measurement of {result['id']} failed")
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def read_results(output):
+    """Result rows of a sweep directory; a variant trained more than once keeps its last row."""
+    path = os.path.join(output, RESULTS_FILENAME)
+    if not os.path.exists(path):
+        return []
+    rows = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                rows[row['id']] = row
+    return list(rows.values())
+
+def pareto_front(results):
+    """
+    Marks each successful result with `pareto`: True when no other result has a
+    cats_score and docs_per_sec at least as high, with one of them higher.
+
+    Returns:
+        list: The successful results, fastest first.
+    """
+    rows = sorted((row for row in results if row.get('status') == 'ok'), key=lambda row: -row['docs_per_sec'])
+    for row in rows:
+        row['pareto'] = not any(
+            other['cats_score'] >= row['cats_score'] and other['docs_per_sec'] >= row['docs_per_sec'] and
+            (other['cats_score'] > row['cats_score'] or other['docs_per_sec'] > row['docs_per_sec'])
+            for other in rows)
+    return rows
+
+def pick_fastest(results, min_score):
+    """Fastest successful variant whose cats_score reaches `min_score`, or None."""
+    eligible = [row for row in pareto_front(results) if row['cats_score'] >= min_score]
+    return eligible[0] if eligible else None
+
+def format_table(results, min_score=None):
+    rows = pareto_front(results)
+    lines = [f"{'variant':<48} {'cats_score':>10} {'docs/s':>9} {'words/s':>10} {'size MB':>8} {'train s':>8}  pareto"]
+    for row in rows:
+        lines.append(f"{row['id']:<48} {row['cats_score']:>10.4f} {row['docs_per_sec']:>9.1f} "
+                     f"{row['words_per_sec']:>10.0f} {row['model_bytes'] / 1e6:>8.2f} {row['train_seconds']:>8.0f}  "
+                     f"{'*' if row['pareto'] else ''}")
+    for row in results:
+        if row.get('status') == 'trained':
+            lines.append(f"{row['id']:<48} trained, speed not measured yet")
+        elif row.get('status') != 'ok':
+            lines.append(f"{row['id']:<48} failed: {row.get('error')}")
+    if min_score is not None:
+        best = pick_fastest(results, min_score)
+        lines.append("")
+        lines.append(f"Fastest with cats_score >= {min_score}: " +
+                     (f"{best['id']} ({best['docs_per_sec']:.1f} docs/s)" if best else "none"))
+    return '\n'.join(lines)
+
+def _append_result(results_path, result):
+    with open(results_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+def run_sweep(variants, output, train_path, dev_path, jobs, threads, options, resume=True):
+    """
+    Trains the variants in a pool of `jobs` workers pinned to disjoint CPU sets,
+    then measures their speed one at a time in a single worker pinned like them.
+
+    Each result is appended to <output>/results.jsonl as soon as its job ends;
+    a trained variant whose speed is missing is measured by the next run.
+
+    Returns:
+        list: Every result row in the sweep directory.
+    """
+    os.makedirs(output, exist_ok=True)
+    sweep_ids = {variant_id(params) for params in variants}
+    if resume:
+        done = {row['id'] for row in read_results(output) if row.get('status') in ('ok', 'trained')}
+        skipped = [params for params in variants if variant_id(params) in done]
+        variants = [params for params in variants if variant_id(params) not in done]
+        if skipped:
+            logging.info(f"Skipping {len(skipped)} variants already trained in {output}")
+
+    tasks = [(params, os.path.join(output, variant_id(params)), train_path, dev_path, options) for params in variants]
+    jobs = max(1, min(jobs, len(tasks)))
+    logging.info(f"Training {len(tasks)} variants, {jobs} at a time with {threads} threads each")
+
+    # Spawned workers import spaCy only after the initializer has set the thread limits
+    context = multiprocessing.get_context('spawn')
+    slots = cpu_slots(jobs, threads)
+
+    results_path = os.path.join(output, RESULTS_FILENAME)
+    if tasks:
+        with pinned_pool(context, slots, threads) as pool:
+            for result in pool.imap_unordered(train_variant, tasks):
+                _append_result(results_path, result)
+                if result['status'] == 'trained':
+                    logging.info(f"{result['id']}: cats_score {result['cats_score']:.4f}, "
+                                 f"{result['model_bytes'] / 1e6:.2f} MB")
+                else:
+                    logging.warning(f"{result['id']}: {result['error']}")
+
+    trained = [row for row in read_results(output) if row.get('status') == 'trained' and row['id'] in sweep_ids]
+    if trained:
+        logging.info(f"Measuring the speed of {len(trained)} models, one at a time")
+        measurements = [(row, os.path.join(output, row['id'], 'model-best'), dev_path, options['speed_docs'])
+                        for row in trained]
+        with pinned_pool(context, slots[:1], threads) as pool:
+            for result in pool.imap(measure_variant, measurements):
+                _append_result(results_path, result)
+                if result['status'] == 'ok':
+                    logging.info(f"{result['id']}: {result['docs_per_sec']:.1f} docs/s")
+                else:
+                    logging.warning(f"{result['id']}: {result['error']}")
+    return read_results(output)
+
+def _data_path(name):
+    # Merged .spacy file, or the shard directory left by spacy_preparation.py --keep-shards
+    path = f"cat-model/prepared-data/{name}.spacy"
+    if not os.path.exists(path) and os.path.isdir(f"cat-model/prepared-data/{name}"):
+        path = f"cat-model/prepared-data/{name}"
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Trains textcat config variants in parallel on CPU and '
+                                                 'compares accuracy, size and speed')
+    parser.add_argument('--architectures', nargs='+', choices=sorted(ARCHITECTURE_PARAMS),
+                        default=['bow', 'cnn', 'ensemble'])
+    parser.add_argument('--width', nargs='+', type=int, default=[BASELINE['width']], help='Embedding/encoder width')
+    parser.add_argument('--rows', nargs='+', type=int, default=[BASELINE['rows']],
+                        help='NORM embedding rows (PREFIX, SUFFIX and SHAPE keep the base proportions)')
+    parser.add_argument('--ngram-size', nargs='+', type=int, default=[BASELINE['ngram_size']])
+    parser.add_argument('--batch-size', nargs='+', default=[BASELINE['batch_size']], metavar='START:STOP',
+                        help='Compounding batcher sizes, in words')
+    parser.add_argument('--learn-rate', nargs='+', type=float, default=[BASELINE['learn_rate']])
+    parser.add_argument('--max-variants', type=int, default=0, help='Random sample of the grid (0: all)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the --max-variants sample')
+    parser.add_argument('--max-steps', type=int, default=None, help='Override training.max_steps')
+    parser.add_argument('--patience', type=int, default=None, help='Override training.patience')
+    parser.add_argument('--streaming', action='store_true', help='Use the streaming config (generate_config.py)')
+    parser.add_argument('--threads', type=int, default=1, help='CPUs (and BLAS threads) per job')
+    parser.add_argument('--jobs', type=int, default=0, help='Concurrent jobs (0: available CPUs / --threads)')
+    parser.add_argument('--speed-docs', type=int, default=SPEED_DOCS, help='Dev documents timed per model')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Sweep directory')
+    parser.add_argument('--no-resume', action='store_true', help='Train again the variants already in the results')
+    parser.add_argument('--min-score', type=float, default=None,
+                        help='Report the fastest variant with at least this cats_score')
+    parser.add_argument('--report', action='store_true', help='Only print the table of an existing sweep')
+    parser.add_argument('--dry-run', action='store_true', help='List the variants and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.report:
+        print(format_table(read_results(args.output), args.min_score))
+        return
+
+    space = {
+        'architecture': args.architectures,
+        'width': args.width,
+        'rows': args.rows,
+        'ngram_size': args.ngram_size,
+        'batch_size': args.batch_size,
+        'learn_rate': args.learn_rate
+    }
+    variants = build_variants(space, args.max_variants, args.seed)
+    if args.dry_run:
+        for params in variants:
+            print(variant_id(params))
+        print(f"{len(variants)} variants")
+        return
+
+    train_path, dev_path = _data_path("train"), _data_path("dev")
+    for path in (train_path, dev_path):
+        if not os.path.exists(path):
+            print(f"Error: {path} not found. Run first: python cat-model/spacy_preparation.py")
+            raise SystemExit(1)
+
+    available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    jobs = args.jobs or max(1, available // args.threads)
+    options = {
+        'streaming': args.streaming,
+        'max_steps': args.max_steps,
+        'patience': args.patience,
+        'speed_docs': args.speed_docs
+    }
+    results = run_sweep(variants, args.output, train_path, dev_path, jobs, args.threads, options,
+                        resume=not args.no_resume)
+    print(format_table(results, args.min_score))
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import spacy
 from pathlib import Path
 from spacy.cli.train import train
 import spacy_transformers
+import streaming_corpus  # registra o leitor dou.StreamingCorpus.v1 usado pelo config em streaming
 
 # Verificar se GPU está disponível
 try:
@@ -16,6 +17,12 @@ except ValueError:
 config_path = Path("cat-model/models/cnn/config.cfg")
 train_data_path = Path("cat-model/prepared-data/train.spacy")
 dev_data_path = Path("cat-model/prepared-data/dev.spacy")
+
+# Shards deixados por spacy_preparation.py --keep-shards (lidos sem juntar num único arquivo)
+if not train_data_path.exists() and Path("cat-model/prepared-data/train").is_dir():
+    train_data_path = Path("cat-model/prepared-data/train")
+if not dev_data_path.exists() and Path("cat-model/prepared-data/dev").is_dir():
+    dev_data_path = Path("cat-model/prepared-data/dev")
 output_path = Path("cat-model/models/cnn")
 
 # Prepare overrides
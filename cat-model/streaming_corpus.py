@@ -0,0 +1,227 @@
+"""
+Streaming training corpus for spaCy.
+
+The stock spacy.Corpus.v1 reader loads the whole .spacy file, and spaCy's
+training loop materializes the training corpus whenever max_epochs >= 0. This
+reader is registered as "dou.StreamingCorpus.v1" and, used with
+`max_epochs = -1`, lets training stream from:
+
+- a directory of DocBin shards (spacy_preparation.py --keep-shards), a few
+  shards in memory at a time, or a single .spacy file;
+- a plain JSONL corpus of raw articles ({"label", "text"}) or a corpus store
+  directory (corpus_store.py). These are normalized on the fly with the same
+  rules as the server.
+
+Both the extracted JSONL and the store are grouped by label, and the shards of
+a streaming split are too. Before the shuffle buffer, the sources are
+interleaved: every next example comes from a label (or an open shard) drawn
+with probability proportional to what it has left, so any window of the stream
+has roughly the corpus label mix. Store labels are read in a random frame
+order. A JSONL file is scanned once to index the byte offset of every line by
+label; each epoch then reads every line once, seeking within each label.
+Compressed JSONL cannot be seeked, so it is rejected: convert it with
+corpus_store.py, which is compressed too.
+
+Examples are then shuffled through a bounded buffer: memory holds
+`shuffle_buffer` examples plus the frames or shards being read, whatever the
+corpus size. Frame and shard orders, the interleaving and the buffer are
+reshuffled every epoch.
+"""
+
+import json
+import os
+import random
+import sys
+from array import array
+from itertools import islice
+
+from spacy.tokens import Doc, DocBin
+from spacy.training import Example
+from spacy.util import registry
+
+import corpus_store
+
+# text_normalization.py lives at the repository root, next to the server that shares it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_normalization import TextNormalizer
+
+DEFAULT_LABELS = [
+    "Portaria",
+    "Extrato de Contrato",
+    "Extrato de Convênio",
+    "Edital",
+    "Aviso de Licitação",
+    "Resultado de Julgamento",
+    "Extrato de Termo Aditivo"
+]
+
+SHUFFLE_BUFFER = 10000
+# Raw articles normalized per tokenizer.pipe batch
+NORMALIZE_BATCH = 256
+# DocBin shards loaded and interleaved together
+OPEN_SHARDS = 8
+
+JSONL_SUFFIX = '.jsonl'
+COMPRESSED_JSONL_SUFFIXES = ('.jsonl.gz', '.jsonl.zst')
+
+def _list_shards(path):
+    if os.path.isfile(path):
+        return [path]
+    shards = []
+    for root, _, files in os.walk(path):
+        shards.extend(os.path.join(root, name) for name in files if name.endswith('.spacy'))
+    return sorted(shards)
+
+def shuffle_buffered(items, buffer_size, rng):
+    """
+    Approximate shuffle with bounded memory: each item replaces a random slot of
+    a `buffer_size` buffer and the item previously there is yielded.
+    """
+    buffer = []
+    for item in items:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+            continue
+        index = rng.randrange(buffer_size)
+        yield buffer[index]
+        buffer[index] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+def _labelled(label, texts):
+    for text in texts:
+        yield {'label': label, 'text': text}
+
+def interleave(streams, counts, rng):
+    """
+    Merges iterators, drawing each next item from one with probability
+    proportional to the items it has left.
+
+    Args:
+        streams (dict): Key -> iterator.
+        counts (dict): Key -> number of items the iterator yields.
+        rng (random.Random): Source of the draws.
+    """
+    remaining = {key: count for key, count in counts.items() if count}
+    while remaining:
+        keys = list(remaining)
+        key = rng.choices(keys, weights=[remaining[k] for k in keys])[0]
+        yield next(streams[key])
+        remaining[key] -= 1
+        if not remaining[key]:
+            del remaining[key]
+
+class StreamingCorpus:
+    """
+    Iterates the corpus as Examples, one epoch per call.
+
+    Args:
+        path (str): Shard directory, .spacy file, plain JSONL or corpus store.
+        shuffle_buffer (int): Examples held for shuffling (0: only interleave the labels or shards).
+        seed (int): Seed of the shuffling; each epoch uses the next one.
+        limit (int): Maximum examples per epoch (0: no limit).
+        max_length (int): Skip documents with more tokens than this (0: no limit).
+        labels (list): Categories set on raw JSONL articles (one-hot).
+    """
+
+    def __init__(self, path, shuffle_buffer=SHUFFLE_BUFFER, seed=0, limit=0, max_length=0, labels=None):
+        self.path = str(path)
+        if self.path.endswith(COMPRESSED_JSONL_SUFFIXES):
+            raise ValueError(f"{self.path}: compressed JSONL cannot be read label by label without "
+                             f"decompressing it once per label; convert it with corpus_store.py")
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.limit = limit
+        self.max_length = max_length
+        self.labels = list(labels or DEFAULT_LABELS)
+        self.epoch = 0
+        self._normalizer = None
+        self._line_index = None
+        self._indexed_file = None
+
+    def _is_raw(self):
+        return self.path.endswith(JSONL_SUFFIX) or corpus_store.is_corpus(self.path)
+
+    def _shard_docs(self, nlp, rng):
+        shards = _list_shards(self.path)
+        if not shards:
+            raise ValueError(f"No .spacy files found in {self.path}")
+        if self.shuffle_buffer:
+            rng.shuffle(shards)
+        for start in range(0, len(shards), OPEN_SHARDS):
+            doc_bins = {shard: DocBin().from_disk(shard) for shard in shards[start:start + OPEN_SHARDS]}
+            yield from interleave({shard: doc_bin.get_docs(nlp.vocab) for shard, doc_bin in doc_bins.items()},
+                                  {shard: len(doc_bin) for shard, doc_bin in doc_bins.items()}, rng)
+
+    def _jsonl_line_index(self):
+        """Byte offset of every line of the JSONL, by label; rebuilt only when the file changes."""
+        stat = os.stat(self.path)
+        if self._line_index is None or self._indexed_file != (stat.st_size, stat.st_mtime_ns):
+            index = {}
+            with open(self.path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        index.setdefault(json.loads(line)['label'], array('q')).append(offset)
+                    offset += len(line)
+            self._line_index = index
+            self._indexed_file = (stat.st_size, stat.st_mtime_ns)
+        return self._line_index
+
+    def _jsonl_label(self, offsets):
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def _raw_articles(self, rng):
+        if corpus_store.is_corpus(self.path):
+            reader = corpus_store.CorpusReader(self.path)
+            streams, counts = {}, {}
+            for label in reader.labels:
+                frames = list(range(reader.frame_count(label)))
+                rng.shuffle(frames)
+                streams[label] = _labelled(label, reader.iter_frames(label, frames))
+                counts[label] = reader.count(label)
+            yield from interleave(streams, counts, rng)
+            return
+
+        index = self._jsonl_line_index()
+        yield from interleave({label: self._jsonl_label(offsets) for label, offsets in index.items()},
+                              {label: len(offsets) for label, offsets in index.items()}, rng)
+
+    def _raw_docs(self, nlp, rng):
+        if self._normalizer is None:
+            self._normalizer = TextNormalizer()
+        articles = self._raw_articles(rng)
+        while True:
+            batch = list(islice(articles, NORMALIZE_BATCH))
+            if not batch:
+                return
+            docs = self._normalizer.docs_batch([article['text'] for article in batch], nlp, NORMALIZE_BATCH)
+            for doc, article in zip(docs, batch):
+                doc.cats = {label: 0.0 for label in self.labels}
+                if article['label'] in doc.cats:
+                    doc.cats[article['label']] = 1.0
+                yield doc
+
+    def __call__(self, nlp):
+        rng = random.Random(self.seed + self.epoch)
+        self.epoch += 1
+
+        docs = self._raw_docs(nlp, rng) if self._is_raw() else self._shard_docs(nlp, rng)
+        if self.max_length:
+            docs = (doc for doc in docs if len(doc) <= self.max_length)
+        if self.shuffle_buffer:
+            docs = shuffle_buffered(docs, self.shuffle_buffer, rng)
+        if self.limit:
+            docs = islice(docs, self.limit)
+
+        for reference in docs:
+            predicted = Doc(nlp.vocab, words=[token.text for token in reference],
+                            spaces=[bool(token.whitespace_) for token in reference])
+            yield Example(predicted, reference)
+
+@registry.readers("dou.StreamingCorpus.v1")
+def create_streaming_corpus(path, shuffle_buffer=SHUFFLE_BUFFER, seed=0, limit=0, max_length=0, labels=None):
+    return StreamingCorpus(path, shuffle_buffer, seed, limit, max_length, labels)
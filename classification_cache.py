@@ -0,0 +1,343 @@
+"""
+Cache de resultados de classificação endereçado por conteúdo.
+
+A chave é um hash do texto normalizado junto com a identidade do modelo
+carregado (caminho, nome/versão do meta.json e data de modificação), então um
+modelo novo nunca reaproveita resultados do anterior.
+
+Backends disponíveis:
+- InMemoryCache: LRU no próprio processo.
+- SQLiteCache: arquivo sqlite local, compartilhado entre os workers pré-forkados.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+def normalize_for_cache(text):
+    """Normaliza o texto para a chave do cache (Unicode NFC e espaços colapsados)."""
+    text = unicodedata.normalize('NFC', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def model_identity(model):
+    """
+    Identifica o modelo carregado para compor a chave do cache.
+
+    Args:
+        model: Modelo SpaCy carregado.
+
+    Returns:
+        str: Identidade do modelo (caminho, nome, versão e mtime do meta.json).
+    """
+    # Modelos compostos (como a cascata) informam a própria identidade
+    if hasattr(model, 'cache_identity'):
+        return model.cache_identity(model_identity)
+
+    path = getattr(model, 'path', None)
+    meta = getattr(model, 'meta', {}) or {}
+    mtime = ''
+    if path is not None:
+        meta_path = os.path.join(str(path), 'meta.json')
+        if os.path.exists(meta_path):
+            mtime = str(os.path.getmtime(meta_path))
+        path = os.path.abspath(str(path))
+    return f"{path}|{meta.get('name')}|{meta.get('version')}|{mtime}"
+
+def make_cache_key(text, identity):
+    """Hash SHA-256 do texto normalizado mais a identidade do modelo."""
+    payload = identity + '\0' + normalize_for_cache(text)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResultCache(ABC):
+    """Interface comum dos backends de cache, com contadores de acertos."""
+
+    backend = None
+
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key):
+        """Devolve o resultado guardado para `key`, ou None."""
+
+    @abstractmethod
+    def set(self, key, result):
+        """Guarda o resultado de uma classificação."""
+
+    @abstractmethod
+    def clear(self):
+        """Remove todos os resultados."""
+
+    @abstractmethod
+    def size(self):
+        """Devolve (número de entradas, bytes ocupados)."""
+
+    def stats(self):
+        """Estatísticas do cache para o /health."""
+        entries, used_bytes = self.size()
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'backend': self.backend,
+            'entries': entries,
+            'bytes': used_bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions
+        }
+
+    def _expires_at(self):
+        return time.time() + self.ttl if self.ttl else None
+
+class InMemoryCache(ResultCache):
+    """Cache LRU em memória, limitado em bytes, com TTL opcional."""
+
+    backend = 'memory'
+
+    def __init__(self, max_bytes, ttl=None):
+        super().__init__(max_bytes, ttl)
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at is not None and expires_at < time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(payload)
+
+    def set(self, key, result):
+        payload = json.dumps(result, ensure_ascii=False)
+        entry_bytes = len(key) + len(payload.encode('utf-8'))
+        if entry_bytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._expires_at(), payload)
+            self._bytes += entry_bytes
+
+            # Despejar os menos usados recentemente até caber no limite
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self):
+        return len(self._entries), self._bytes
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(key) + len(payload.encode('utf-8'))
+
+class SQLiteCache(ResultCache):
+    """
+    Cache LRU em um arquivo sqlite local, compartilhado entre processos.
+
+    Cada processo (e cada thread) abre sua própria conexão; o modo WAL permite
+    leituras concorrentes enquanto um worker grava.
+
+    Um acerto não grava nada na hora: o last_access fica pendente no processo
+    e é gravado em lote (uma transação) a cada ACCESS_FLUSH_INTERVAL chaves ou
+    ACCESS_FLUSH_SECONDS, e sempre antes de um despejo. Assim a ordem LRU
+    atrasa no máximo alguns segundos em relação aos outros workers.
+    """
+
+    backend = 'sqlite'
+
+    # Verifica o limite de bytes a cada N gravações em vez de em toda gravação
+    EVICTION_CHECK_INTERVAL = 100
+    # Grava os last_access pendentes a cada N chaves acessadas ou N segundos
+    ACCESS_FLUSH_INTERVAL = 100
+    ACCESS_FLUSH_SECONDS = 5.0
+
+    def __init__(self, path, max_bytes, ttl=None):
+        super().__init__(max_bytes, ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._accessed = {}  # key -> último acesso ainda não gravado
+        self._accessed_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        conn.commit()
+
+    def _connection(self):
+        # Conexões não podem atravessar um fork: reabrir se o PID mudou
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            now = time.time()
+            if row is None or (row[1] is not None and row[1] < now):
+                if row is not None:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            self._touch(conn, key, now)
+            self.hits += 1
+            return json.loads(row[0])
+
+        except sqlite3.Error as e:
+            logging.warning(f"Falha ao ler o cache sqlite: {e}")
+            self.misses += 1
+            return None
+
+    def set(self, key, result):
+        payload = json.dumps(result, ensure_ascii=False)
+        entry_bytes = len(key) + len(payload.encode('utf-8'))
+        if entry_bytes > self.max_bytes:
+            return
+
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, entry_bytes, self._expires_at(), time.time())
+            )
+
+            self._writes += 1
+            if self._writes % self.EVICTION_CHECK_INTERVAL == 0:
+                self._evict(conn)
+
+        except sqlite3.Error as e:
+            logging.warning(f"Falha ao gravar no cache sqlite: {e}")
+
+    def _touch(self, conn, key, now):
+        """Registra o acesso a `key`; grava o lote quando ele enche ou envelhece."""
+        with self._accessed_lock:
+            self._accessed[key] = now
+            if (len(self._accessed) < self.ACCESS_FLUSH_INTERVAL and
+                    time.monotonic() - self._flushed_at < self.ACCESS_FLUSH_SECONDS):
+                return
+        self._flush_accesses(conn)
+
+    def _flush_accesses(self, conn):
+        """Grava numa transação os last_access pendentes deste processo."""
+        with self._accessed_lock:
+            accessed, self._accessed = self._accessed, {}
+            self._flushed_at = time.monotonic()
+        if not accessed:
+            return
+        try:
+            conn.execute("BEGIN")
+            conn.executemany("UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?",
+                             [(when, key) for key, when in accessed.items()])
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            # Perder um lote só atrasa a ordem LRU; o acerto continua valendo
+            logging.warning(f"Falha ao gravar os acessos no cache sqlite: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    def _evict(self, conn):
+        """Remove expirados e, se preciso, os menos usados recentemente."""
+        self._flush_accesses(conn)
+        conn.execute("DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+
+        _, used_bytes = self.size()
+        while used_bytes > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM results ORDER BY last_access LIMIT ?",
+                (self.EVICTION_CHECK_INTERVAL,)
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM results WHERE key = ?", [(row[0],) for row in rows])
+            used_bytes -= sum(row[1] for row in rows)
+            self.evictions += len(rows)
+
+    def clear(self):
+        with self._accessed_lock:
+            self._accessed = {}
+        self._connection().execute("DELETE FROM results")
+
+    def size(self):
+        row = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return row[0], row[1]
+
+def create_cache_from_env():
+    """
+    Cria o cache conforme as variáveis de ambiente.
+
+    CLASSIFIER_CACHE: 'memory' (padrão), 'sqlite' ou 'off'
+    CLASSIFIER_CACHE_MAX_MB: limite de memória/disco em MB (padrão: 64)
+    CLASSIFIER_CACHE_TTL: validade das entradas em segundos (padrão: 0, sem expiração)
+    CLASSIFIER_CACHE_PATH: arquivo do backend sqlite
+
+    Returns:
+        ResultCache: Cache configurado, ou None se desligado.
+    """
+    backend = os.environ.get('CLASSIFIER_CACHE', 'memory')
+    max_bytes = int(float(os.environ.get('CLASSIFIER_CACHE_MAX_MB', 64)) * 1024 * 1024)
+    ttl = float(os.environ.get('CLASSIFIER_CACHE_TTL', 0))
+
+    if backend == 'off':
+        return None
+    if backend == 'sqlite':
+        path = os.environ.get('CLASSIFIER_CACHE_PATH', 'cache/classification_cache.sqlite')
+        return SQLiteCache(path, max_bytes, ttl)
+    if backend == 'memory':
+        return InMemoryCache(max_bytes, ttl)
+
+    raise ValueError(f"Backend de cache desconhecido: {backend}")
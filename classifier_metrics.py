@@ -0,0 +1,166 @@
+"""
+Métricas Prometheus do serviço de classificação.
+
+Mede a latência de cada etapa (leitura da requisição, tokenização, textcat,
+ordenação dos scores e serialização), conta requisições e documentos por
+categoria e expõe as estatísticas do cache, do micro-batcher e o RSS do
+processo.
+
+No modo de produção com vários workers, defina PROMETHEUS_MULTIPROC_DIR para
+que contadores e histogramas sejam somados entre os processos.
+"""
+
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TEXT_LENGTH_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 100000, 500000)
+
+STAGE_SECONDS = Histogram(
+    'classifier_stage_duration_seconds',
+    'Duração de cada etapa da classificação',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+REQUESTS = Counter(
+    'classifier_http_requests_total',
+    'Requisições HTTP atendidas',
+    ['endpoint', 'method', 'status']
+)
+REQUEST_SECONDS = Histogram(
+    'classifier_http_request_duration_seconds',
+    'Duração total das requisições HTTP',
+    ['endpoint'],
+    buckets=STAGE_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    'classifier_http_requests_in_flight',
+    'Requisições HTTP em andamento',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+DOCUMENTS = Counter(
+    'classifier_documents_total',
+    'Documentos classificados por categoria prevista',
+    ['category', 'source']
+)
+TEXT_LENGTH = Histogram(
+    'classifier_text_length_chars',
+    'Tamanho dos textos classificados em caracteres',
+    buckets=TEXT_LENGTH_BUCKETS
+)
+SHADOW_COMPARISONS = Counter(
+    'classifier_shadow_comparisons_total',
+    'Comparações entre o modelo principal e o modelo sombra',
+    ['primary', 'shadow', 'agree']
+)
+CASCADE_DECISIONS = Counter(
+    'classifier_cascade_decisions_total',
+    'Documentos decididos por cada estágio da cascata',
+    ['stage']
+)
+MODEL_LOAD_FAILURES = Counter(
+    'classifier_model_load_failures_total',
+    'Cargas de modelo que falharam (inicialização, administração ou sincronização)',
+    ['model']
+)
+PROCESS_RSS = Gauge(
+    'classifier_process_resident_memory_bytes',
+    'Memória residente (RSS) do processo',
+    multiprocess_mode='all'
+)
+
+@contextmanager
+def stage_timer(stage):
+    """Mede a duração do bloco como uma etapa da classificação."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+def record_document(result, text, source='model'):
+    """Conta um documento classificado e registra o tamanho do texto."""
+    if result.get('success'):
+        DOCUMENTS.labels(result['predicted_category'], source).inc()
+    TEXT_LENGTH.observe(len(text))
+
+def current_rss_bytes():
+    """RSS atual do processo (no Linux via /proc; nos demais, o pico)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak * 1024 if os.uname().sysname == 'Linux' else peak
+
+class ServiceStatsCollector:
+    """Expõe as estatísticas do cache e do micro-batcher no momento da coleta."""
+
+    def __init__(self, get_cache, get_batcher):
+        self.get_cache = get_cache
+        self.get_batcher = get_batcher
+
+    def collect(self):
+        cache = self.get_cache()
+        if cache is not None:
+            stats = cache.stats()
+            for name in ('hits', 'misses', 'evictions'):
+                counter = CounterMetricFamily(f'classifier_cache_{name}', f'Cache: {name}', labels=['backend'])
+                counter.add_metric([stats['backend']], stats[name])
+                yield counter
+            for name in ('entries', 'bytes', 'max_bytes'):
+                gauge = GaugeMetricFamily(f'classifier_cache_{name}', f'Cache: {name}', labels=['backend'])
+                gauge.add_metric([stats['backend']], stats[name])
+                yield gauge
+
+        batcher = self.get_batcher()
+        if batcher is not None:
+            stats = batcher.stats()
+            batches = CounterMetricFamily('classifier_micro_batches', 'Lotes processados pelo micro-batcher')
+            batches.add_metric([], stats['batches_processed'])
+            yield batches
+            texts = CounterMetricFamily('classifier_micro_batch_texts', 'Textos processados pelo micro-batcher')
+            texts.add_metric([], stats['texts_processed'])
+            yield texts
+            avg = GaugeMetricFamily('classifier_micro_batch_avg_size', 'Tamanho médio dos lotes do micro-batcher')
+            avg.add_metric([], stats['avg_batch_size'])
+            yield avg
+
+_service_collector = None
+
+def register_service_stats(get_cache, get_batcher):
+    """Registra o coletor de estatísticas do cache e do micro-batcher."""
+    global _service_collector
+    _service_collector = ServiceStatsCollector(get_cache, get_batcher)
+    REGISTRY.register(_service_collector)
+
+def render_metrics():
+    """
+    Gera o texto no formato Prometheus.
+
+    Returns:
+        tuple: (corpo em bytes, content-type).
+    """
+    PROCESS_RSS.set(current_rss_bytes())
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        if _service_collector is not None:
+            registry.register(_service_collector)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_worker_dead(pid):
+    """Descarta as métricas 'live' de um worker encerrado (modo multiprocesso)."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid)
@@ -3,11 +3,38 @@
 Script para gerar arquivo de configuração do SpaCy para classificação de texto.
 """
 
+import argparse
 import os
 from pathlib import Path
 
-def create_config_file():
-    """Cria arquivo de configuração básico para classificação de texto."""
+# Leitor de treino em streaming (cat-model/streaming_corpus.py), para corpora maiores que a memória
+STREAMING_TRAIN_CORPUS = """[corpora.train]
+@readers = "dou.StreamingCorpus.v1"
+path = ${paths.train}
+shuffle_buffer = 10000
+seed = ${system.seed}
+limit = 0
+max_length = 0
+"""
+
+# Com os rótulos no config, o initialize não precisa percorrer o corpus inteiro
+STREAMING_INITIALIZE = """
+[initialize]
+
+[initialize.components]
+
+[initialize.components.textcat]
+labels = ["Portaria","Extrato de Contrato","Extrato de Convênio","Edital","Aviso de Licitação","Resultado de Julgamento","Extrato de Termo Aditivo"]
+positive_label = null
+"""
+
+def build_config_content(streaming=False):
+    """
+    Texto do config.cfg básico para classificação de texto (TextCatEnsemble.v2).
+
+    Com `streaming`, o corpus de treino é lido pelo dou.StreamingCorpus.v1 e
+    `max_epochs = -1` faz o SpaCy consumi-lo em fluxo, sem carregá-lo inteiro.
+    """
     
     config_content = """[system]
 gpu_allocator = null
@@ -134,6 +161,19 @@ vectors = null
 init_tok2vec = null
 """
 
+    if streaming:
+        train_corpus = config_content[config_content.index("[corpora.train]"):config_content.index("[paths]")]
+        config_content = config_content.replace(train_corpus, STREAMING_TRAIN_CORPUS + "\n")
+        config_content = config_content.replace("max_epochs = 0", "max_epochs = -1")
+        config_content += STREAMING_INITIALIZE
+
+    return config_content
+
+def create_config_file(streaming=False):
+    """Cria arquivo de configuração básico para classificação de texto (ver build_config_content)."""
+    
+    config_content = build_config_content(streaming)
+
     # Criar diretório se não existir
     config_dir = Path("cat-model/models/cnn")
     config_dir.mkdir(parents=True, exist_ok=True)
@@ -163,5 +203,10 @@ init_tok2vec = null
     return config_path
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Gera o config.cfg do SpaCy para o textcat')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Lê o treino em fluxo (shards em prepared-data/train ou JSONL comprimido)')
+    args = parser.parse_args()
+
     print("🔧 Gerando arquivo de configuração do SpaCy...")
-    create_config_file() 
\ No newline at end of file
+    create_config_file(streaming=args.streaming) 
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Classificação de documentos longos por janelas.
+
+O texto é dividido em janelas com sobreposição (no estilo do chunkenizer de
+cat-model/spacy_chunkenizer_para_ner_classf_nao_precisa.py), as janelas passam
+por uma única chamada a nlp.pipe e os `doc.cats` de cada janela são agregados.
+A leitura para assim que a confiança agregada passa do limite, então o resto
+do documento nem chega ao modelo.
+"""
+
+import os
+
+# Separadores preferidos para cortar as janelas (mesma ordem do chunkenizer)
+WINDOW_SEPARATORS = ["\n\n", "\n", " ", "."]
+
+LONG_DOCUMENT_WINDOW_SIZE = int(os.environ.get('CLASSIFIER_LONG_DOC_WINDOW_SIZE', 2000))
+LONG_DOCUMENT_WINDOW_OVERLAP = int(os.environ.get('CLASSIFIER_LONG_DOC_WINDOW_OVERLAP', 200))
+LONG_DOCUMENT_BATCH_SIZE = int(os.environ.get('CLASSIFIER_LONG_DOC_BATCH_SIZE', 4))
+LONG_DOCUMENT_AGGREGATION = os.environ.get('CLASSIFIER_LONG_DOC_AGGREGATION', 'confidence')
+LONG_DOCUMENT_EARLY_STOP = float(os.environ.get('CLASSIFIER_LONG_DOC_EARLY_STOP', 0.95))
+LONG_DOCUMENT_MIN_WINDOWS = int(os.environ.get('CLASSIFIER_LONG_DOC_MIN_WINDOWS', 1))
+
+AGGREGATION_STRATEGIES = ('mean', 'max', 'confidence')
+
+def split_into_windows(text, window_size=LONG_DOCUMENT_WINDOW_SIZE, overlap=LONG_DOCUMENT_WINDOW_OVERLAP,
+                       separators=WINDOW_SEPARATORS):
+    """
+    Divide o texto em janelas de até `window_size` caracteres com sobreposição.
+
+    Cada janela é cortada no último separador disponível da sua segunda metade,
+    seguindo a ordem de preferência de `separators`.
+
+    Args:
+        text (str): Texto completo.
+        window_size (int): Tamanho máximo de cada janela em caracteres.
+        overlap (int): Caracteres repetidos entre janelas consecutivas.
+        separators (list): Separadores preferidos para o corte.
+
+    Returns:
+        list: Janelas de texto, na ordem do documento.
+    """
+    if overlap >= window_size:
+        raise ValueError("overlap deve ser menor que window_size")
+
+    windows = []
+    start = 0
+    length = len(text)
+
+    while start < length:
+        end = min(start + window_size, length)
+
+        if end < length:
+            for separator in separators:
+                cut = text.rfind(separator, start + window_size // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+
+        window = text[start:end].strip()
+        if window:
+            windows.append(window)
+
+        if end >= length:
+            break
+
+        # Recuar `overlap` caracteres, começando a próxima janela no início de uma palavra
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+    return windows
+
+def aggregate_scores(window_cats, strategy='confidence'):
+    """
+    Agrega os `doc.cats` das janelas em uma única distribuição.
+
+    Estratégias:
+    - mean: média simples dos scores das janelas.
+    - max: maior score de cada categoria entre as janelas.
+    - confidence: média ponderada pela confiança (maior score) de cada janela.
+
+    O resultado é normalizado para somar 1.
+
+    Args:
+        window_cats (list): Um dicionário `doc.cats` por janela.
+        strategy (str): Estratégia de agregação.
+
+    Returns:
+        dict: Score agregado por categoria.
+    """
+    if strategy not in AGGREGATION_STRATEGIES:
+        raise ValueError(f"Estratégia de agregação desconhecida: {strategy}")
+
+    categories = window_cats[0].keys()
+
+    if strategy == 'max':
+        aggregated = {cat: max(cats[cat] for cats in window_cats) for cat in categories}
+    else:
+        if strategy == 'confidence':
+            weights = [max(cats.values()) for cats in window_cats]
+        else:
+            weights = [1.0] * len(window_cats)
+        aggregated = {
+            cat: sum(w * cats[cat] for w, cats in zip(weights, window_cats))
+            for cat in categories
+        }
+
+    total = sum(aggregated.values())
+    if total > 0:
+        aggregated = {cat: score / total for cat, score in aggregated.items()}
+    return aggregated
+
+def classify_windows(text, model, aggregation=LONG_DOCUMENT_AGGREGATION, early_stop_threshold=LONG_DOCUMENT_EARLY_STOP,
+                     window_size=LONG_DOCUMENT_WINDOW_SIZE, overlap=LONG_DOCUMENT_WINDOW_OVERLAP,
+                     batch_size=LONG_DOCUMENT_BATCH_SIZE, min_windows=LONG_DOCUMENT_MIN_WINDOWS, pipe=None):
+    """
+    Classifica um documento longo janela a janela, com parada antecipada.
+
+    As janelas passam por um único nlp.pipe; como ele é preguiçoso, interromper
+    a iteração evita processar os batches restantes.
+
+    Args:
+        text (str): Texto completo.
+        model: Modelo SpaCy carregado.
+        aggregation (str): 'mean', 'max' ou 'confidence'.
+        early_stop_threshold (float): Confiança agregada que encerra a leitura (None desliga).
+        window_size (int): Tamanho de cada janela em caracteres.
+        overlap (int): Sobreposição entre janelas.
+        batch_size (int): Batch do nlp.pipe (quanto menor, mais cedo a parada pode ocorrer).
+        min_windows (int): Mínimo de janelas antes de considerar a parada.
+        pipe (callable): Substitui `model.pipe` (mesma assinatura; deve ser preguiçoso).
+
+    Returns:
+        tuple: (scores agregados, informações sobre as janelas).
+    """
+    windows = split_into_windows(text, window_size, overlap)
+    window_cats = []
+    early_stopped = False
+
+    pipe = pipe or model.pipe
+    for doc in pipe(windows, batch_size=batch_size):
+        if not doc.cats:
+            break
+        window_cats.append(doc.cats)
+
+        if early_stop_threshold is not None and len(window_cats) >= min_windows:
+            if max(aggregate_scores(window_cats, aggregation).values()) >= early_stop_threshold:
+                early_stopped = len(window_cats) < len(windows)
+                break
+
+    scores = aggregate_scores(window_cats, aggregation) if window_cats else {}
+    info = {
+        'aggregation': aggregation,
+        'windows_total': len(windows),
+        'windows_used': len(window_cats),
+        'early_stopped': early_stopped,
+        'early_stop_threshold': early_stop_threshold
+    }
+    return scores, info
@@ -0,0 +1,388 @@
+"""
+Registro de modelos carregados, com troca a quente e divisão de tráfego.
+
+Vários pipelines podem ficar carregados ao mesmo tempo e ser escolhidos pelo
+nome, por pesos (testes A/B) ou receber tráfego sombra. Um modelo novo é
+carregado e aquecido em segundo plano e só então entra no registro, com uma
+troca atômica do dicionário de modelos, sem indisponibilidade.
+
+Com vários workers (modo de produção), o estado desejado é gravado em um
+arquivo JSON compartilhado; cada worker o confere periodicamente e aplica as
+mudanças feitas por chamadas administrativas recebidas em outro worker.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+# Textos curtos usados para aquecer um modelo antes de colocá-lo em produção
+WARMUP_TEXTS = [
+    "PORTARIA Nº 123, DE 15 DE JUNHO DE 2024 O SECRETÁRIO, no uso das atribuições que lhe confere o art. 1º, resolve:",
+    "EXTRATO DE CONTRATO Nº 10/2024 Processo nº 23000.000000/2024-00. Contratante: Universidade Federal.",
+    "EXTRATO DE CONVÊNIO Espécie: Convênio que entre si celebram a União e o Município.",
+    "EDITAL Nº 5, DE 2 DE FEVEREIRO DE 2024 Torna pública a abertura de inscrições para o processo seletivo.",
+    "AVISO DE LICITAÇÃO PREGÃO ELETRÔNICO Nº 90001/2024 Objeto: aquisição de material de consumo.",
+    "RESULTADO DE JULGAMENTO PREGÃO Nº 12/2024 A pregoeira torna público o resultado do certame.",
+    "EXTRATO DE TERMO ADITIVO Nº 2/2024 ao Contrato nº 15/2023. Objeto: prorrogação do prazo de vigência.",
+]
+
+# Intervalo mínimo entre verificações do arquivo de estado compartilhado
+STATE_CHECK_INTERVAL_SECONDS = 2.0
+# Espera antes de tentar de novo uma sincronização que falhou (ex.: modelo ainda sendo copiado)
+STATE_RETRY_SECONDS = 30.0
+
+class ModelEntry:
+    """Um pipeline carregado no registro."""
+
+    def __init__(self, name, path, nlp, revision=0, warmup_seconds=0.0):
+        self.name = name
+        self.path = path
+        self.nlp = nlp
+        self.revision = revision
+        self.warmup_seconds = warmup_seconds
+        self.loaded_at = datetime.now().isoformat()
+
+    def describe(self):
+        """Informações do modelo para os endpoints de administração."""
+        return {
+            'name': self.name,
+            'path': self.path,
+            'revision': self.revision,
+            'pipe_names': self.nlp.pipe_names,
+            'loaded_at': self.loaded_at,
+            'warmup_seconds': self.warmup_seconds
+        }
+
+class ModelRegistry:
+    """
+    Guarda os modelos carregados e decide qual atende cada requisição.
+
+    Leituras não usam lock: o dicionário de modelos e a configuração de
+    roteamento são substituídos por inteiro a cada mudança, e a troca de uma
+    referência é atômica no CPython.
+    """
+
+    def __init__(self, loader, on_default_change=None, state_path=None, warmup_texts=WARMUP_TEXTS,
+                 on_load_failure=None):
+        self.loader = loader
+        self.on_default_change = on_default_change
+        self.on_load_failure = on_load_failure
+        self.state_path = state_path
+        self.warmup_texts = warmup_texts
+        self._entries = {}
+        self._routing = {'default': None, 'weights': {}, 'shadow': None}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._state_checked_at = 0.0
+        self._syncing = False
+
+    # Consulta
+
+    def get(self, name=None):
+        """Devolve o modelo pelo nome (ou o padrão), ou None."""
+        return self._entries.get(name or self._routing['default'])
+
+    def route(self, name=None):
+        """
+        Escolhe o modelo de uma requisição.
+
+        Args:
+            name (str): Nome pedido explicitamente; se ausente, usa os pesos
+                configurados ou, sem pesos, o modelo padrão.
+
+        Returns:
+            ModelEntry: Modelo escolhido, ou None se não houver.
+        """
+        if name:
+            return self._entries.get(name)
+
+        weights = self._routing['weights']
+        if weights:
+            names = list(weights)
+            chosen = random.choices(names, weights=[weights[n] for n in names])[0]
+            entry = self._entries.get(chosen)
+            if entry is not None:
+                return entry
+
+        return self.get()
+
+    def shadow(self):
+        """Modelo que recebe cópia do tráfego (sem afetar a resposta), ou None."""
+        name = self._routing['shadow']
+        return self._entries.get(name) if name else None
+
+    def status(self):
+        """Estado completo do registro."""
+        return {
+            'default': self._routing['default'],
+            'weights': self._routing['weights'],
+            'shadow': self._routing['shadow'],
+            'models': [entry.describe() for entry in self._entries.values()],
+            'loading': dict(self._loading)
+        }
+
+    # Alterações
+
+    def load(self, name, path, activate=False, warmup=True, revision=None):
+        """
+        Carrega, aquece e registra um modelo (bloqueante).
+
+        O modelo só fica visível depois de aquecido; um modelo com o mesmo
+        nome é substituído atomicamente.
+
+        Args:
+            name (str): Nome do modelo no registro.
+            path (str): Diretório do pipeline (por exemplo, .../model-best).
+            activate (bool): Torna o modelo o padrão depois de carregado.
+            warmup (bool): Processa textos de exemplo antes da troca.
+            revision (int): Revisão do estado compartilhado que originou a carga.
+
+        Returns:
+            ModelEntry: Modelo registrado.
+        """
+        self._loading[name] = {'path': path, 'state': 'loading', 'started_at': datetime.now().isoformat()}
+        try:
+            nlp = self.loader(path)
+
+            warmup_seconds = 0.0
+            if warmup and self.warmup_texts:
+                start = time.perf_counter()
+                for _ in nlp.pipe(self.warmup_texts):
+                    pass
+                warmup_seconds = time.perf_counter() - start
+
+            entry = ModelEntry(name, path, nlp, revision or 0, warmup_seconds)
+            with self._lock:
+                entries = dict(self._entries)
+                entries[name] = entry
+                self._entries = entries
+
+                if activate or self._routing['default'] is None:
+                    self._set_routing(default=name)
+
+            self._loading[name] = {'path': path, 'state': 'ready', 'finished_at': datetime.now().isoformat()}
+            logging.info(f"Modelo '{name}' pronto ({path}), aquecimento em {warmup_seconds:.2f}s")
+            return entry
+
+        except Exception as e:
+            self._loading[name] = {'path': path, 'state': 'failed', 'error': str(e)}
+            logging.error(f"Falha ao carregar o modelo '{name}' de {path}: {e}")
+            if self.on_load_failure is not None:
+                self.on_load_failure(name, path, e)
+            raise
+
+    def load_in_background(self, name, path, activate=False, warmup=True):
+        """
+        Carrega um modelo numa thread de fundo e publica a intenção no estado compartilhado.
+
+        Returns:
+            threading.Thread: Thread da carga.
+        """
+        revision = self._publish_model(name, path, activate)
+
+        def run():
+            try:
+                self.load(name, path, activate=activate, warmup=warmup, revision=revision)
+            except Exception:
+                # load() já registrou a falha em status() e no on_load_failure
+                logging.error(traceback.format_exc())
+
+        thread = threading.Thread(target=run, name=f'load-model-{name}', daemon=True)
+        thread.start()
+        return thread
+
+    def set_routing(self, default=None, weights=None, shadow=None, clear_shadow=False):
+        """
+        Altera o roteamento de tráfego.
+
+        Args:
+            default (str): Novo modelo padrão.
+            weights (dict): Pesos por nome para divisão de tráfego ({} desliga).
+            shadow (str): Modelo que recebe tráfego sombra.
+            clear_shadow (bool): Desliga o tráfego sombra.
+
+        Raises:
+            ValueError: Se algum nome não estiver carregado ou os pesos forem inválidos.
+        """
+        with self._lock:
+            self._set_routing(default, weights, shadow, clear_shadow)
+        self._publish_routing(default, weights, shadow, clear_shadow)
+
+    def unload(self, name):
+        """Remove um modelo do registro (o modelo padrão não pode ser removido)."""
+        with self._lock:
+            if name not in self._entries:
+                raise ValueError(f"Modelo desconhecido: {name}")
+            if name == self._routing['default']:
+                raise ValueError("O modelo padrão não pode ser removido")
+
+            entries = dict(self._entries)
+            del entries[name]
+            self._entries = entries
+
+            routing = dict(self._routing)
+            routing['weights'] = {n: w for n, w in routing['weights'].items() if n != name}
+            if routing['shadow'] == name:
+                routing['shadow'] = None
+            self._routing = routing
+
+        self._publish_unload(name)
+
+    def _set_routing(self, default=None, weights=None, shadow=None, clear_shadow=False):
+        # Deve ser chamado com self._lock adquirido
+        for name in [default, shadow] + list(weights or {}):
+            if name is not None and name not in self._entries:
+                raise ValueError(f"Modelo não carregado: {name}")
+        if weights and (any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0):
+            raise ValueError("Pesos devem ser não negativos e somar mais que zero")
+
+        routing = dict(self._routing)
+        if default is not None:
+            routing['default'] = default
+        if weights is not None:
+            routing['weights'] = dict(weights)
+        if shadow is not None:
+            routing['shadow'] = shadow
+        if clear_shadow:
+            routing['shadow'] = None
+
+        changed_default = routing['default'] != self._routing['default']
+        self._routing = routing
+
+        if changed_default and self.on_default_change is not None:
+            self.on_default_change(self._entries[routing['default']])
+
+    # Estado compartilhado entre workers
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'generation': 0, 'models': {}, 'routing': {}}
+
+    def _write_state(self, update):
+        """
+        Lê, altera e grava o estado compartilhado de forma atômica.
+
+        Um flock no arquivo `.lock` ao lado do estado serializa a leitura e a
+        gravação entre workers, para que mudanças simultâneas não se percam.
+        `update` deve alterar só os campos da chamada: o resto do estado pode
+        trazer mudanças de outros workers que este ainda não aplicou.
+        """
+        if not self.state_path:
+            return None
+
+        with open(f'{self.state_path}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self._read_state()
+            previous = state.get('generation', 0)
+            state['generation'] = previous + 1
+            update(state)
+
+            tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_path)
+
+        # Só pular a nova geração se este worker já tinha aplicado todas as anteriores;
+        # senão o próximo sync_state aplica o estado inteiro, esta mudança inclusa
+        if previous == self._generation:
+            self._generation = state['generation']
+        return state['generation']
+
+    def _publish_model(self, name, path, activate):
+        def update(state):
+            state.setdefault('models', {})[name] = {'path': path, 'revision': state['generation']}
+            if activate:
+                state.setdefault('routing', {})['default'] = name
+        return self._write_state(update)
+
+    def _publish_routing(self, default=None, weights=None, shadow=None, clear_shadow=False):
+        def update(state):
+            routing = state.setdefault('routing', {})
+            if default is not None:
+                routing['default'] = default
+            if weights is not None:
+                routing['weights'] = dict(weights)
+            if shadow is not None:
+                routing['shadow'] = shadow
+            if clear_shadow:
+                routing['shadow'] = None
+        self._write_state(update)
+
+    def _publish_unload(self, name):
+        def update(state):
+            state.setdefault('models', {}).pop(name, None)
+            routing = state.setdefault('routing', {})
+            routing['weights'] = {n: w for n, w in (routing.get('weights') or {}).items() if n != name}
+            if routing.get('shadow') == name:
+                routing['shadow'] = None
+        self._write_state(update)
+
+    def publish_current_state(self):
+        """Grava no estado compartilhado os modelos carregados na inicialização."""
+        entries = self._entries
+        routing = self._routing
+
+        def update(state):
+            state['models'] = {n: {'path': e.path, 'revision': e.revision} for n, e in entries.items()}
+            state['routing'] = dict(routing)
+        self._write_state(update)
+
+    def sync_state(self):
+        """
+        Aplica mudanças feitas por outros workers (no máximo a cada poucos segundos).
+
+        Modelos novos são carregados numa thread de fundo; o roteamento só é
+        aplicado depois que todos os modelos que ele cita estiverem prontos.
+        """
+        if not self.state_path or self._syncing:
+            return
+
+        now = time.monotonic()
+        if now - self._state_checked_at < STATE_CHECK_INTERVAL_SECONDS:
+            return
+        self._state_checked_at = now
+
+        state = self._read_state()
+        if state.get('generation', 0) <= self._generation:
+            return
+
+        self._syncing = True
+        threading.Thread(target=self._apply_state, args=(state,), name='sync-models', daemon=True).start()
+
+    def _apply_state(self, state):
+        try:
+            models = state.get('models', {})
+            for name, spec in models.items():
+                entry = self._entries.get(name)
+                if entry is None or entry.path != spec['path'] or entry.revision != spec.get('revision', 0):
+                    self.load(name, spec['path'], revision=spec.get('revision', 0))
+
+            routing = state.get('routing', {})
+            with self._lock:
+                self._set_routing(default=routing.get('default'),
+                                  weights=routing.get('weights') or {},
+                                  shadow=routing.get('shadow'),
+                                  clear_shadow=routing.get('shadow') is None)
+
+                stale = [name for name in self._entries if name not in models]
+                if stale:
+                    self._entries = {n: e for n, e in self._entries.items() if n in models}
+
+            self._generation = state.get('generation', 0)
+
+        except Exception as e:
+            # A geração continua pendente; tentar de novo daqui a STATE_RETRY_SECONDS, não a cada requisição
+            logging.error(f"Falha ao sincronizar os modelos com o estado compartilhado: {e}")
+            self._state_checked_at = time.monotonic() + STATE_RETRY_SECONDS - STATE_CHECK_INTERVAL_SECONDS
+        finally:
+            self._syncing = False
@@ -0,0 +1,565 @@
+"""
+Motor de inferência do textcat em NumPy puro.
+
+O comando `export` lê um `model-best` do SpaCy e grava num único arquivo .npz
+só o que o passo forward do textcat usa: os pesos do BOW (SparseLinear) e, nas
+arquiteturas ensemble e cnn, as tabelas de embeddings com hash, as camadas
+maxout/layernorm, a atenção e a camada de saída.
+
+Em vez de reimplementar os hashes do thinc, o export consulta as próprias
+camadas do modelo para cada n-grama e cada atributo (NORM, PREFIX, SUFFIX,
+SHAPE...) visto nos corpora de treino e validação, e grava as linhas por string.
+Strings nunca vistas contribuem com zero, então os scores reproduzem `doc.cats`
+dentro de uma tolerância; o comando `verify` mede essa diferença em test.spacy.
+
+Na inferência, `NumpyTextcat` imita a interface de um `Language` usada pelo
+servidor (pipe, tokenizer.pipe, pipeline, pipe_names) e classifica cada batch
+com operações matriciais, sem importar SpaCy nem thinc.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+
+# Nome padrão do arquivo exportado dentro da pasta do modelo
+EXPORT_FILENAME = 'textcat_numpy.npz'
+
+# Separador dos tokens de um n-grama nas tabelas do BOW
+NGRAM_SEPARATOR = '\x1f'
+
+# Atributos léxicos que o motor sabe calcular sem SpaCy
+SUPPORTED_ATTRS = ('ORTH', 'LOWER', 'NORM', 'PREFIX', 'SUFFIX', 'SHAPE')
+
+# Tokenização aproximada à do SpaCy para o português: números com separadores,
+# palavras e cada sinal de pontuação isolado
+TOKEN_PATTERN = re.compile(r"\d+(?:[.,/]\d+)*|\w+|[^\w\s]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def tokenize(text):
+    """
+    Divide o texto em tokens como o tokenizador do SpaCy faz na maioria dos casos.
+
+    Um espaço simples separa tokens; o restante de uma sequência de espaço em
+    branco (como quebras de linha) vira um token próprio, como no SpaCy.
+
+    Args:
+        text (str): Texto original.
+
+    Returns:
+        list: Textos dos tokens.
+    """
+    tokens = []
+    position = 0
+    for match in WHITESPACE_PATTERN.finditer(text):
+        tokens.extend(TOKEN_PATTERN.findall(text, position, match.start()))
+        space = match.group()
+        if match.start() > 0 and space.startswith(' '):
+            # O SpaCy guarda o primeiro espaço como `whitespace_` do token anterior
+            space = space[1:]
+        if space:
+            tokens.append(space)
+        position = match.end()
+    tokens.extend(TOKEN_PATTERN.findall(text, position))
+    return tokens
+
+def word_shape(text):
+    """Forma da palavra no formato do SpaCy (por exemplo, 'Portaria' -> 'Xxxxx')."""
+    if len(text) >= 100:
+        return 'LONG'
+    shape = []
+    last = ''
+    seq = 0
+    for char in text:
+        if char.isalpha():
+            shape_char = 'X' if char.isupper() else 'x'
+        elif char.isdigit():
+            shape_char = 'd'
+        else:
+            shape_char = char
+        if shape_char == last:
+            seq += 1
+        else:
+            seq = 0
+            last = shape_char
+        if seq < 4:
+            shape.append(shape_char)
+    return ''.join(shape)
+
+def token_attribute(token, attr, norm_exceptions=None):
+    """Valor de um atributo léxico (ORTH, LOWER, NORM, PREFIX, SUFFIX, SHAPE) de um token."""
+    if attr == 'ORTH':
+        return token
+    if attr == 'LOWER':
+        return token.lower()
+    if attr == 'NORM':
+        return (norm_exceptions or {}).get(token, token.lower())
+    if attr == 'PREFIX':
+        return token[:1]
+    if attr == 'SUFFIX':
+        return token[-3:]
+    if attr == 'SHAPE':
+        return word_shape(token)
+    raise ValueError(f"Atributo não suportado pelo motor NumPy: {attr}")
+
+def _softmax(X):
+    X = X - X.max(axis=-1, keepdims=True)
+    np.exp(X, out=X)
+    X /= X.sum(axis=-1, keepdims=True)
+    return X
+
+def _sigmoid(X):
+    return 1.0 / (1.0 + np.exp(-X))
+
+def _maxout(X, W, b):
+    # W: (nO, nP, nI), b: (nO, nP) como no Maxout do thinc
+    nO, nP, nI = W.shape
+    Y = X @ W.reshape(nO * nP, nI).T + b.reshape(nO * nP)
+    return Y.reshape(X.shape[0], nO, nP).max(axis=-1)
+
+def _layer_norm(X, G, b):
+    mu = X.mean(axis=1, keepdims=True)
+    var = X.var(axis=1, keepdims=True) + 1e-08
+    return (X - mu) * var ** -0.5 * G + b
+
+def _expand_window(X, window_size):
+    # Concatena cada linha com as `window_size` vizinhas de cada lado (zeros fora do array)
+    rows, width = X.shape
+    padded = np.zeros((rows + 2 * window_size, width), dtype=X.dtype)
+    padded[window_size:window_size + rows] = X
+    return np.hstack([padded[offset:offset + rows] for offset in range(2 * window_size + 1)])
+
+class NumpyDoc:
+    """Resultado do motor NumPy com a parte da interface do Doc usada pelo servidor."""
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self.cats = {}
+
+    def __len__(self):
+        return len(self.tokens)
+
+class _Tokenizer:
+    """Tokenizador com a interface `pipe` do tokenizador do SpaCy."""
+
+    def __call__(self, text):
+        return NumpyDoc(text, tokenize(text))
+
+    def pipe(self, texts, batch_size=64):
+        for text in texts:
+            yield self(text)
+
+class NumpyTextcat:
+    """
+    Passo forward do textcat exportado, em NumPy.
+
+    Suporta as arquiteturas TextCatBOW, TextCatEnsemble e TextCatCNN com
+    tok2vec próprio (MultiHashEmbed + MaxoutWindowEncoder).
+    """
+
+    def __init__(self, weights, path=None):
+        self.path = path
+        self.config = json.loads(str(weights['config']))
+        self.labels = list(self.config['labels'])
+        self.architecture = self.config['architecture']
+        self.exclusive = self.config['exclusive_classes']
+        # A data do export entra na versão para que um export novo não reaproveite o cache de resultados
+        self.meta = {'name': self.config.get('name', 'textcat'),
+                     'version': f"{self.config.get('version', '')}+numpy.{self.config.get('exported_at', '')}",
+                     'backend': 'numpy'}
+        self.lang = self.config.get('lang', 'pt')
+        self.component_name = self.config.get('component', 'textcat')
+        self.pipe_names = [self.component_name]
+        self.tokenizer = _Tokenizer()
+        self.pipeline = [(self.component_name, self)]
+
+        self.ngram_size = self.config.get('ngram_size', 1)
+        if self.architecture in ('bow', 'ensemble'):
+            self.bow_index = self._index(weights['bow_keys'])
+            self.bow_W = np.vstack([weights['bow_W'], np.zeros((1, len(self.labels)), dtype=np.float32)])
+            self.bow_b = weights['bow_b']
+
+        if self.architecture in ('ensemble', 'cnn'):
+            self.attrs = self.config['attrs']
+            self.depth = self.config['depth']
+            self.window_size = self.config['window_size']
+            self.norm_exceptions = self.config.get('norm_exceptions', {})
+            self.embed_index = []
+            self.embed_tables = []
+            for i in range(len(self.attrs)):
+                table = weights[f'embed_{i}_E']
+                self.embed_index.append(self._index(weights[f'embed_{i}_keys']))
+                self.embed_tables.append(np.vstack([table, np.zeros((1, table.shape[1]), dtype=table.dtype)]))
+            self.mix = self._layer(weights, 'mix')
+            self.encoder = [self._layer(weights, f'encode_{i}') for i in range(self.depth)]
+            if self.architecture == 'ensemble':
+                self.attention_Q = weights['attention_Q']
+                self.reduce = self._layer(weights, 'reduce')
+            self.output_W = weights['output_W']
+            self.output_b = weights['output_b']
+
+    @staticmethod
+    def _index(keys):
+        return {key: i for i, key in enumerate(keys.tolist())}
+
+    @staticmethod
+    def _layer(weights, prefix):
+        return tuple(weights[f'{prefix}_{name}'] for name in ('W', 'b', 'G', 'beta'))
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Carrega os pesos exportados.
+
+        Args:
+            path (str): Arquivo .npz ou pasta do modelo que contém EXPORT_FILENAME.
+
+        Returns:
+            NumpyTextcat: Motor pronto para classificar.
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, EXPORT_FILENAME)
+        with np.load(path, allow_pickle=False) as weights:
+            return cls(weights, path=path)
+
+    def __call__(self, text):
+        return next(self.pipe([text]))
+
+    def pipe(self, texts, batch_size=64):
+        """Classifica textos (ou NumpyDocs já tokenizados) em batches, preguiçosamente."""
+        batch = []
+        for item in texts:
+            batch.append(item if isinstance(item, NumpyDoc) else self.tokenizer(item))
+            if len(batch) >= batch_size:
+                yield from self._set_cats(batch)
+                batch = []
+        if batch:
+            yield from self._set_cats(batch)
+
+    def _set_cats(self, docs):
+        scores = self.predict([doc.tokens for doc in docs])
+        for doc, row in zip(docs, scores):
+            doc.cats = {label: float(score) for label, score in zip(self.labels, row)}
+        return docs
+
+    def predict(self, token_lists):
+        """
+        Calcula os scores de um batch de documentos tokenizados.
+
+        Args:
+            token_lists (list): Uma lista de tokens por documento.
+
+        Returns:
+            numpy.ndarray: Scores (documentos x rótulos), na ordem de `labels`.
+        """
+        if not token_lists:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+
+        if self.architecture == 'bow':
+            return self._bow(token_lists)
+
+        features = self._tok2vec(token_lists)
+        if self.architecture == 'ensemble':
+            features = np.hstack([self._bow(token_lists), features])
+        logits = features @ self.output_W.T + self.output_b
+        return _softmax(logits) if self.exclusive else _sigmoid(logits)
+
+    def _bow(self, token_lists):
+        unknown = len(self.bow_W) - 1
+        rows = []
+        doc_ids = []
+        for i, tokens in enumerate(token_lists):
+            keys = list(tokens)
+            for n in range(2, self.ngram_size + 1):
+                keys.extend(NGRAM_SEPARATOR.join(tokens[j:j + n]) for j in range(len(tokens) - n + 1))
+            rows.extend(self.bow_index.get(key, unknown) for key in keys)
+            doc_ids.extend([i] * len(keys))
+
+        logits = np.tile(self.bow_b, (len(token_lists), 1))
+        np.add.at(logits, np.asarray(doc_ids, dtype=np.intp), self.bow_W[np.asarray(rows, dtype=np.intp)])
+        if self.config.get('bow_output_layer', True):
+            return _softmax(logits) if self.exclusive else _sigmoid(logits)
+        return logits
+
+    def _tok2vec_rows(self, tokens):
+        return [
+            [index.get(token_attribute(token, attr, self.norm_exceptions), len(index)) for token in tokens]
+            for attr, index in zip(self.attrs, self.embed_index)
+        ]
+
+    def _tok2vec(self, token_lists):
+        lengths = np.asarray([len(tokens) for tokens in token_lists], dtype=np.intp)
+        all_tokens = [token for tokens in token_lists for token in tokens]
+        width = self.embed_tables[0].shape[1]
+        if not all_tokens:
+            return np.zeros((len(token_lists), width), dtype=np.float32)
+
+        # MultiHashEmbed: soma das linhas por atributo, concatenadas e misturadas por um maxout
+        rows = self._tok2vec_rows(all_tokens)
+        X = np.hstack([table[np.asarray(ids, dtype=np.intp)] for table, ids in zip(self.embed_tables, rows)])
+        W, b, G, beta = self.mix
+        X = _layer_norm(_maxout(X, W, b), G, beta)
+
+        # MaxoutWindowEncoder: os documentos são separados por `depth * window_size` linhas de zeros,
+        # como no with_array(pad=...) do thinc
+        pad = self.depth * self.window_size
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        padded_starts = starts + pad * (np.arange(len(lengths)) + 1)
+        padded = np.zeros((len(all_tokens) + pad * (len(lengths) + 1), width), dtype=X.dtype)
+        token_rows = np.concatenate([np.arange(s, s + n) for s, n in zip(padded_starts, lengths)])
+        padded[token_rows] = X
+        for W, b, G, beta in self.encoder:
+            padded = padded + _layer_norm(_maxout(_expand_window(padded, self.window_size), W, b), G, beta)
+        X = padded[token_rows]
+
+        doc_ids = np.repeat(np.arange(len(lengths)), lengths)
+        if self.architecture == 'cnn':
+            summed = np.zeros((len(lengths), width), dtype=X.dtype)
+            np.add.at(summed, doc_ids, X)
+            return summed / np.maximum(lengths, 1)[:, None]
+
+        # Atenção paramétrica: softmax dos scores dentro de cada documento, depois soma
+        scores = X @ self.attention_Q.reshape(-1)
+        doc_max = np.full(len(lengths), -np.inf, dtype=scores.dtype)
+        np.maximum.at(doc_max, doc_ids, scores)
+        weights = np.exp(scores - doc_max[doc_ids])
+        totals = np.zeros(len(lengths), dtype=weights.dtype)
+        np.add.at(totals, doc_ids, weights)
+        weights /= totals[doc_ids]
+        summed = np.zeros((len(lengths), width), dtype=X.dtype)
+        np.add.at(summed, doc_ids, X * weights[:, None])
+
+        W, b, G, beta = self.reduce
+        return summed + _layer_norm(_maxout(summed, W, b), G, beta)
+
+def _walk(model):
+    # Percorre a árvore de camadas do thinc na ordem do fluxo de dados
+    yield model
+    for layer in model.layers:
+        yield from _walk(layer)
+
+def _architecture(model_config):
+    name = model_config['@architectures']
+    for key, architecture in (('BOW', 'bow'), ('Ensemble', 'ensemble'), ('CNN', 'cnn')):
+        if key in name:
+            return architecture
+    raise ValueError(f"Arquitetura não suportada pelo motor NumPy: {name}")
+
+def _corpus_docs(nlp, corpus_paths):
+    from spacy.tokens import DocBin
+
+    for corpus_path in corpus_paths:
+        yield from DocBin().from_disk(corpus_path).get_docs(nlp.vocab)
+
+def _probe_bow(sparse_linear, ngram_keys, chunk_size=50000):
+    # Uma consulta com um único n-grama por "documento" devolve b + os pesos daquele n-grama
+    b = sparse_linear.get_param('b')
+    lengths = np.ones(chunk_size, dtype=np.int32)
+    values = np.ones(chunk_size, dtype=np.float32)
+    rows = []
+    for start in range(0, len(ngram_keys), chunk_size):
+        keys = np.asarray(ngram_keys[start:start + chunk_size], dtype=np.uint64)
+        output = sparse_linear.predict((keys, values[:len(keys)], lengths[:len(keys)]))
+        rows.append(np.asarray(output, dtype=np.float32) - b)
+    return np.vstack(rows) if rows else np.zeros((0, len(b)), dtype=np.float32)
+
+def _probe_embed(hash_embed, keys, chunk_size=50000):
+    column = hash_embed.attrs.get('column') or 0
+    rows = []
+    for start in range(0, len(keys), chunk_size):
+        ids = np.zeros((len(keys[start:start + chunk_size]), column + 1), dtype=np.uint64)
+        ids[:, column] = keys[start:start + chunk_size]
+        rows.append(np.asarray(hash_embed.predict(ids), dtype=np.float32))
+    return np.vstack(rows)
+
+def _layer_arrays(maxout, layer_norm):
+    return [np.asarray(maxout.get_param('W'), dtype=np.float32), np.asarray(maxout.get_param('b'), dtype=np.float32),
+            np.asarray(layer_norm.get_param('G'), dtype=np.float32),
+            np.asarray(layer_norm.get_param('b'), dtype=np.float32)]
+
+def export_textcat(model_path, output_path=None, corpus_paths=('cat-model/prepared-data/train.spacy',
+                                                               'cat-model/prepared-data/dev.spacy')):
+    """
+    Exporta o textcat de um modelo SpaCy para o formato do motor NumPy.
+
+    Args:
+        model_path (str): Pasta do modelo (por exemplo, cat-model/models/bow/model-best).
+        output_path (str): Arquivo .npz de saída (padrão: EXPORT_FILENAME dentro da pasta do modelo).
+        corpus_paths (tuple): Arquivos .spacy cujos n-gramas e atributos entram nas tabelas.
+
+    Returns:
+        str: Caminho do arquivo gerado.
+    """
+    import spacy
+    from spacy.attrs import ORTH
+
+    nlp = spacy.load(model_path)
+    component_name = next((name for name in ('textcat', 'textcat_multilabel') if name in nlp.pipe_names), None)
+    if component_name is None:
+        raise ValueError("O modelo não possui componente textcat")
+
+    component = nlp.get_pipe(component_name)
+    model_config = nlp.config['components'][component_name]['model']
+    architecture = _architecture(model_config)
+    layers = list(_walk(component.model))
+
+    config = {
+        'architecture': architecture,
+        'component': component_name,
+        'labels': list(component.labels),
+        'exclusive_classes': component_name == 'textcat',
+        'lang': nlp.lang,
+        'name': nlp.meta.get('name', ''),
+        'version': nlp.meta.get('version', ''),
+        'exported_at': datetime.now().strftime('%Y%m%d%H%M%S')
+    }
+    arrays = {}
+    docs = list(_corpus_docs(nlp, corpus_paths))
+
+    if architecture in ('bow', 'ensemble'):
+        bow_config = model_config['linear_model'] if architecture == 'ensemble' else model_config
+        ngram_size = bow_config.get('ngram_size', 1)
+        config['ngram_size'] = ngram_size
+        config['bow_output_layer'] = not bow_config.get('no_output_layer', False)
+
+        sparse_linear = next(layer for layer in layers if layer.name.startswith('sparse_linear'))
+        ngrams = {}
+        for doc in docs:
+            tokens = [token.text for token in doc]
+            keys = sparse_linear.ops.asarray(doc.to_array(ORTH))
+            ngrams.update(zip(tokens, keys.tolist()))
+            for n in range(2, ngram_size + 1):
+                names = [NGRAM_SEPARATOR.join(tokens[j:j + n]) for j in range(len(tokens) - n + 1)]
+                ngrams.update(zip(names, sparse_linear.ops.ngrams(n, keys).tolist()))
+
+        names = sorted(ngrams)
+        arrays['bow_keys'] = np.asarray(names, dtype=str)
+        arrays['bow_W'] = _probe_bow(sparse_linear, [ngrams[name] for name in names])
+        arrays['bow_b'] = np.asarray(sparse_linear.get_param('b'), dtype=np.float32)
+
+    if architecture in ('ensemble', 'cnn'):
+        tok2vec_config = model_config['tok2vec']
+        if 'embed' not in tok2vec_config or 'encode' not in tok2vec_config:
+            raise ValueError("O motor NumPy só suporta textcat com tok2vec próprio (MultiHashEmbed)")
+        embed_config = tok2vec_config['embed']
+        encode_config = tok2vec_config['encode']
+        if embed_config.get('include_static_vectors'):
+            raise ValueError("O motor NumPy não suporta vetores estáticos")
+        attrs = [attr.upper() for attr in embed_config['attrs']]
+        unsupported = [attr for attr in attrs if attr not in SUPPORTED_ATTRS]
+        if unsupported:
+            raise ValueError(f"Atributos não suportados pelo motor NumPy: {', '.join(unsupported)}")
+
+        config['attrs'] = attrs
+        config['depth'] = encode_config['depth']
+        config['window_size'] = encode_config['window_size']
+        config['norm_exceptions'] = {token.text: token.norm_ for doc in docs for token in doc
+                                     if token.norm_ != token.lower_}
+
+        hash_embeds = [layer for layer in layers if layer.name == 'hashembed']
+        for i, (attr, hash_embed) in enumerate(zip(attrs, hash_embeds)):
+            values = sorted({getattr(token, f'{attr.lower()}_') for doc in docs for token in doc})
+            keys = np.asarray([nlp.vocab.strings.add(value) for value in values], dtype=np.uint64)
+            arrays[f'embed_{i}_keys'] = np.asarray(values, dtype=str)
+            arrays[f'embed_{i}_E'] = _probe_embed(hash_embed, keys)
+
+        # Ordem do fluxo de dados: mistura do embed, camadas do encoder e, no ensemble, o maxout após a atenção
+        maxouts = [layer for layer in layers if layer.name == 'maxout']
+        layer_norms = [layer for layer in layers if layer.name == 'layernorm']
+        expected = config['depth'] + (2 if architecture == 'ensemble' else 1)
+        if len(maxouts) != expected or len(layer_norms) != expected:
+            raise ValueError("Estrutura do tok2vec diferente da esperada para o motor NumPy")
+
+        names = ['mix'] + [f'encode_{i}' for i in range(config['depth'])]
+        if architecture == 'ensemble':
+            names.append('reduce')
+            arrays['attention_Q'] = np.asarray(
+                next(layer for layer in layers if layer.has_param('Q')).get_param('Q'), dtype=np.float32)
+        for name, maxout, layer_norm in zip(names, maxouts, layer_norms):
+            for suffix, array in zip(('W', 'b', 'G', 'beta'), _layer_arrays(maxout, layer_norm)):
+                arrays[f'{name}_{suffix}'] = array
+
+        output = [layer for layer in layers if layer.name in ('softmax', 'linear') and layer.has_param('W')][-1]
+        arrays['output_W'] = np.asarray(output.get_param('W'), dtype=np.float32)
+        arrays['output_b'] = np.asarray(output.get_param('b'), dtype=np.float32)
+
+    output_path = output_path or os.path.join(model_path, EXPORT_FILENAME)
+    np.savez_compressed(output_path, config=np.asarray(json.dumps(config, ensure_ascii=False)), **arrays)
+    return output_path
+
+def verify_export(model_path, weights_path=None, test_path='cat-model/prepared-data/test.spacy', tolerance=1e-3,
+                  batch_size=64):
+    """
+    Compara os scores do motor NumPy com os `doc.cats` do SpaCy no conjunto de teste.
+
+    A comparação é feita duas vezes: com os tokens do SpaCy (mede só o forward
+    exportado) e com o tokenizador do motor (mede o caminho completo usado no servidor).
+
+    Args:
+        model_path (str): Pasta do modelo SpaCy.
+        weights_path (str): Arquivo exportado (padrão: EXPORT_FILENAME dentro da pasta do modelo).
+        test_path (str): Arquivo .spacy de teste.
+        tolerance (float): Diferença absoluta máxima aceita em cada score.
+        batch_size (int): Tamanho do batch.
+
+    Returns:
+        dict: Por modo de tokenização, a maior diferença, a parcela de documentos
+        dentro da tolerância e a concordância da categoria prevista.
+    """
+    import spacy
+
+    nlp = spacy.load(model_path)
+    engine = NumpyTextcat.from_path(weights_path or model_path)
+    texts = [doc.text for doc in _corpus_docs(nlp, [test_path])]
+    expected = np.asarray([[doc.cats[label] for label in engine.labels]
+                           for doc in nlp.pipe(texts, batch_size=batch_size)], dtype=np.float32)
+
+    token_lists = {
+        'spacy_tokens': [[token.text for token in doc] for doc in nlp.tokenizer.pipe(texts, batch_size=batch_size)],
+        'numpy_tokens': [tokenize(text) for text in texts]
+    }
+    report = {'documents': len(texts), 'tolerance': tolerance}
+    for mode, tokens in token_lists.items():
+        scores = np.vstack([engine.predict(tokens[start:start + batch_size])
+                            for start in range(0, len(tokens), batch_size)])
+        diff = np.abs(scores - expected).max(axis=1)
+        report[mode] = {
+            'max_abs_diff': float(diff.max()) if len(diff) else 0.0,
+            'within_tolerance': float((diff <= tolerance).mean()) if len(diff) else 1.0,
+            'top_label_agreement': float((scores.argmax(axis=1) == expected.argmax(axis=1)).mean())
+                                   if len(diff) else 1.0
+        }
+    return report
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Exporta e verifica o motor de inferência NumPy do textcat')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Gera o arquivo de pesos a partir do model-best')
+    export_parser.add_argument('--model', default='cat-model/models/bow/model-best')
+    export_parser.add_argument('--output', help=f'Padrão: <model>/{EXPORT_FILENAME}')
+    export_parser.add_argument('--corpus', nargs='+',
+                               default=['cat-model/prepared-data/train.spacy', 'cat-model/prepared-data/dev.spacy'])
+
+    verify_parser = subparsers.add_parser('verify', help='Compara com o SpaCy no conjunto de teste')
+    verify_parser.add_argument('--model', default='cat-model/models/bow/model-best')
+    verify_parser.add_argument('--weights', help=f'Padrão: <model>/{EXPORT_FILENAME}')
+    verify_parser.add_argument('--test', default='cat-model/prepared-data/test.spacy')
+    verify_parser.add_argument('--tolerance', type=float, default=1e-3)
+    verify_parser.add_argument('--min-agreement', type=float, default=0.99,
+                               help='Concordância mínima da categoria prevista (tokens do motor)')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        path = export_textcat(args.model, args.output, args.corpus)
+        print(f"Pesos exportados para {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+    else:
+        report = verify_export(args.model, args.weights, args.test, args.tolerance)
+        print(json.dumps(report, indent=2))
+        if report['numpy_tokens']['top_label_agreement'] < args.min_agreement:
+            raise SystemExit(1)
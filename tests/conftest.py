@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The root modules and the cat-model scripts import each other by name
+sys.path.insert(0, os.path.join(ROOT, 'cat-model'))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import web_classifier
+from cascade import CascadeClassifier
+from long_document import classify_windows
+
+class FakeStage:
+    """Scores every text with fixed cats and records the texts it received."""
+
+    def __init__(self, confidence):
+        self.confidence = confidence
+        self.seen = []
+
+    def pipe(self, texts, batch_size=64):
+        for text in texts:
+            self.seen.append(text)
+            yield SimpleNamespace(cats={'Portaria': self.confidence, 'Edital': 1 - self.confidence})
+
+def fake_cascade(threshold=0.9):
+    stages = {'bow': FakeStage(0.6), 'cnn': FakeStage(0.99)}
+    return CascadeClassifier(['bow', 'cnn'], threshold, stages.get), stages
+
+def long_text(windows):
+    return ' '.join(f'janela{i} ' + 'x' * 80 for i in range(windows))
+
+def test_cascade_keeps_early_stop_with_windows():
+    cascade, stages = fake_cascade()
+    scores, info = classify_windows(long_text(40), cascade, early_stop_threshold=0.95,
+                                    window_size=100, overlap=10, batch_size=2)
+
+    assert info['windows_total'] >= 40
+    assert info['early_stopped'] and info['windows_used'] == 1
+    # Only the first batch reached the stages
+    assert len(stages['bow'].seen) == len(stages['cnn'].seen) == 2
+    assert cascade.stats()['decided'] == {'bow': 0, 'cnn': 2}
+    assert max(scores, key=scores.get) == 'Portaria'
+
+def test_long_document_reports_the_deciding_stage(monkeypatch):
+    monkeypatch.setattr(web_classifier, 'text_normalizer', None)
+    cascade, stages = fake_cascade(threshold=0.5)
+    before = web_classifier.CASCADE_DECISIONS.labels('bow')._value.get()
+
+    result = web_classifier.classify_long_text(long_text(40), cascade, early_stop_threshold=None)
+
+    windows = result['long_document']['windows_used']
+    assert windows == result['long_document']['windows_total']
+    assert result['decided_by'] == 'bow'
+    assert result['long_document']['decided_by_windows'] == {'bow': windows}
+    assert stages['cnn'].seen == []
+    assert web_classifier.CASCADE_DECISIONS.labels('bow')._value.get() == before + 1
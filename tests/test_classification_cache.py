@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+from classification_cache import InMemoryCache, ResultCache, SQLiteCache
+
+RESULT = {'success': True, 'predicted_category': 'Portaria', 'confidence': 0.99}
+
+def last_access(cache, key):
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute("SELECT last_access FROM results WHERE key = ?", (key,)).fetchone()[0]
+
+def test_backends_must_implement_the_interface():
+    class Incomplete(ResultCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete(1024)
+    InMemoryCache(1024)
+
+def test_sqlite_hits_update_last_access_in_batches(tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'), 1024 * 1024)
+    monkeypatch.setattr(cache, 'ACCESS_FLUSH_INTERVAL', 3)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, RESULT)
+    written = {key: last_access(cache, key) for key in 'abc'}
+
+    assert cache.get('a') == RESULT
+    assert cache.get('b') == RESULT
+    assert {key: last_access(cache, key) for key in 'abc'} == written
+
+    # The third distinct key fills the batch
+    assert cache.get('c') == RESULT
+    assert all(last_access(cache, key) > written[key] for key in 'abc')
+    assert cache.hits == 3
+
+def test_sqlite_eviction_sees_pending_hits(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'), 1024 * 1024)
+    keys = [f'key{i:03d}' for i in range(150)]
+    for key in keys:
+        cache.set(key, RESULT)
+    # The oldest writes are hit, but their last_access is still pending
+    for key in keys[:10]:
+        assert cache.get(key) == RESULT
+
+    cache.max_bytes = cache.size()[1] - 1
+    cache._evict(cache._connection())
+    assert all(cache.get(key) == RESULT for key in keys[:10])
+    assert cache.get(keys[10]) is None
@@ -0,0 +1,72 @@
+import os
+from collections import defaultdict
+
+import pytest
+
+import corpus_store
+from conftest import ROOT
+
+SAMPLE = os.path.join(ROOT, 'cat-model', 'Categoria', 'output-data', 'extracted_articles.jsonl')
+
+def articles(rows=23):
+    # Interleaved labels, non-ASCII text and an empty row
+    labels = ['Portaria', 'Extrato de Convênio', 'Edital']
+    return [{'label': labels[i % 3], 'text': '' if i == 4 else f'artigo {i} ação nº {i * 7}'} for i in range(rows)]
+
+def by_label(rows):
+    grouped = defaultdict(list)
+    for article in rows:
+        grouped[article['label']].append(article['text'])
+    return dict(grouped)
+
+@pytest.mark.parametrize('codec', ['zlib', pytest.param('zstd', marks=pytest.mark.skipif(
+    corpus_store.zstandard is None, reason='zstandard is not installed'))])
+def test_round_trip_partitions_by_label(tmp_path, codec):
+    rows = articles()
+    path = str(tmp_path / 'articles.corpus')
+    # 8 rows of a label with frames of 3: the last frame is partial
+    index = corpus_store.write_corpus(iter(rows), path, codec=codec, frame_rows=3)
+
+    reader = corpus_store.CorpusReader(path)
+    expected = by_label(rows)
+    assert index['codec'] == codec
+    assert reader.labels == list(expected)
+    assert len(reader) == len(rows)
+    for label, texts in expected.items():
+        assert reader.count(label) == len(texts)
+        assert reader.frame_count(label) == -(-len(texts) // 3)
+        assert reader.texts(label) == texts
+        assert list(reader.iter_texts(label)) == texts
+        # Ranges that start and end inside frames
+        assert reader.texts(label, 2, 7) == texts[2:7]
+        assert reader.texts(label, 4, 100) == texts[4:]
+        assert reader.texts(label, 5, 5) == []
+    assert list(reader.iter_frames('Portaria', [2, 0])) == expected['Portaria'][6:] + expected['Portaria'][:3]
+
+def test_write_replaces_the_previous_store(tmp_path):
+    path = str(tmp_path / 'articles.corpus')
+    corpus_store.write_corpus(articles(), path, codec='zlib', frame_rows=4)
+    corpus_store.write_corpus([{'label': 'Edital', 'text': 'novo'}], path, codec='zlib', frame_rows=4)
+
+    assert corpus_store.CorpusReader(path).labels == ['Edital']
+    assert sorted(os.listdir(tmp_path)) == ['articles.corpus']
+
+def test_iter_articles_reads_jsonl_and_store_alike(tmp_path):
+    path = str(tmp_path / 'extracted_articles.corpus')
+    index = corpus_store.convert_jsonl(SAMPLE, path, codec='zlib', frame_rows=100)
+    jsonl = list(corpus_store.iter_jsonl(SAMPLE))
+
+    assert sum(partition['rows'] for partition in index['labels'].values()) == len(jsonl)
+    stored = list(corpus_store.iter_articles(path))
+    # The store groups rows by label, keeping their order within each label
+    assert by_label(stored) == by_label(jsonl)
+
+    label = jsonl[0]['label']
+    expected = [article for article in jsonl if article['label'] == label]
+    assert list(corpus_store.iter_articles(path, labels=[label])) == expected
+    assert list(corpus_store.iter_articles(SAMPLE, labels=[label])) == expected
+    assert list(corpus_store.iter_articles(path, labels=[label], limit=5)) == expected[:5]
+    assert list(corpus_store.iter_articles(SAMPLE, limit=5)) == jsonl[:5]
+
+def test_corpus_path_for():
+    assert corpus_store.corpus_path_for('data/extracted_articles.jsonl') == 'data/extracted_articles.corpus'
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import random
+
+import pytest
+
+pytest.importorskip('bs4')
+
+from benchmark_ingestion import clean_text_reference
+import import_data_cat
+from import_data_cat import clean_text
+
+HTML_CASES = [
+    # Entities
+    "Processo&nbsp;nº 23000.000471/2024-07 &amp; outros",
+    "&lt;p class=&quot;dou-paragraph&quot;&gt;escapado duas vezes&lt;/p&gt;",
+    "&amp;lt;não é tag&amp;gt;",
+    "R$ 1.000,00 &#8211; &#x2013; &#X2013; &eacute; &Ccedil;&atilde;o",
+    "&#0; &#1; &#128; &#150; &#x110000; &#xD800; &#x1F600;",
+    "&#65 &#65x &#; &#x; & &; sem referência",
+    "sem ponto e vírgula &amp outro &copy; &eacute fim",
+    "&copyright &notin; &notit; &ampx AT&T",
+    "&AMP; &apos; &hellip;&ndash;&mdash;",
+    "a&eacute;b&nbsp&nbsp;c",
+    "fim &copy",
+    "fim &#233",
+    "P&D",
+    "fim &",
+    # CDATA
+    "<![CDATA[conteúdo <b>cru</b> &amp; literal]]> depois",
+    "antes<![CDATA[colado]]>depois",
+    "<p><![CDATA[]]>vazio</p>",
+    # Nested tags
+    "<p>um <b>dois <i>três</i></b> quatro</p>",
+    "<div><p>a</p><p>b</p></div>",
+    "<table><tr><td>célula 1</td><td>R$&nbsp;1.000,00</td></tr></table>",
+    "<p>parágrafo sem fechar<p>outro",
+    "<p class=\"dou-paragraph\" data-x='a>b'>atributo com &gt;</p>",
+    "<p title=\"&amp;\">x&amp;y</p>",
+    "<img src=\"x.png\" alt=\"imagem\">legenda",
+    "<!-- comentário --> visível <!-- outro -->",
+    "<script>var x = '<p>&amp;';</script>texto<style>p{}</style>",
+    "<!DOCTYPE html><p>doc</p>",
+    "a < b e c > d",
+    # <br>
+    "linha 1<br>linha 2<br/>linha 3<br />linha 4",
+    "quebra<BR>maiúscula<Br/>mista",
+    "<br><br>",
+    # Whitespace
+    "  espaços \t\n  múltiplos \r\n fim  ",
+    " nbsp literal em-space fino ",
+    "&#9;tab &#10;linha &#160;nbsp &ensp;ensp",
+    "",
+    "   ",
+]
+
+# Pieces combined at random; inputs on which html.parser gives up partway are left out
+FRAGMENTS = [
+    "texto", " ", "\n", "\t", "é", "R$", ";", "#", "x", "> ", "1 < 2", "AT&T", "P&D", "&D", "&",
+    "&amp;", "&nbsp;", "&copy", "&eacute;", "&#233;", "&#x41;", "&#65 ", "&#1;", "&#150;",
+    "&#x1F600;", "&notit;", "&lt;", "&quot;",
+    "<p>", "</p>", "<br>", "<br/>", "<b>", "</b>", "<td>", "</td>", "<p class=\"a>b\">",
+    "<![CDATA[x &amp; <i>y</i>]]>", "<!-- c -->", "<script>a<b</script>",
+]
+
+@pytest.mark.parametrize('text', HTML_CASES)
+def test_clean_text_matches_beautifulsoup(text):
+    assert clean_text(text) == clean_text_reference(text)
+
+def test_clean_text_matches_beautifulsoup_on_fragment_mixes():
+    rng = random.Random(0)
+    for _ in range(5000):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 10)))
+        assert clean_text(text) == clean_text_reference(text), text
+
+def write_article(path, art_type, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<xml><article id="1" pubName="DO3" '
+                f'artType="{art_type}"><body><Identifica>{art_type}</Identifica>'
+                f'<Texto>&lt;p&gt;{text}&lt;/p&gt;</Texto></body></article></xml>')
+
+@pytest.fixture
+def skewed_corpus(tmp_path):
+    """Portaria files fill the first directory; the other labels only appear in the second one."""
+    labels = sorted(import_data_cat.TARGET_ART_TYPES)
+    files = {}
+    for directory, count in (('a', 120), ('b', 240)):
+        os.makedirs(tmp_path / 'data' / directory)
+        for i in range(count):
+            label = 'Portaria' if directory == 'a' else labels[i % len(labels)]
+            path = str(tmp_path / 'data' / directory / f'{i:04d}.xml')
+            write_article(path, label, f'documento {directory}{i}')
+            files[path] = label
+    return str(tmp_path / 'data'), files
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_sample_is_the_bottom_k_of_all_files(skewed_corpus, tmp_path, caplog, incremental):
+    caplog.set_level(logging.INFO)
+    root, files = skewed_corpus
+    quota = 5
+    output_path = str(tmp_path / 'extracted.jsonl')
+    manifest_path = str(tmp_path / 'manifest.jsonl') if incremental else None
+    counts = import_data_cat.process_directory_parallel(root, output_path, processes=2, chunksize=4, quota=quota,
+                                                        first_band=1 / 32, manifest_path=manifest_path)
+
+    expected = {}
+    for path, label in files.items():
+        expected.setdefault(label, []).append(path)
+    for label, paths in expected.items():
+        paths.sort(key=import_data_cat.sampling_priority)
+        expected[label] = sorted(f'documento {os.path.basename(os.path.dirname(path))}{int(path[-8:-4])}'
+                                 for path in paths[:quota])
+
+    sampled = {}
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            article = json.loads(line)
+            sampled.setdefault(article['label'], []).append(article['text'])
+    assert {label: sorted(texts) for label, texts in sampled.items()} == expected
+    assert counts == {label: quota for label in expected}
+    # Every label was full well before the last band
+    assert 'stopping early' in caplog.text
+
+def read_samples(output_path):
+    sampled = {}
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            article = json.loads(line)
+            sampled.setdefault(article['label'], set()).add(article['text'])
+    return sampled
+
+def test_incremental_runs_only_add_new_files_below_the_threshold(skewed_corpus, tmp_path, caplog, monkeypatch):
+    caplog.set_level(logging.INFO)
+    root, files = skewed_corpus
+    output_path = str(tmp_path / 'extracted.jsonl')
+    manifest_path = str(tmp_path / 'manifest.jsonl')
+    run = lambda: import_data_cat.process_directory_parallel(root, output_path, processes=2, chunksize=4, quota=5,
+                                                             first_band=1 / 32, manifest_path=manifest_path)
+    run()
+    with open(manifest_path + '.sampling.json', encoding='utf-8') as f:
+        thresholds = {label: state['threshold'] for label, state in json.load(f).items()}
+    assert set(thresholds) == import_data_cat.TARGET_ART_TYPES
+
+    # Nothing new: the files the early stop never examined are not topped up
+    caplog.clear()
+    assert not any(run().values())
+    assert 'Total XML files processed: 0' in caplog.text
+
+    labels = sorted(import_data_cat.TARGET_ART_TYPES)
+    os.makedirs(os.path.join(root, 'c'))
+    for i in range(400):
+        path = os.path.join(root, 'c', f'{i:04d}.xml')
+        write_article(path, labels[i % len(labels)], f'documento c{i}')
+        files[path] = labels[i % len(labels)]
+    walks = []
+    iter_sources = import_data_cat.iter_sources
+    monkeypatch.setattr(import_data_cat, 'iter_sources', lambda *args, **kwargs: walks.append(1) or
+                        iter_sources(*args, **kwargs))
+    run()
+    assert len(walks) == 1
+
+    expected = {}
+    for path, label in files.items():
+        if import_data_cat.sampling_priority(path) <= thresholds[label]:
+            name = os.path.basename(path)
+            expected.setdefault(label, set()).add(f'documento {os.path.basename(os.path.dirname(path))}{int(name[:-4])}')
+    assert read_samples(output_path) == expected
@@ -0,0 +1,99 @@
+import json
+import multiprocessing
+
+from model_registry import ModelRegistry
+
+WRITERS = 4
+MODELS_PER_WRITER = 25
+
+def failing_loader(path):
+    raise OSError(f'no model at {path}')
+
+def publish_models(state_path, writer):
+    registry = ModelRegistry(failing_loader, state_path=state_path)
+    for i in range(MODELS_PER_WRITER):
+        registry._publish_model(f'w{writer}-{i}', f'/models/{writer}/{i}', activate=False)
+
+def test_concurrent_writers_keep_every_change(tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    context = multiprocessing.get_context('spawn')
+    writers = [context.Process(target=publish_models, args=(state_path, w)) for w in range(WRITERS)]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join()
+        assert process.exitcode == 0
+
+    with open(state_path, encoding='utf-8') as f:
+        state = json.load(f)
+    assert state['generation'] == WRITERS * MODELS_PER_WRITER
+    assert len(state['models']) == WRITERS * MODELS_PER_WRITER
+
+def test_background_load_failure_is_reported(tmp_path, caplog):
+    failures = []
+    registry = ModelRegistry(failing_loader, state_path=str(tmp_path / 'state.json'),
+                             on_load_failure=lambda name, path, error: failures.append((name, path)))
+    registry.load_in_background('broken', '/models/broken').join()
+
+    assert failures == [('broken', '/models/broken')]
+    assert registry.status()['loading']['broken']['state'] == 'failed'
+    assert 'OSError: no model at /models/broken' in caplog.text
+
+class FakePipeline:
+    pipe_names = ['textcat']
+
+    def __init__(self, path):
+        self.path = path
+
+def shared_registries(tmp_path, loader=FakePipeline):
+    state_path = str(tmp_path / 'state.json')
+    return [ModelRegistry(loader, state_path=state_path, warmup_texts=[]) for _ in range(2)]
+
+def test_worker_behind_the_state_still_applies_other_workers_changes(tmp_path):
+    first, second = shared_registries(tmp_path)
+    for registry in (first, second):
+        registry.load('base', '/models/base')
+    first.publish_current_state()
+    first.load_in_background('new', '/models/new').join()
+    first.set_routing(weights={'base': 1, 'new': 1})
+
+    # A local change does not mark the generations this worker never applied as seen
+    second.set_routing(shadow='base')
+    state = second._read_state()
+    assert second._generation < state['generation']
+    assert state['routing'] == {'default': 'base', 'weights': {'base': 1, 'new': 1}, 'shadow': 'base'}
+
+    second._apply_state(state)
+    assert second.get('new').path == '/models/new'
+    assert second.status()['weights'] == {'base': 1, 'new': 1}
+    assert second._generation == state['generation']
+
+    second.unload('new')
+    assert second._read_state()['routing']['weights'] == {'base': 1}
+
+def test_failed_sync_is_retried(tmp_path):
+    attempts = []
+
+    def flaky_loader(path):
+        attempts.append(path)
+        if len(attempts) == 1:
+            raise OSError('model directory still being copied')
+        return FakePipeline(path)
+
+    first, _ = shared_registries(tmp_path)
+    first.load('base', '/models/base')
+    first.publish_current_state()
+    second = ModelRegistry(flaky_loader, state_path=first.state_path, warmup_texts=[])
+
+    state = second._read_state()
+    second._apply_state(state)
+    assert second.get('base') is None
+    assert second._generation == 0
+    # Throttled: the next requests do not retry right away
+    second.sync_state()
+    assert not second._syncing and len(attempts) == 1
+
+    second._state_checked_at = 0.0
+    second._apply_state(second._read_state())
+    assert second.get('base').path == '/models/base'
+    assert second._generation == state['generation']
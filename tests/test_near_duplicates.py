@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pytest
+
+import near_duplicates
+from near_duplicates import band_keys, deduplicate_jsonl, resolve_block
+
+TEMPLATE = ("extrato de contrato processo {n} contratante ministério da economia contratada empresa "
+            "{company} objeto aquisição de material de consumo para o órgão vigência doze meses "
+            "valor global de {n} reais fundamento legal lei de licitações data de assinatura {n}")
+
+def article(label, company, n=1):
+    return {'label': label, 'text': TEMPLATE.format(company=company, n=n)}
+
+def write_rows(path, articles, mode='w'):
+    with open(path, mode, encoding='utf-8') as f:
+        for row in articles:
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+def read_rows(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def company(i):
+    # Numbers are normalized to 0, so the names are spelled with letters only
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    word = letters[i % 26] + letters[i // 26 % 26]
+    return f"forn{word} comer{word} limi{word} servi{word} distri{word} indus{word} tecno{word} soluc{word}"
+
+def corpus(count, offset=0):
+    # Each company appears twice as an extrato (differing only in numbers) and once as a portaria
+    rows = []
+    for i in range(offset, offset + count):
+        rows.append(article('Extrato de Contrato', company(i), n=i))
+        rows.append(article('Extrato de Contrato', company(i), n=i + 7))
+        rows.append(article('Portaria', company(i), n=i))
+    return rows
+
+def test_duplicate_of_a_removed_row_is_compared_with_the_kept_one():
+    # Two bands of two values: row 1 shares band 0 with row 0 (50% equal, a duplicate),
+    # row 2 shares band 1 with row 1 only, and has nothing in common with row 0
+    signatures = np.array([[1, 2, 3, 4], [1, 2, 9, 9], [7, 7, 9, 9]], dtype=np.uint32)
+    labels = np.zeros(3, dtype=np.uint32)
+    keys = band_keys(signatures, labels, bands=2, rows=2)
+    no_index = np.full(keys.shape, -1, dtype=np.int64)
+
+    duplicates = resolve_block(signatures, labels, keys, no_index, signatures[:0], labels[:0], threshold=0.5)
+    assert duplicates.tolist() == [False, True, False]
+
+def test_removes_same_label_near_duplicates_only(tmp_path):
+    path = str(tmp_path / 'articles.jsonl')
+    write_rows(path, corpus(20))
+
+    removed = deduplicate_jsonl(path, threshold=0.8)
+
+    assert removed == {'Extrato de Contrato': 20}
+    rows = read_rows(path)
+    assert len(rows) == 40
+    assert [row['label'] for row in rows].count('Portaria') == 20
+
+def test_incremental_run_matches_a_full_run(tmp_path, monkeypatch):
+    # Small blocks exercise the queries across blocks and the segment merges
+    monkeypatch.setattr(near_duplicates, 'DEDUP_BLOCK_ROWS', 7)
+    first, second = corpus(15), corpus(10, offset=10)
+
+    full_path = str(tmp_path / 'full.jsonl')
+    write_rows(full_path, first + second)
+    deduplicate_jsonl(full_path, threshold=0.8)
+
+    path = str(tmp_path / 'articles.jsonl')
+    write_rows(path, first)
+    deduplicate_jsonl(path, threshold=0.8)
+    write_rows(path, second, mode='a')
+    removed = deduplicate_jsonl(path, threshold=0.8)
+
+    # Companies 10-14 are already in the first batch; the others repeat once as an extrato
+    assert removed == {'Extrato de Contrato': 15, 'Portaria': 5}
+    assert read_rows(path) == read_rows(full_path)
+
+    state = json.load(open(path + '.minhash/state.json', encoding='utf-8'))
+    assert state['rows'] == len(read_rows(path))
+    assert len(state['segments']) <= 4
+
+def test_only_appended_rows_are_read_and_signed(tmp_path, monkeypatch):
+    path = str(tmp_path / 'articles.jsonl')
+    write_rows(path, corpus(5))
+    deduplicate_jsonl(path, threshold=0.8)
+    write_rows(path, corpus(3, offset=5), mode='a')
+
+    signed = []
+    shingle_hashes = near_duplicates.shingle_hashes
+    monkeypatch.setattr(near_duplicates, 'shingle_hashes', lambda text, size: signed.append(text) or
+                        shingle_hashes(text, size))
+    deduplicate_jsonl(path, threshold=0.8)
+    assert len(signed) == 9
+    assert deduplicate_jsonl(path, threshold=0.8) == {}
+    assert len(signed) == 9
+
+def test_interrupted_tail_rewrite_is_finished_on_the_next_run(tmp_path, monkeypatch):
+    path = str(tmp_path / 'articles.jsonl')
+    write_rows(path, corpus(5))
+    deduplicate_jsonl(path, threshold=0.8)
+    write_rows(path, corpus(5), mode='a')
+
+    replace_tail = near_duplicates._replace_tail
+    monkeypatch.setattr(near_duplicates, '_replace_tail', lambda *args: (_ for _ in ()).throw(KeyboardInterrupt))
+    with pytest.raises(KeyboardInterrupt):
+        deduplicate_jsonl(path, threshold=0.8)
+    monkeypatch.setattr(near_duplicates, '_replace_tail', replace_tail)
+
+    deduplicate_jsonl(path, threshold=0.8)
+    assert len(read_rows(path)) == 10
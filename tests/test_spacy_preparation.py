@@ -0,0 +1,117 @@
+import importlib
+import json
+import os
+
+import pytest
+
+spacy = pytest.importorskip('spacy')
+from spacy.tokens import DocBin
+
+from conftest import ROOT
+
+SAMPLE = os.path.join(ROOT, 'cat-model', 'Categoria', 'output-data', 'extracted_articles.jsonl')
+# Written by the original preparation: pt_core_news_lg run on the preprocessed text
+ORIGINAL_DOCBIN = os.path.join(ROOT, 'cat-model', 'prepared-data', 'test.spacy')
+
+@pytest.fixture
+def preparation(monkeypatch, tmp_path):
+    # The module logs to categorization_preparation.log in the working directory
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module('spacy_preparation')
+    monkeypatch.setattr(module, 'text_cache', None)
+    monkeypatch.setattr(module, 'nlp', None)
+    module.load_pipeline(tokenizer_only=True)
+    return module
+
+def sample_lines(limit=None):
+    with open(SAMPLE, encoding='utf-8') as f:
+        return f.readlines()[:limit]
+
+def morphology(doc_bin, vocab):
+    return sum(bool(token.pos_ or token.lemma_ or str(token.morph))
+               for doc in doc_bin.get_docs(vocab) for token in doc)
+
+def test_single_pass_matches_double_pass(preparation):
+    lines = sample_lines()
+    double_pass = preparation.process_data(lines).to_bytes()
+    single_pass = preparation.process_data(lines, single_pass=True).to_bytes()
+    assert single_pass == double_pass
+
+    # The sample has tokens the second tokenization splits ("07901." -> "07901", ".")
+    tokens = preparation.preprocess_batch([json.loads(line)['text'] for line in lines])
+    assert any(not preparation.normalizer.stable(token, preparation.nlp.tokenizer)
+               for words in tokens for token in words)
+
+def test_single_pass_rebuilds_original_docbin(preparation):
+    vocab = preparation.nlp.vocab
+    original = DocBin().from_disk(ORIGINAL_DOCBIN)
+    rebuilt = DocBin()
+    for doc in original.get_docs(vocab):
+        # The original Docs come from nlp(" ".join(tokens)), so their text gives the filtered tokens back
+        rebuilt_doc = preparation.doc_from_tokens(doc.text.split(' '))
+        rebuilt_doc.cats = doc.cats
+        rebuilt.add(rebuilt_doc)
+
+    assert preparation.textcat_bytes(rebuilt, vocab) == preparation.textcat_bytes(original, vocab)
+    assert morphology(original, vocab) > 0
+    assert morphology(rebuilt, vocab) == 0
+
+@spacy.Language.component('stub_tagger')
+def stub_tagger(doc):
+    # Stands in for the tagger and lemmatizer of pt_core_news_lg, which the single pass skips
+    for token in doc:
+        token.pos_ = 'NOUN'
+        token.lemma_ = token.text[:4]
+    return doc
+
+def test_single_pass_matches_original_two_pass_with_a_stub_tagger(preparation, monkeypatch):
+    from text_normalization import reference_preprocessing
+
+    tagged = spacy.blank('pt')
+    tagged.add_pipe('stub_tagger')
+    lines = sample_lines()
+    # The original process_data: the old preprocessing string, parsed again by the full pipeline
+    original = DocBin()
+    for line in lines:
+        data = json.loads(line)
+        text = reference_preprocessing(data['text'], tagged, preparation.normalizer.stop_words)
+        original.add(preparation.set_categories(tagged(text), data['label']))
+
+    single_pass = preparation.process_data(lines, single_pass=True)
+    monkeypatch.setattr(preparation, 'nlp', tagged)
+    double_pass = preparation.process_data(lines)
+
+    expected = preparation.textcat_bytes(original, tagged.vocab)
+    assert preparation.textcat_bytes(double_pass, tagged.vocab) == expected
+    assert preparation.textcat_bytes(single_pass, tagged.vocab) == expected
+    assert morphology(original, tagged.vocab) > 0
+    assert morphology(double_pass, tagged.vocab) > 0
+    assert morphology(single_pass, tagged.vocab) == 0
+
+@pytest.mark.skipif(not spacy.util.is_package('pt_core_news_lg'), reason='pt_core_news_lg is not installed')
+def test_single_pass_matches_original_process_data(preparation):
+    from spacy.lang.pt.stop_words import STOP_WORDS
+    from text_normalization import reference_preprocessing
+
+    lines = sample_lines(300)
+    full = spacy.load(preparation.MODEL_NAME, disable=['ner', 'parser', 'tagger'])
+    original = DocBin()
+    for line in lines:
+        data = json.loads(line)
+        original.add(preparation.set_categories(full(reference_preprocessing(data['text'], full, STOP_WORDS)),
+                                                data['label']))
+
+    single_pass = preparation.process_data(lines, single_pass=True)
+    assert (preparation.textcat_bytes(single_pass, full.vocab) ==
+            preparation.textcat_bytes(original, full.vocab))
+    assert morphology(original, full.vocab) > 0
+    assert morphology(single_pass, full.vocab) == 0
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_merged_shards_match_serial_process_data(preparation, tmp_path, processes):
+    lines = sample_lines(250)
+    output_path = str(tmp_path / 'train.spacy')
+    preparation.process_data_parallel(lines, output_path, processes=processes, shard_size=60,
+                                      single_pass=True, tokenizer_only=True)
+    with open(output_path, 'rb') as f:
+        assert f.read() == preparation.process_data(lines, single_pass=True).to_bytes()
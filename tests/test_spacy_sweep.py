@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+import pytest
+
+import spacy_sweep
+
+@pytest.mark.skipif(not hasattr(os, 'sched_getaffinity'), reason='needs CPU pinning')
+def test_replacement_workers_take_the_dead_workers_slots():
+    context = multiprocessing.get_context('spawn')
+    # Two slots on the first CPU, so the test also runs on a single core
+    slots = [sorted(os.sched_getaffinity(0))[:1]] * 2
+    with spacy_sweep.pinned_pool(context, slots, 1) as pool:
+        pool.map(os.sched_getaffinity, [0, 0], chunksize=1)
+        # Both workers die in the middle of a job, as a training killed for memory would
+        for _ in slots:
+            pool.apply_async(os._exit, (1,))
+
+        # The pool starts replacements; with no slot to take they would wait forever
+        affinities = pool.map_async(os.sched_getaffinity, [0] * 8, chunksize=1).get(timeout=60)
+        assert all(sorted(cpus) == slots[0] for cpus in affinities)
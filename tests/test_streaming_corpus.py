@@ -0,0 +1,84 @@
+import gzip
+import json
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+spacy = pytest.importorskip('spacy')
+
+import corpus_store
+import streaming_corpus
+from streaming_corpus import StreamingCorpus, interleave
+
+LABELS = ["Portaria", "Edital", "Extrato de Contrato"]
+WORDS = {
+    "Portaria": "designar servidor fiscal contrato",
+    "Edital": "pregão eletrônico licitação objeto",
+    "Extrato de Contrato": "contratada vigência valor global"
+}
+BUFFER = 40
+
+def grouped_articles(per_label=300):
+    # The extraction writes every label as one contiguous block
+    for label in LABELS:
+        for i in range(per_label):
+            yield {'label': label, 'text': f"{WORDS[label]} documento número{i}"}
+
+def example_labels(corpus, nlp):
+    return [max(example.reference.cats, key=example.reference.cats.get) for example in corpus(nlp)]
+
+def assert_mixed(labels, window):
+    assert Counter(labels) == Counter({label: 300 for label in LABELS})
+    for start in range(0, len(labels) - window + 1, window):
+        assert set(labels[start:start + window]) == set(LABELS), f"window at {start} is not mixed"
+
+@pytest.fixture
+def nlp():
+    return spacy.blank('pt')
+
+def test_corpus_store_labels_are_mixed_within_the_buffer(tmp_path, nlp):
+    store = str(tmp_path / 'articles.corpus')
+    corpus_store.write_corpus(grouped_articles(), store, codec='zlib', frame_rows=16)
+    corpus = StreamingCorpus(store, shuffle_buffer=BUFFER, labels=LABELS)
+
+    first = example_labels(corpus, nlp)
+    assert_mixed(first, BUFFER)
+    # The next epoch is mixed too, in another order
+    second = example_labels(corpus, nlp)
+    assert_mixed(second, BUFFER)
+    assert first != second
+
+def write_jsonl(path, open_file=open):
+    with open_file(path, 'wt', encoding='utf-8') as f:
+        for article in grouped_articles():
+            f.write(json.dumps(article, ensure_ascii=False) + '\n')
+
+def test_grouped_jsonl_labels_are_mixed_within_the_buffer(tmp_path, nlp, monkeypatch):
+    path = tmp_path / 'articles.jsonl'
+    write_jsonl(path)
+    decoded = []
+    monkeypatch.setattr(streaming_corpus, 'json', SimpleNamespace(
+        loads=lambda line: decoded.append(line) or json.loads(line)))
+    corpus = StreamingCorpus(str(path), shuffle_buffer=BUFFER, labels=LABELS)
+
+    assert_mixed(example_labels(corpus, nlp), BUFFER)
+    assert_mixed(example_labels(corpus, nlp), BUFFER)
+    # One scan builds the label index, then every epoch decodes each line once
+    assert len(decoded) == 3 * len(LABELS) * 300
+
+def test_compressed_jsonl_is_rejected(tmp_path):
+    path = tmp_path / 'articles.jsonl.gz'
+    write_jsonl(path, gzip.open)
+    with pytest.raises(ValueError, match='corpus_store.py'):
+        StreamingCorpus(str(path))
+
+def test_interleave_keeps_every_item_and_the_order_within_a_stream():
+    streams = {'a': iter(range(100)), 'b': iter(range(100, 130))}
+    merged = list(interleave(streams, {'a': 100, 'b': 30}, random.Random(0)))
+    assert sorted(merged) == list(range(130))
+    assert [item for item in merged if item < 100] == list(range(100))
+    # The short stream is spread over the whole merge, not left at one end
+    positions = [i for i, item in enumerate(merged) if item >= 100]
+    assert positions[0] < 20 and positions[-1] > 110
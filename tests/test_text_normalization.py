@@ -0,0 +1,81 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from text_normalization import TextNormalizer, clean, reference_preprocessing
+
+# Patterns of the original spacy_preparation.preprocessing, applied one after another
+ORIGINAL_PATTERNS = [
+    re.compile(r'\b[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}\b', re.IGNORECASE),
+    re.compile(r'\b(?:https?://|www\.)\S+?\.br(?=\b|/|\s|[?.])', re.IGNORECASE),
+    re.compile(r'\b(\d{1,2} de [a-zA-ZçÇ]+ de \d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4})\b', re.IGNORECASE),
+    re.compile(r'\bUASG(?:\s+[Nnº°.:]*)?[\s:]*?(\d+(?:[/-]\d+)*)', re.IGNORECASE)
+]
+
+# Texts where the patterns overlap or a substitution creates or destroys a later match
+OVERLAPPING = [
+    "UASG 123@foo.com fim",
+    "UASG 12/03/2020 pregão",
+    "UASG nº 160131 contato uasg@orgao.gov.br",
+    "acesse www.orgao.gov.br/edital/01/02/2020 até 5 de março de 2021",
+    "https://www.in.gov.br/web/dou?data=01-02-2023 publicado",
+    "e-mail: licitacao.uasg123@gov.br, UASG: 925001",
+    "prazo 1 de janeiro de 2024@dominio.com.br",
+    "UASG 154035/2023 e UASG 20-30-2020",
+    "www.site.br 01/01/2020 www.outro.com.br",
+    "10/10/2010uasg 10",
+    "nenhum padrão aqui",
+    "",
+]
+
+def original_clean(text):
+    text = text.lower()
+    for pattern in ORIGINAL_PATTERNS:
+        text = pattern.sub(' ', text)
+    return text
+
+class _Token:
+    def __init__(self, text):
+        self.text = text
+
+class RegexTokenizer:
+    """Stand-in for the spaCy tokenizer: words and single punctuation marks."""
+
+    def __call__(self, text):
+        return [_Token(token) for token in re.findall(r'\w+|[^\w\s]', text)]
+
+    def pipe(self, texts, batch_size=64):
+        for text in texts:
+            yield [token.text for token in self(text)]
+
+STOP_WORDS = {'para', 'pelo', 'como', 'mais', 'este', 'esta'}
+
+@pytest.mark.parametrize('text', OVERLAPPING)
+def test_clean_matches_sequential_substitution(text):
+    assert clean(text) == original_clean(text)
+
+def test_email_after_uasg_is_removed_first():
+    assert clean("UASG 123@foo.com fim") == 'uasg   fim'
+
+def test_normalize_batch_matches_original_preprocessing():
+    tokenizer = RegexTokenizer()
+    nlp = SimpleNamespace(tokenizer=tokenizer)
+    normalizer = TextNormalizer(stop_words=STOP_WORDS)
+    texts = OVERLAPPING + [
+        "Extrato de Contrato nº 12/2023 para aquisição de material, pelo valor de 1500 reais.",
+        "PORTARIA Nº 45, DE 3 DE MAIO DE 2022: designar servidor como fiscal deste contrato.",
+    ]
+
+    expected = [reference_preprocessing(text, tokenizer, STOP_WORDS) for text in texts]
+    assert normalizer.normalize_batch(texts, nlp.tokenizer) == expected
+    # The memoized keep flags give the same answer the second time
+    assert normalizer.normalize_batch(texts, nlp.tokenizer) == expected
+
+def test_normalize_batch_matches_original_preprocessing_with_spacy():
+    spacy = pytest.importorskip('spacy')
+    nlp = spacy.blank('pt')
+    normalizer = TextNormalizer()
+
+    expected = [reference_preprocessing(text, nlp, normalizer.stop_words) for text in OVERLAPPING]
+    assert normalizer.normalize_batch(OVERLAPPING, nlp.tokenizer) == expected
@@ -0,0 +1,254 @@
+"""
+Normalização de texto compartilhada entre a preparação dos dados e o servidor.
+
+O modelo é treinado sobre o texto pré-processado por cat-model/spacy_preparation.py:
+minúsculas, e-mails, URLs, datas e códigos UASG removidos, e só os tokens com
+mais de 3 caracteres que não são stop words, pontuação nem números. Este módulo
+concentra essas regras para que o servidor classifique exatamente o mesmo tipo
+de entrada que o modelo viu no treino:
+
+- os quatro padrões são aplicados um depois do outro, na ordem original (um
+  único regex com as quatro alternativas não dá o mesmo resultado quando os
+  padrões se sobrepõem, como em "UASG 123@foo.com");
+- a decisão de manter ou descartar um token é calculada uma vez por lexema e
+  fica guardada, então o filtro é um único laço de consultas a um dicionário;
+- os Docs são montados direto dos tokens mantidos, e o texto normalizado só é
+  tokenizado de novo quando algum token se dividiria nessa segunda tokenização
+  (como "07901." -> "07901", "."), de modo que o Doc é sempre o mesmo que a
+  preparação original obtinha com `nlp(texto_normalizado)`;
+- as funções trabalham em lote, sobre o `tokenizer.pipe` do modelo.
+
+A equivalência com a implementação anterior é conferida em
+tests/test_text_normalization.py. Benchmark:
+
+    python text_normalization.py --data cat-model/Categoria/output-data/extracted_articles.jsonl --limit 5000
+"""
+
+import re
+import string
+import time
+
+# Incrementar quando as regras mudarem de um jeito que os padrões não mostram
+# (2: padrões aplicados em sequência, como na implementação anterior;
+#  3: Docs iguais aos da segunda tokenização do texto normalizado)
+NORMALIZATION_VERSION = 3
+
+MIN_TOKEN_LENGTH = 4
+
+# Lexemas com a decisão guardada; acima disso o dicionário é esvaziado
+MAX_LEXEME_FLAGS = 500000
+
+STATIC_PATTERNS = {
+    'EMAIL': re.compile(r'\b[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}\b', re.IGNORECASE),
+    'URL': re.compile(r'\b(?:https?://|www\.)\S+?\.br(?=\b|/|\s|[?.])', re.IGNORECASE),
+    'DATE': re.compile(r'\b(\d{1,2} de [a-zA-ZçÇ]+ de \d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4})\b', re.IGNORECASE),
+    'UASG': re.compile(r'\bUASG(?:\s+[Nnº°.:]*)?[\s:]*?(\d+(?:[/-]\d+)*)', re.IGNORECASE)
+}
+
+def clean(text):
+    """Minúsculas e padrões estáticos trocados por um espaço, um padrão de cada vez."""
+    text = text.lower()
+    for pattern in STATIC_PATTERNS.values():
+        text = pattern.sub(' ', text)
+    return text
+
+def _token_texts(doc):
+    # Doc do SpaCy, NumpyDoc (numpy_textcat) ou lista de textos
+    tokens = getattr(doc, 'tokens', doc)
+    if tokens and not isinstance(tokens[0], str):
+        return [token.text for token in tokens]
+    return tokens
+
+def make_doc(vocab, tokens):
+    """
+    Doc do SpaCy com os tokens normalizados separados por um espaço. É igual ao
+    que se obteria tokenizando o texto normalizado quando nenhum token se divide
+    de novo (ver TextNormalizer.doc_from_tokens).
+    """
+    from spacy.tokens import Doc
+
+    spaces = [True] * len(tokens)
+    if spaces:
+        spaces[-1] = False
+    return Doc(vocab, words=tokens, spaces=spaces)
+
+class TextNormalizer:
+    """
+    Aplica as regras de normalização, guardando a decisão de cada lexema.
+
+    Args:
+        stop_words (set): Stop words descartadas (padrão: as do SpaCy para português).
+    """
+
+    def __init__(self, stop_words=None):
+        if stop_words is None:
+            from spacy.lang.pt.stop_words import STOP_WORDS
+            stop_words = STOP_WORDS
+        self.stop_words = frozenset(stop_words)
+        self._flags = {}
+        self._stable = {}
+
+    def keep(self, token):
+        """Regra de filtragem de um token (sem cache)."""
+        return (len(token) >= MIN_TOKEN_LENGTH and
+                token not in self.stop_words and
+                token not in string.punctuation and
+                not token.isdigit())
+
+    def filter_tokens(self, tokens):
+        """Mantém os tokens que passam pela regra, numa única passada."""
+        flags = self._flags
+        if len(flags) > MAX_LEXEME_FLAGS:
+            flags.clear()
+        kept = []
+        for token in tokens:
+            flag = flags.get(token)
+            if flag is None:
+                flag = flags[token] = self.keep(token)
+            if flag:
+                kept.append(token)
+        return kept
+
+    def stable(self, token, tokenizer):
+        """
+        Se o token continua um único token quando o texto normalizado é
+        tokenizado de novo (calculado uma vez por lexema).
+        """
+        stable = self._stable
+        if len(stable) > MAX_LEXEME_FLAGS:
+            stable.clear()
+        flag = stable.get(token)
+        if flag is None:
+            pieces = _token_texts(tokenizer(token))
+            flag = stable[token] = (pieces == [token] and not any(char.isspace() for char in token))
+        return flag
+
+    def doc_from_tokens(self, tokens, nlp):
+        """
+        Doc igual ao de `nlp.tokenizer(' '.join(tokens))`, a segunda tokenização
+        feita pela preparação original, sem tokenizar de novo o texto quando
+        nenhum token se dividiria.
+        """
+        tokenizer = nlp.tokenizer
+        if all(self.stable(token, tokenizer) for token in tokens):
+            return make_doc(nlp.vocab, tokens)
+        return tokenizer(' '.join(tokens))
+
+    def tokens_batch(self, texts, tokenizer, batch_size=64):
+        """
+        Tokens normalizados de vários textos.
+
+        Args:
+            texts (iterable): Textos originais.
+            tokenizer: Tokenizador com `pipe` (o do SpaCy ou o do motor NumPy).
+            batch_size (int): Tamanho do batch do tokenizer.pipe.
+
+        Returns:
+            list: Uma lista de tokens por texto.
+        """
+        cleaned = (clean(text) for text in texts)
+        return [self.filter_tokens(_token_texts(doc)) for doc in tokenizer.pipe(cleaned, batch_size=batch_size)]
+
+    def normalize_batch(self, texts, tokenizer, batch_size=64):
+        """Textos normalizados: os tokens mantidos unidos por um espaço."""
+        return [' '.join(tokens) for tokens in self.tokens_batch(texts, tokenizer, batch_size)]
+
+    def normalize(self, text, tokenizer):
+        return self.normalize_batch([text], tokenizer)[0]
+
+    def docs_batch(self, texts, model, batch_size=64):
+        """
+        Docs prontos para os componentes do modelo, montados direto dos tokens
+        normalizados (ver doc_from_tokens).
+
+        Args:
+            texts (list): Textos originais.
+            model: Pipeline SpaCy ou NumpyTextcat.
+            batch_size (int): Tamanho do batch do tokenizer.pipe.
+
+        Returns:
+            list: Um Doc por texto, na ordem da entrada.
+        """
+        token_lists = self.tokens_batch(texts, model.tokenizer, batch_size)
+        vocab = getattr(model, 'vocab', None)
+        if vocab is None:
+            return [model.tokenizer(' '.join(tokens)) for tokens in token_lists]
+
+        return [self.doc_from_tokens(tokens, model) for tokens in token_lists]
+
+    def fingerprint_parts(self):
+        """O que define o resultado da normalização (para chaves de cache)."""
+        return [
+            NORMALIZATION_VERSION,
+            [(name, pattern.pattern, pattern.flags) for name, pattern in STATIC_PATTERNS.items()],
+            sorted(self.stop_words),
+            string.punctuation,
+            MIN_TOKEN_LENGTH
+        ]
+
+def reference_preprocessing(text, nlp, stop_words):
+    """Implementação anterior de spacy_preparation.preprocessing, usada como saída de referência."""
+    text = text.lower()
+    for pattern in STATIC_PATTERNS.values():
+        text = pattern.sub(' ', text)
+    tokens = [token.text for token in nlp(text)]
+    tokens = [t for t in tokens if
+              t not in stop_words and
+              t not in string.punctuation and
+              len(t) > 3]
+    tokens = [t for t in tokens if not t.isdigit()]
+    return " ".join(tokens)
+
+def benchmark(texts, nlp, batch_size=64):
+    """
+    Compara a velocidade da normalização em lote com a implementação anterior.
+    A equivalência das saídas é testada em tests/test_text_normalization.py.
+
+    Returns:
+        dict: Documentos/s antes e depois.
+    """
+    normalizer = TextNormalizer()
+
+    start = time.perf_counter()
+    for text in texts:
+        reference_preprocessing(text, nlp, normalizer.stop_words)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    normalizer.normalize_batch(texts, nlp.tokenizer, batch_size)
+    after = time.perf_counter() - start
+
+    return {
+        'documents': len(texts),
+        'before_docs_per_sec': len(texts) / before,
+        'after_docs_per_sec': len(texts) / after
+    }
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    import spacy
+
+    parser = argparse.ArgumentParser(description='Benchmark da normalização de texto')
+    parser.add_argument('--data', default='cat-model/Categoria/output-data/extracted_articles.jsonl',
+                        help='JSONL com o campo "text"')
+    parser.add_argument('--limit', type=int, default=5000)
+    parser.add_argument('--model', default=None,
+                        help='Modelo cujo tokenizador é usado (padrão: spacy.blank("pt"))')
+    args = parser.parse_args()
+
+    texts = []
+    with open(args.data, encoding='utf-8') as f:
+        for line in f:
+            if len(texts) >= args.limit:
+                break
+            if line.strip():
+                texts.append(json.loads(line)['text'])
+
+    nlp = spacy.load(args.model) if args.model else spacy.blank('pt')
+    report = benchmark(texts, nlp)
+    print(f"documentos: {report['documents']}")
+    print(f"antes: {report['before_docs_per_sec']:.1f} docs/s")
+    print(f"depois: {report['after_docs_per_sec']:.1f} docs/s")
+    print(f"ganho: {report['after_docs_per_sec'] / report['before_docs_per_sec']:.2f}x")
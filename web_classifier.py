@@ -1,17 +1,35 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g
 import spacy
+import argparse
+import concurrent.futures
+import gc
 import json
 import logging
+import multiprocessing
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 import traceback
 
+from classification_cache import create_cache_from_env, make_cache_key, model_identity
+from classifier_metrics import (CASCADE_DECISIONS, IN_FLIGHT, MODEL_LOAD_FAILURES, REQUEST_SECONDS, REQUESTS,
+                                SHADOW_COMPARISONS, mark_worker_dead, record_document, register_service_stats,
+                                render_metrics, stage_timer)
+from cascade import CascadeClassifier
+from model_registry import ModelEntry, ModelRegistry
+from numpy_textcat import NumpyTextcat
+from text_normalization import NORMALIZATION_VERSION, TextNormalizer
+from long_document import (AGGREGATION_STRATEGIES, LONG_DOCUMENT_AGGREGATION, LONG_DOCUMENT_EARLY_STOP,
+                           classify_windows)
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = Flask(__name__)
 
-# Variável global para o modelo
+# Variável global para o modelo (sempre o modelo padrão do registro)
 nlp_model = None
 
 # Categorias do modelo
@@ -25,6 +43,44 @@ CATEGORIES = [
     "Extrato de Termo Aditivo"
 ]
 
+# Limites de entrada (acima de MAX_TEXT_LENGTH o texto é classificado por janelas)
+MAX_TEXT_LENGTH = 10000
+LONG_DOCUMENT_MAX_LENGTH = int(os.environ.get('CLASSIFIER_LONG_DOC_MAX_LENGTH', 500000))
+MAX_BATCH_TEXTS = int(os.environ.get('CLASSIFIER_MAX_BATCH_TEXTS', 1000))
+
+# Configurações de batch (nlp.pipe)
+BATCH_SIZE = int(os.environ.get('CLASSIFIER_BATCH_SIZE', 64))
+
+# Linhas acumuladas por vez no endpoint de streaming (limita a memória)
+STREAM_BATCH_SIZE = int(os.environ.get('CLASSIFIER_STREAM_BATCH_SIZE', 256))
+
+# Registro de modelos: "nome=caminho,nome=caminho" (o primeiro é o padrão)
+MODELS_SPEC = os.environ.get('CLASSIFIER_MODELS', '')
+MODEL_STATE_PATH = os.environ.get('CLASSIFIER_MODEL_STATE_PATH')
+ADMIN_TOKEN = os.environ.get('CLASSIFIER_ADMIN_TOKEN')
+
+# Backend de inferência: 'spacy' (padrão) ou 'numpy' (pesos exportados por numpy_textcat.py).
+# Caminhos terminados em .npz usam sempre o motor NumPy.
+INFERENCE_BACKEND = os.environ.get('CLASSIFIER_BACKEND', 'spacy')
+
+# Cascata: "bow,cnn" classifica tudo com o BOW e só escala para a CNN abaixo do limite
+CASCADE_SPEC = os.environ.get('CLASSIFIER_CASCADE', '')
+CASCADE_THRESHOLD = float(os.environ.get('CLASSIFIER_CASCADE_THRESHOLD', 0.9))
+CASCADE_DEFAULT = os.environ.get('CLASSIFIER_CASCADE_DEFAULT', '1') == '1'
+
+# Tráfego sombra: máximo de classificações sombra pendentes (excedentes são descartadas)
+SHADOW_MAX_PENDING = int(os.environ.get('CLASSIFIER_SHADOW_MAX_PENDING', 100))
+
+# Normalização do texto de entrada, a mesma aplicada aos dados de treino (ver text_normalization.py).
+# Desligue (0) apenas para modelos treinados sobre o texto bruto.
+TEXT_NORMALIZATION = os.environ.get('CLASSIFIER_NORMALIZE', '1') == '1'
+text_normalizer = TextNormalizer() if TEXT_NORMALIZATION else None
+
+# Micro-batching dinâmico: junta chamadas concorrentes de /classify
+MICRO_BATCHING_ENABLED = os.environ.get('CLASSIFIER_MICRO_BATCHING', '1') == '1'
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('CLASSIFIER_MICRO_BATCH_MAX_SIZE', 32))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('CLASSIFIER_MICRO_BATCH_MAX_WAIT_MS', 5))
+
 def load_classification_model(model_path):
     """
     Carrega o modelo de classificação SpaCy.
@@ -42,6 +98,12 @@ def load_classification_model(model_path):
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Modelo não encontrado em: {model_path}")
         
+        # Motor NumPy: só o forward do textcat, sem carregar SpaCy/thinc
+        if INFERENCE_BACKEND == 'numpy' or model_path.endswith('.npz'):
+            nlp = NumpyTextcat.from_path(model_path)
+            logging.info(f"Modelo carregado com o motor NumPy ({nlp.architecture})")
+            return nlp
+        
         # Carregar modelo (sem GPU para compatibilidade)
         nlp = spacy.load(model_path)
         
@@ -56,31 +118,59 @@ def load_classification_model(model_path):
         logging.error(f"Erro ao carregar modelo: {e}")
         raise
 
-def classify_text(text, model):
+def _on_default_model_change(entry):
+    """Mantém `nlp_model` apontando para o modelo padrão do registro."""
+    global nlp_model
+    nlp_model = entry.nlp
+    logging.info(f"Modelo padrão agora é '{entry.name}' ({entry.path})")
+
+def _on_model_load_failure(name, path, error):
+    """Conta as cargas que falharam, inclusive as feitas em segundo plano."""
+    MODEL_LOAD_FAILURES.labels(name).inc()
+
+model_registry = ModelRegistry(load_classification_model, on_default_change=_on_default_model_change,
+                               state_path=MODEL_STATE_PATH, on_load_failure=_on_model_load_failure)
+
+cascade_classifier = None
+if CASCADE_SPEC:
+    cascade_classifier = CascadeClassifier([name.strip() for name in CASCADE_SPEC.split(',')], CASCADE_THRESHOLD,
+                                           lambda name: model_registry.get(name).nlp)
+
+def build_classification_result(doc, text):
     """
-    Classifica um texto usando o modelo SpaCy.
+    Monta o resultado da classificação a partir de um Doc processado.
     
     Args:
-        text (str): Texto para classificar.
-        model: Modelo SpaCy carregado.
+        doc: Doc do SpaCy já processado pelo pipeline.
+        text (str): Texto original.
         
     Returns:
         dict: Resultado da classificação com probabilidades.
     """
-    try:
-        # Processar texto
-        doc = model(text)
+    return build_result_from_scores(getattr(doc, 'cats', None), text)
+
+def build_result_from_scores(scores, text):
+    """
+    Monta o resultado da classificação a partir dos scores por categoria.
+    
+    Args:
+        scores (dict): Score por categoria (por exemplo, `doc.cats`).
+        text (str): Texto original.
         
-        # Obter scores de classificação
-        if hasattr(doc, 'cats') and doc.cats:
+    Returns:
+        dict: Resultado da classificação com probabilidades.
+    """
+    # Obter scores de classificação
+    if scores:
+        with stage_timer('sort'):
             # Ordenar por probabilidade (maior para menor)
-            sorted_cats = sorted(doc.cats.items(), key=lambda x: x[1], reverse=True)
+            sorted_cats = sorted(scores.items(), key=lambda x: x[1], reverse=True)
             
             # Encontrar categoria com maior probabilidade
             predicted_category = sorted_cats[0][0]
             confidence = sorted_cats[0][1]
             
-            return {
+            result = {
                 'success': True,
                 'predicted_category': predicted_category,
                 'confidence': float(confidence),
@@ -88,25 +178,534 @@ def classify_text(text, model):
                 'text_length': len(text),
                 'processed_at': datetime.now().isoformat()
             }
-        else:
-            # Fallback se não houver classificação
-            return {
-                'success': False,
-                'error': 'Modelo não possui capacidade de classificação',
-                'fallback_category': 'Indefinido',
-                'confidence': 0.0,
-                'all_probabilities': {cat: 0.0 for cat in CATEGORIES}
-            }
+        
+        record_document(result, text)
+        return result
+    else:
+        # Fallback se não houver classificação
+        return {
+            'success': False,
+            'error': 'Modelo não possui capacidade de classificação',
+            'fallback_category': 'Indefinido',
+            'confidence': 0.0,
+            'all_probabilities': {cat: 0.0 for cat in CATEGORIES}
+        }
+
+def build_error_result(error):
+    """Resultado padrão para falhas na classificação."""
+    return {
+        'success': False,
+        'error': str(error),
+        'fallback_category': 'Erro na classificação',
+        'confidence': 0.0
+    }
+
+def run_pipeline(texts, model, batch_size=BATCH_SIZE):
+    """
+    Executa o pipeline do modelo etapa por etapa, medindo cada uma.
+    
+    Equivale a list(model.pipe(texts, batch_size=batch_size)), mas registra
+    separadamente a tokenização e cada componente (o textcat como 'textcat').
+    Com a normalização ligada, os Docs são montados direto dos tokens
+    normalizados, e a etapa é registrada como 'normalization'.
+    
+    Args:
+        texts (list): Textos para processar.
+        model: Modelo SpaCy carregado.
+        batch_size (int): Tamanho do batch interno.
+        
+    Returns:
+        list: Docs processados, na ordem da entrada.
+    """
+    if text_normalizer is not None:
+        with stage_timer('normalization'):
+            docs = text_normalizer.docs_batch(texts, model, batch_size)
+    else:
+        with stage_timer('tokenization'):
+            docs = list(model.tokenizer.pipe(texts, batch_size=batch_size))
+    
+    for name, component in model.pipeline:
+        with stage_timer('textcat' if name.startswith('textcat') else name):
+            if hasattr(component, 'pipe'):
+                docs = list(component.pipe(docs, batch_size=batch_size))
+            else:
+                docs = [component(doc) for doc in docs]
+    
+    return docs
+
+def serialize(payload, status=200):
+    """Serializa a resposta JSON medindo a etapa de serialização."""
+    with stage_timer('serialization'):
+        response = jsonify(payload)
+    response.status_code = status
+    return response
+
+def classify_text(text, model):
+    """
+    Classifica um texto usando o modelo SpaCy.
+    
+    Args:
+        text (str): Texto para classificar.
+        model: Modelo SpaCy carregado.
+        
+    Returns:
+        dict: Resultado da classificação com probabilidades.
+    """
+    if isinstance(model, CascadeClassifier):
+        return classify_texts([text], model)[0]
+    
+    try:
+        # Processar texto
+        doc = run_pipeline([text], model)[0]
+        return build_classification_result(doc, text)
             
     except Exception as e:
         logging.error(f"Erro na classificação: {e}")
+        return build_error_result(e)
+
+def classify_long_text(text, model, aggregation=LONG_DOCUMENT_AGGREGATION,
+                       early_stop_threshold=LONG_DOCUMENT_EARLY_STOP):
+    """
+    Classifica um documento longo dividindo-o em janelas.
+    
+    Args:
+        text (str): Texto para classificar.
+        model: Modelo SpaCy carregado.
+        aggregation (str): Como agregar as janelas: 'mean', 'max' ou 'confidence'.
+        early_stop_threshold (float): Confiança que encerra a leitura (None desliga).
+        
+    Returns:
+        dict: Resultado da classificação, com o resumo das janelas em 'long_document'.
+    """
+    try:
+        window_text = text
+        if text_normalizer is not None:
+            # As janelas são cortadas do texto já normalizado, como os documentos de treino
+            with stage_timer('normalization'):
+                window_text = text_normalizer.normalize(text, model.tokenizer)
+        pipe = None
+        stages = []
+        if isinstance(model, CascadeClassifier):
+            # Registra o estágio que decidiu cada janela sem perder a parada antecipada
+            pipe = lambda windows, batch_size: model.pipe(windows, batch_size=batch_size, stages=stages)
+        scores, info = classify_windows(window_text, model, aggregation=aggregation,
+                                        early_stop_threshold=early_stop_threshold, pipe=pipe)
+        result = build_result_from_scores(scores, text)
+        result['long_document'] = info
+        stages = stages[:info['windows_used']]
+        if stages:
+            # O documento conta como decidido pelo estágio mais caro que alguma janela precisou
+            result['decided_by'] = max(stages, key=model.stage_names.index)
+            info['decided_by_windows'] = {name: stages.count(name) for name in model.stage_names if name in stages}
+            CASCADE_DECISIONS.labels(result['decided_by']).inc()
+        return result
+        
+    except Exception as e:
+        logging.error(f"Erro na classificação de documento longo: {e}")
+        return build_error_result(e)
+
+def classify_texts(texts, model, batch_size=BATCH_SIZE):
+    """
+    Classifica vários textos com uma única chamada a nlp.pipe.
+    
+    Args:
+        texts (list): Textos para classificar.
+        model: Modelo SpaCy carregado.
+        batch_size (int): Tamanho do batch interno do nlp.pipe.
+        
+    Returns:
+        list: Um resultado por texto, na mesma ordem da entrada.
+    """
+    try:
+        if isinstance(model, CascadeClassifier):
+            docs, decided_by = model.run(texts, run_pipeline, batch_size)
+            results = [build_classification_result(doc, text) for doc, text in zip(docs, texts)]
+            for result, stage in zip(results, decided_by):
+                result['decided_by'] = stage
+                CASCADE_DECISIONS.labels(stage).inc()
+            return results
+        
+        docs = run_pipeline(texts, model, batch_size)
+        return [build_classification_result(doc, text) for doc, text in zip(docs, texts)]
+        
+    except Exception as e:
+        logging.error(f"Erro na classificação em batch: {e}")
+        return [build_error_result(e) for _ in texts]
+
+class _PendingText:
+    """Texto aguardando na fila do micro-batcher."""
+
+    def __init__(self, text, model):
+        self.text = text
+        self.model = model
+        self.result = None
+        self.done = threading.Event()
+
+class MicroBatcher:
+    """
+    Junta chamadas concorrentes de /classify em uma única chamada a nlp.pipe.
+    
+    Cada requisição entra numa fila; uma thread de fundo espera no máximo
+    `max_wait_ms` milissegundos (ou até `max_batch_size` textos) e classifica
+    o lote inteiro de uma vez, devolvendo cada resultado à sua requisição.
+    """
+
+    def __init__(self, max_batch_size=MICRO_BATCH_MAX_SIZE, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+                 batch_size=BATCH_SIZE):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_size = batch_size
+        self.batches_processed = 0
+        self.texts_processed = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        """Inicia a thread de fundo (também após um fork, onde threads não sobrevivem)."""
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def classify(self, text, model):
+        """
+        Classifica um texto dividindo a chamada ao modelo com requisições concorrentes.
+        
+        Args:
+            text (str): Texto para classificar.
+            model: Modelo SpaCy carregado.
+            
+        Returns:
+            dict: Resultado da classificação com probabilidades.
+        """
+        pending = _PendingText(text, model)
+        self._ensure_worker().put(pending)
+        pending.done.wait()
+        return pending.result
+
+    def stats(self):
+        """Estatísticas do micro-batcher."""
         return {
-            'success': False,
-            'error': str(e),
-            'fallback_category': 'Erro na classificação',
-            'confidence': 0.0
+            'enabled': True,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches_processed': self.batches_processed,
+            'texts_processed': self.texts_processed,
+            'avg_batch_size': (self.texts_processed / self.batches_processed
+                               if self.batches_processed else 0.0)
         }
 
+    def _run(self):
+        pending_queue = self._queue
+        while True:
+            batch = [pending_queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # Agrupar por modelo para que cada nlp.pipe use um único pipeline
+        groups = {}
+        for pending in batch:
+            groups.setdefault(id(pending.model), []).append(pending)
+
+        for group in groups.values():
+            try:
+                results = classify_texts([p.text for p in group], group[0].model, self.batch_size)
+            except Exception as e:
+                results = [build_error_result(e) for _ in group]
+            for pending, result in zip(group, results):
+                pending.result = result
+                pending.done.set()
+
+        self.batches_processed += 1
+        self.texts_processed += len(batch)
+
+micro_batcher = MicroBatcher() if MICRO_BATCHING_ENABLED else None
+
+# Cache de resultados (memória do processo ou sqlite compartilhado entre workers)
+result_cache = create_cache_from_env()
+
+def _cacheable_result(result):
+    """Remove do resultado os campos que dependem da requisição."""
+    return {k: v for k, v in result.items() if k not in ('text_length', 'processed_at')}
+
+def _restore_cached_result(cached, text):
+    """Completa um resultado vindo do cache com os campos da requisição atual."""
+    cached['text_length'] = len(text)
+    cached['processed_at'] = datetime.now().isoformat()
+    cached['cached'] = True
+    record_document(cached, text, source='cache')
+    return cached
+
+def serving_identity(model):
+    """Identidade do modelo para o cache, incluindo a versão da normalização de entrada."""
+    identity = model_identity(model)
+    if text_normalizer is not None:
+        identity += f'|norm{NORMALIZATION_VERSION}'
+    return identity
+
+def classify_cached(text, model, classify=classify_text, variant='', use_cache=True):
+    """
+    Classifica um texto consultando antes o cache de resultados.
+    
+    Args:
+        text (str): Texto para classificar.
+        model: Modelo SpaCy carregado.
+        classify (callable): Função usada quando o texto não está no cache.
+        variant (str): Distingue no cache modos de classificação diferentes.
+        use_cache (bool): False quando quem chama já consultou o cache.
+        
+    Returns:
+        dict: Resultado da classificação com probabilidades.
+    """
+    if result_cache is None or not use_cache:
+        return classify(text, model)
+    
+    key = make_cache_key(text, serving_identity(model) + variant)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return _restore_cached_result(cached, text)
+    
+    result = classify(text, model)
+    if result['success']:
+        result_cache.set(key, _cacheable_result(result))
+    return result
+
+def classify_texts_cached(texts, model, batch_size=BATCH_SIZE):
+    """
+    Classifica vários textos; só os ausentes do cache vão para o nlp.pipe.
+    
+    Args:
+        texts (list): Textos para classificar.
+        model: Modelo SpaCy carregado.
+        batch_size (int): Tamanho do batch interno do nlp.pipe.
+        
+    Returns:
+        list: Um resultado por texto, na mesma ordem da entrada.
+    """
+    if result_cache is None:
+        return classify_texts(texts, model, batch_size)
+    
+    identity = serving_identity(model)
+    keys = [make_cache_key(text, identity) for text in texts]
+    results = [result_cache.get(key) for key in keys]
+    
+    misses = []
+    for i, cached in enumerate(results):
+        if cached is None:
+            misses.append(i)
+        else:
+            results[i] = _restore_cached_result(cached, texts[i])
+    
+    fresh_results = classify_texts([texts[i] for i in misses], model, batch_size)
+    for i, result in zip(misses, fresh_results):
+        results[i] = result
+        if result['success']:
+            result_cache.set(keys[i], _cacheable_result(result))
+    
+    return results
+
+def _document_variant(text, aggregation, early_stop_threshold):
+    """Parte da chave do cache que distingue a classificação por janelas."""
+    if len(text) <= MAX_TEXT_LENGTH:
+        return ''
+    return f'|long|{aggregation}|{early_stop_threshold}'
+
+def cached_document(text, model, aggregation=LONG_DOCUMENT_AGGREGATION,
+                    early_stop_threshold=LONG_DOCUMENT_EARLY_STOP):
+    """
+    Consulta o cache com a mesma chave de classify_document.
+    
+    Usado por quem classifica fora deste processo (o pool de processos do
+    servidor assíncrono), junto com store_document.
+    
+    Returns:
+        tuple: (resultado do cache ou None, chave ou None com o cache desligado).
+    """
+    if result_cache is None:
+        return None, None
+    key = make_cache_key(text, serving_identity(model) + _document_variant(text, aggregation, early_stop_threshold))
+    cached = result_cache.get(key)
+    return (_restore_cached_result(cached, text) if cached is not None else None), key
+
+def store_document(key, result):
+    """Grava no cache um resultado obtido com use_cache=False (ver cached_document)."""
+    if key is not None and result['success']:
+        result_cache.set(key, _cacheable_result(result))
+
+def classify_document(text, model, classify=classify_text, aggregation=LONG_DOCUMENT_AGGREGATION,
+                      early_stop_threshold=LONG_DOCUMENT_EARLY_STOP, use_cache=True):
+    """
+    Classifica um texto de qualquer tamanho, passando pelo cache.
+    
+    Textos até MAX_TEXT_LENGTH usam `classify`; os maiores são classificados
+    por janelas com classify_long_text.
+    
+    Args:
+        text (str): Texto para classificar.
+        model: Modelo SpaCy carregado.
+        classify (callable): Função para textos curtos.
+        aggregation (str): Estratégia de agregação para documentos longos.
+        early_stop_threshold (float): Parada antecipada para documentos longos.
+        use_cache (bool): False quando quem chama já consultou o cache (ver cached_document).
+        
+    Returns:
+        dict: Resultado da classificação com probabilidades.
+    """
+    variant = _document_variant(text, aggregation, early_stop_threshold)
+    if not variant:
+        return classify_cached(text, model, classify=classify, use_cache=use_cache)
+    
+    def classify_long(long_text, long_model):
+        return classify_long_text(long_text, long_model, aggregation=aggregation,
+                                  early_stop_threshold=early_stop_threshold)
+    
+    return classify_cached(text, model, classify=classify_long, variant=variant, use_cache=use_cache)
+
+shadow_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+_shadow_pending = 0
+_shadow_lock = threading.Lock()
+
+def submit_shadow(text, primary_entry, primary_result):
+    """
+    Classifica o texto também com o modelo sombra, sem afetar a resposta.
+    
+    A comparação (mesma categoria ou não) vai para as métricas e o log. Se já
+    houver SHADOW_MAX_PENDING classificações sombra na fila, o texto é ignorado.
+    """
+    global _shadow_pending
+    shadow = model_registry.shadow()
+    if shadow is None or shadow.name == primary_entry.name or not primary_result['success']:
+        return
+    
+    with _shadow_lock:
+        if _shadow_pending >= SHADOW_MAX_PENDING:
+            return
+        _shadow_pending += 1
+    
+    def run():
+        global _shadow_pending
+        try:
+            shadow_result = classify_document(text, shadow.nlp)
+            if shadow_result['success']:
+                agree = shadow_result['predicted_category'] == primary_result['predicted_category']
+                SHADOW_COMPARISONS.labels(primary_entry.name, shadow.name, str(agree).lower()).inc()
+                if not agree:
+                    logging.info(f"Divergência sombra: '{primary_entry.name}' previu "
+                                 f"{primary_result['predicted_category']}, '{shadow.name}' previu "
+                                 f"{shadow_result['predicted_category']}")
+        except Exception as e:
+            logging.error(f"Erro na classificação sombra: {e}")
+        finally:
+            with _shadow_lock:
+                _shadow_pending -= 1
+    
+    shadow_executor.submit(run)
+
+def select_model(name=None):
+    """
+    Escolhe o modelo de uma requisição no registro.
+    
+    O nome 'cascade' (ou nenhum nome, com CLASSIFIER_CASCADE_DEFAULT=1) usa a
+    cascata configurada em CLASSIFIER_CASCADE.
+    
+    Returns:
+        tuple: (ModelEntry ou None, mensagem de erro ou None, status HTTP).
+    """
+    if cascade_classifier is not None and (name == 'cascade' or (not name and CASCADE_DEFAULT)):
+        missing = [stage for stage in cascade_classifier.stage_names if model_registry.get(stage) is None]
+        if not missing:
+            return ModelEntry('cascade', None, cascade_classifier), None, 200
+        if name:
+            return None, f'Cascata indisponível: modelos não carregados: {", ".join(missing)}', 500
+    
+    entry = model_registry.route(name)
+    if entry is not None:
+        return entry, None, 200
+    if name:
+        return None, f'Modelo desconhecido: {name}', 400
+    return None, 'Modelo não carregado. Verifique se o caminho do modelo está correto.', 500
+
+def validate_long_document_options(data):
+    """
+    Lê as opções de documento longo de uma requisição.
+    
+    Returns:
+        tuple: (aggregation, early_stop_threshold, mensagem de erro ou None).
+    """
+    aggregation = data.get('aggregation', LONG_DOCUMENT_AGGREGATION)
+    if aggregation not in AGGREGATION_STRATEGIES:
+        return None, None, f'Campo "aggregation" deve ser um de: {", ".join(AGGREGATION_STRATEGIES)}'
+    
+    threshold = data.get('early_stop_threshold', LONG_DOCUMENT_EARLY_STOP)
+    if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float))
+                                  or not 0 < threshold <= 1):
+        return None, None, 'Campo "early_stop_threshold" deve ser um número entre 0 e 1, ou null'
+    
+    return aggregation, threshold, None
+
+def validate_text(text):
+    """
+    Valida um texto recebido pela API.
+    
+    Returns:
+        str: Mensagem de erro, ou None se o texto for válido.
+    """
+    if not isinstance(text, str):
+        return 'Campo "text" deve ser uma string'
+    
+    if not text.strip():
+        return 'Texto não pode estar vazio'
+    
+    if len(text.strip()) > LONG_DOCUMENT_MAX_LENGTH:
+        limit = f'{LONG_DOCUMENT_MAX_LENGTH:,}'.replace(',', '.')
+        return f'Texto muito longo (máximo {limit} caracteres)'
+    
+    return None
+
+register_service_stats(lambda: result_cache, lambda: micro_batcher)
+
+def _endpoint_label():
+    """Rótulo do endpoint para as métricas (a regra da rota, não a URL crua)."""
+    return request.url_rule.rule if request.url_rule is not None else 'desconhecido'
+
+@app.before_request
+def _sync_model_registry():
+    # Aplica trocas de modelo feitas por chamadas administrativas em outros workers
+    model_registry.sync_state()
+
+@app.before_request
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.endpoint_label = _endpoint_label()
+    IN_FLIGHT.labels(g.endpoint_label).inc()
+
+@app.after_request
+def _finish_request_metrics(response):
+    if 'endpoint_label' in g:
+        REQUESTS.labels(g.endpoint_label, request.method, str(response.status_code)).inc()
+    return response
+
+@app.teardown_request
+def _teardown_request_metrics(exception=None):
+    # Em respostas de streaming, o teardown só ocorre ao fim do envio
+    if 'endpoint_label' in g:
+        IN_FLIGHT.labels(g.endpoint_label).dec()
+        REQUEST_SECONDS.labels(g.endpoint_label).observe(time.perf_counter() - g.request_started)
+
 @app.route('/')
 def index():
     """Página principal da aplicação."""
@@ -117,7 +716,9 @@ def classify_endpoint():
     """
     Endpoint para classificar texto.
     
-    Espera JSON com campo 'text'.
+    Espera JSON com campo 'text'. Textos acima de 10.000 caracteres são
+    classificados por janelas; os campos opcionais 'aggregation' e
+    'early_stop_threshold' controlam esse modo.
     Retorna classificação e probabilidades.
     """
     try:
@@ -129,7 +730,8 @@ def classify_endpoint():
             }), 500
         
         # Obter dados da requisição
-        data = request.get_json()
+        with stage_timer('request_parse'):
+            data = request.get_json()
         
         if not data or 'text' not in data:
             return jsonify({
@@ -137,29 +739,43 @@ def classify_endpoint():
                 'error': 'Campo "text" é obrigatório'
             }), 400
         
-        text = data['text'].strip()
+        # Escolher o modelo (campo 'model' ou divisão de tráfego do registro)
+        entry, error, status = select_model(data.get('model'))
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), status
         
-        if not text:
+        error = validate_text(data['text'])
+        if error:
             return jsonify({
                 'success': False,
-                'error': 'Texto não pode estar vazio'
+                'error': error
             }), 400
         
-        if len(text) > 10000:
+        aggregation, early_stop_threshold, error = validate_long_document_options(data)
+        if error:
             return jsonify({
                 'success': False,
-                'error': 'Texto muito longo (máximo 10.000 caracteres)'
+                'error': error
             }), 400
         
-        # Classificar texto
-        result = classify_text(text, nlp_model)
+        text = data['text'].strip()
+        
+        # Classificar texto (cache primeiro; depois agrupado com requisições concorrentes, se habilitado)
+        classify = micro_batcher.classify if micro_batcher is not None else classify_text
+        result = classify_document(text, entry.nlp, classify=classify, aggregation=aggregation,
+                                   early_stop_threshold=early_stop_threshold)
+        result['model'] = entry.name
+        submit_shadow(text, entry, result)
         
         # Log da classificação
         if result['success']:
             logging.info(f"Texto classificado como: {result['predicted_category']} "
                         f"(confiança: {result['confidence']:.3f})")
         
-        return jsonify(result)
+        return serialize(result)
         
     except Exception as e:
         logging.error(f"Erro no endpoint de classificação: {e}")
@@ -169,15 +785,208 @@ def classify_endpoint():
             'error': 'Erro interno do servidor'
         }), 500
 
+@app.route('/classify/batch', methods=['POST'])
+def classify_batch_endpoint():
+    """
+    Endpoint para classificar vários textos de uma vez.
+    
+    Espera JSON com campo 'texts' (lista de strings) e, opcionalmente,
+    'batch_size' e 'model'. Retorna um resultado por texto, na mesma ordem.
+    """
+    try:
+        if nlp_model is None:
+            return jsonify({
+                'success': False,
+                'error': 'Modelo não carregado. Verifique se o caminho do modelo está correto.'
+            }), 500
+        
+        with stage_timer('request_parse'):
+            data = request.get_json()
+        
+        if not data or not isinstance(data.get('texts'), list):
+            return jsonify({
+                'success': False,
+                'error': 'Campo "texts" é obrigatório e deve ser uma lista'
+            }), 400
+        
+        texts = data['texts']
+        
+        if not texts:
+            return jsonify({
+                'success': False,
+                'error': 'Lista de textos não pode estar vazia'
+            }), 400
+        
+        if len(texts) > MAX_BATCH_TEXTS:
+            return jsonify({
+                'success': False,
+                'error': f'Muitos textos (máximo {MAX_BATCH_TEXTS} por requisição)'
+            }), 400
+        
+        batch_size = data.get('batch_size', BATCH_SIZE)
+        if not isinstance(batch_size, int) or batch_size < 1:
+            return jsonify({
+                'success': False,
+                'error': 'Campo "batch_size" deve ser um inteiro positivo'
+            }), 400
+        
+        aggregation, early_stop_threshold, error = validate_long_document_options(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+        
+        entry, error, status = select_model(data.get('model'))
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), status
+        
+        # Textos inválidos recebem erro na sua posição; documentos longos são
+        # classificados por janelas e os demais vão juntos ao nlp.pipe
+        results = [None] * len(texts)
+        valid_indexes = []
+        for i, text in enumerate(texts):
+            error = validate_text(text)
+            if error:
+                results[i] = {'success': False, 'error': error}
+            elif len(text.strip()) > MAX_TEXT_LENGTH:
+                results[i] = classify_document(text.strip(), entry.nlp, aggregation=aggregation,
+                                               early_stop_threshold=early_stop_threshold)
+            else:
+                valid_indexes.append(i)
+        
+        valid_texts = [texts[i].strip() for i in valid_indexes]
+        for i, result in zip(valid_indexes, classify_texts_cached(valid_texts, entry.nlp, batch_size)):
+            results[i] = result
+        
+        for result in results:
+            if result.get('success'):
+                result['model'] = entry.name
+        
+        logging.info(f"Batch classificado: {len(valid_texts)}/{len(texts)} textos curtos válidos")
+        
+        return serialize({
+            'success': True,
+            'model': entry.name,
+            'count': len(results),
+            'results': results
+        })
+        
+    except Exception as e:
+        logging.error(f"Erro no endpoint de classificação em batch: {e}")
+        logging.error(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+def classify_stream_lines(lines, model, batch_size=BATCH_SIZE, stream_batch_size=STREAM_BATCH_SIZE):
+    """
+    Classifica um fluxo de linhas JSONL, produzindo uma linha NDJSON por entrada.
+    
+    Só `stream_batch_size` linhas ficam em memória por vez, então o consumo
+    não depende do tamanho do fluxo.
+    
+    Args:
+        lines (iterable): Linhas (bytes ou str) no formato {"text": ...}.
+        model: Modelo SpaCy carregado.
+        batch_size (int): Tamanho do batch interno do nlp.pipe.
+        stream_batch_size (int): Linhas acumuladas antes de cada classificação.
+        
+    Yields:
+        str: Uma linha JSON com o resultado, na ordem da entrada.
+    """
+    def flush(pending):
+        short_texts = [text for _, text, error in pending if error is None and len(text) <= MAX_TEXT_LENGTH]
+        short_results = iter(classify_texts_cached(short_texts, model, batch_size))
+        for header, text, error in pending:
+            if error is not None:
+                result = {'success': False, 'error': error}
+            elif len(text) <= MAX_TEXT_LENGTH:
+                result = next(short_results)
+            else:
+                result = classify_document(text, model)
+            with stage_timer('serialization'):
+                line = json.dumps({**header, **result}, ensure_ascii=False) + '\n'
+            yield line
+    
+    pending = []
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        
+        header = {'line': line_number}
+        text = None
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('cada linha deve ser um objeto JSON')
+            if 'id' in record:
+                header['id'] = record['id']
+            text = record.get('text')
+            error = 'Campo "text" é obrigatório' if text is None else validate_text(text)
+        except ValueError as e:
+            error = f'JSON inválido: {e}'
+        
+        pending.append((header, text.strip() if error is None else None, error))
+        if len(pending) >= stream_batch_size:
+            yield from flush(pending)
+            pending = []
+    
+    if pending:
+        yield from flush(pending)
+
+@app.route('/classify/stream', methods=['POST'])
+def classify_stream_endpoint():
+    """
+    Endpoint para classificação em massa via streaming.
+    
+    Recebe um corpo JSONL (um objeto {"text": ...} por linha, como em
+    extracted_articles.jsonl) e devolve NDJSON, uma linha por entrada, à medida
+    que os resultados ficam prontos. O campo opcional 'id' é repetido na saída.
+    O modelo pode ser escolhido com o parâmetro de URL ?model=nome.
+    """
+    entry, error, status = select_model(request.args.get('model'))
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), status
+    
+    lines = iter(request.stream.readline, b'')
+    logging.info(f"Iniciando classificação em streaming com o modelo '{entry.name}'")
+    
+    return Response(stream_with_context(classify_stream_lines(lines, entry.nlp)),
+                    mimetype='application/x-ndjson')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas no formato de texto do Prometheus."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @app.route('/health')
 def health_check():
     """Endpoint para verificar saúde da aplicação."""
     model_status = "carregado" if nlp_model is not None else "não carregado"
+    registry_status = model_registry.status()
     
     return jsonify({
         'status': 'ok',
         'model_status': model_status,
         'categories': CATEGORIES,
+        'micro_batching': micro_batcher.stats() if micro_batcher is not None else {'enabled': False},
+        'cache': result_cache.stats() if result_cache is not None else {'enabled': False},
+        'cascade': cascade_classifier.stats() if cascade_classifier is not None else {'enabled': False},
+        'models': {
+            'default': registry_status['default'],
+            'loaded': [model['name'] for model in registry_status['models']]
+        },
         'timestamp': datetime.now().isoformat()
     })
 
@@ -194,15 +1003,153 @@ def model_info():
     
     return jsonify({
         'model_loaded': True,
+        'model_name': model_registry.get().name,
         'pipe_names': pipe_names,
         'categories': CATEGORIES,
         'has_textcat': 'textcat' in pipe_names or 'textcat_multilabel' in pipe_names,
-        'model_lang': nlp_model.lang
+        'model_lang': nlp_model.lang,
+        'registry': model_registry.status()
     })
 
+def _admin_error():
+    """
+    Verifica o token de administração da requisição.
+    
+    Returns:
+        tuple: Resposta de erro, ou None se autorizado.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Administração desabilitada (defina CLASSIFIER_ADMIN_TOKEN)'
+        }), 403
+    
+    token = request.headers.get('X-Admin-Token', '')
+    if token != ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Token de administração inválido'
+        }), 401
+    
+    return None
+
+@app.route('/admin/models', methods=['GET'])
+def admin_models():
+    """Lista os modelos carregados, o roteamento e as cargas em andamento."""
+    error = _admin_error()
+    if error:
+        return error
+    
+    return jsonify({'success': True, **model_registry.status()})
+
+@app.route('/admin/models/load', methods=['POST'])
+def admin_load_model():
+    """
+    Carrega um modelo em segundo plano e, opcionalmente, o torna o padrão.
+    
+    Espera JSON com 'name' e 'path' (por exemplo, um novo diretório model-best)
+    e, opcionalmente, 'activate' (padrão: true) e 'warmup' (padrão: true).
+    O modelo só entra em uso depois de carregado e aquecido.
+    """
+    error = _admin_error()
+    if error:
+        return error
+    
+    data = request.get_json() or {}
+    name = data.get('name')
+    path = data.get('path')
+    
+    if not name or not path:
+        return jsonify({
+            'success': False,
+            'error': 'Campos "name" e "path" são obrigatórios'
+        }), 400
+    
+    if not os.path.exists(path):
+        return jsonify({
+            'success': False,
+            'error': f'Modelo não encontrado em: {path}'
+        }), 400
+    
+    model_registry.load_in_background(name, path, activate=data.get('activate', True),
+                                      warmup=data.get('warmup', True))
+    logging.info(f"Carga do modelo '{name}' iniciada a partir de {path}")
+    
+    return jsonify({
+        'success': True,
+        'status': 'loading',
+        'name': name,
+        'path': path
+    }), 202
+
+@app.route('/admin/models/routing', methods=['POST'])
+def admin_model_routing():
+    """
+    Altera o roteamento entre os modelos carregados.
+    
+    Espera JSON com qualquer um de: 'default' (nome), 'weights' ({nome: peso},
+    {} desliga a divisão) e 'shadow' (nome, ou null para desligar).
+    """
+    error = _admin_error()
+    if error:
+        return error
+    
+    data = request.get_json() or {}
+    try:
+        model_registry.set_routing(default=data.get('default'),
+                                   weights=data.get('weights'),
+                                   shadow=data.get('shadow'),
+                                   clear_shadow='shadow' in data and data['shadow'] is None)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, **model_registry.status()})
+
+@app.route('/admin/models/<name>', methods=['DELETE'])
+def admin_unload_model(name):
+    """Descarrega um modelo que não seja o padrão."""
+    error = _admin_error()
+    if error:
+        return error
+    
+    try:
+        model_registry.unload(name)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, **model_registry.status()})
+
+def _model_name_from_path(model_path):
+    """Nome do modelo a partir do caminho (ex.: cat-model/models/cnn/model-best -> cnn)."""
+    parts = os.path.normpath(model_path).split(os.sep)
+    return parts[-2] if len(parts) > 1 and parts[-1].startswith('model-') else parts[-1]
+
 def initialize_model():
     """Inicializa o modelo na inicialização da aplicação."""
-    global nlp_model
+    
+    # Modelos configurados explicitamente: todos são carregados, o primeiro é o padrão
+    if MODELS_SPEC:
+        for item in MODELS_SPEC.split(','):
+            name, _, model_path = item.strip().partition('=')
+            try:
+                model_registry.load(name, model_path, warmup=False)
+            except Exception as e:
+                logging.error(f"Falha ao carregar modelo de {model_path}: {e}")
+        
+        if nlp_model is None:
+            logging.warning("Nenhum modelo foi carregado. A aplicação funcionará em modo de demonstração.")
+        
+        if cascade_classifier is not None:
+            missing = [stage for stage in cascade_classifier.stage_names if model_registry.get(stage) is None]
+            if missing:
+                logging.warning(f"Cascata configurada sem os modelos: {', '.join(missing)}")
+        return
     
     # Possíveis caminhos do modelo (ordem de preferência)
     possible_model_paths = [
@@ -214,7 +1161,7 @@ def initialize_model():
     for model_path in possible_model_paths:
         if os.path.exists(model_path):
             try:
-                nlp_model = load_classification_model(model_path)
+                model_registry.load(_model_name_from_path(model_path), model_path, warmup=False)
                 logging.info(f"Modelo carregado com sucesso de: {model_path}")
                 break
             except Exception as e:
@@ -227,20 +1174,136 @@ def initialize_model():
         for path in possible_model_paths:
             logging.info(f"  - {path} {'(existe)' if os.path.exists(path) else '(não existe)'}")
 
-if __name__ == '__main__':
-    # Inicializar modelo
-    initialize_model()
+def create_app():
+    """
+    Inicializa o modelo e devolve a aplicação Flask.
+    
+    Usado pelo modo de produção e por servidores WSGI externos, por exemplo:
+    gunicorn --preload -w 8 -k gthread --threads 4 'web_classifier:create_app()'
+    """
+    if nlp_model is None:
+        initialize_model()
     
     # Configurações do Flask
     app.config['JSON_AS_ASCII'] = False  # Para suporte a caracteres especiais
     
-    logging.info("Iniciando aplicação web...")
-    logging.info("Acesse: http://localhost:5002")
+    return app
+
+def run_production_server(host, port, workers, threads, max_requests, max_requests_jitter,
+                          graceful_timeout, timeout):
+    """
+    Executa a aplicação com workers pré-forkados (gunicorn).
+    
+    O modelo é carregado uma única vez no processo pai, antes do fork, para que
+    os pesos do `nlp_model` sejam compartilhados copy-on-write entre os workers.
     
-    # Executar aplicação
-    app.run(
-        debug=True,
-        host='0.0.0.0',
-        port=5002,
-        use_reloader=False  # Para evitar recarregar o modelo
-    ) 
\ No newline at end of file
+    Args:
+        host (str): Endereço de escuta.
+        port (int): Porta de escuta.
+        workers (int): Número de processos worker.
+        threads (int): Threads por worker (requisições simultâneas por processo).
+        max_requests (int): Recicla o worker após N requisições (0 desliga).
+        max_requests_jitter (int): Variação aleatória de max_requests entre workers.
+        graceful_timeout (int): Segundos para concluir requisições ao desligar.
+        timeout (int): Segundos sem resposta antes de reiniciar um worker.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    def post_fork(server, worker):
+        logging.info(f"Worker {worker.pid} iniciado")
+
+    def worker_exit(server, worker):
+        logging.info(f"Worker {worker.pid} finalizado")
+
+    def child_exit(server, worker):
+        mark_worker_dead(worker.pid)
+
+    # Estado compartilhado do registro, para que trocas de modelo cheguem a todos os workers
+    if model_registry.state_path is None:
+        model_registry.state_path = 'cache/model_registry_state.json'
+        os.makedirs('cache', exist_ok=True)
+    
+    application = create_app()
+    model_registry.publish_current_state()
+    
+    # Congelar os objetos já alocados (modelo incluso) para que o coletor de lixo
+    # dos workers não toque nessas páginas e quebre o compartilhamento copy-on-write
+    gc.collect()
+    gc.freeze()
+    
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': True,
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests_jitter,
+        'graceful_timeout': graceful_timeout,
+        'timeout': timeout,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+        'child_exit': child_exit,
+    }
+    
+    logging.info(f"Iniciando servidor de produção: {workers} workers x {threads} threads em {host}:{port}")
+    ProductionServer(application, options).run()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor web do classificador de documentos oficiais')
+    parser.add_argument('--production', action='store_true',
+                        help='Usa workers pré-forkados (gunicorn) em vez do servidor de desenvolvimento')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Número de processos worker (modo produção)')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Threads por worker (modo produção)')
+    parser.add_argument('--max-requests', type=int, default=10000,
+                        help='Recicla cada worker após N requisições; 0 desliga (modo produção)')
+    parser.add_argument('--max-requests-jitter', type=int, default=1000,
+                        help='Variação aleatória de --max-requests entre workers (modo produção)')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Segundos para concluir requisições em andamento ao desligar (modo produção)')
+    parser.add_argument('--timeout', type=int, default=120,
+                        help='Segundos sem resposta antes de reiniciar um worker (modo produção)')
+    args = parser.parse_args()
+    
+    if args.production:
+        run_production_server(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            max_requests=args.max_requests,
+            max_requests_jitter=args.max_requests_jitter,
+            graceful_timeout=args.graceful_timeout,
+            timeout=args.timeout
+        )
+    else:
+        # Inicializar modelo
+        create_app()
+        
+        logging.info("Iniciando aplicação web...")
+        logging.info(f"Acesse: http://localhost:{args.port}")
+        
+        # Executar aplicação
+        app.run(
+            debug=True,
+            host=args.host,
+            port=args.port,
+            use_reloader=False  # Para evitar recarregar o modelo
+        )